@@ -0,0 +1,36 @@
+"""
+Compiled versions of the %%cython cells of "Cython & Numba, C-like
+performance". Build them with
+
+    python setup.py build_ext --inplace
+
+from the Cython_kernels folder.
+"""
+
+from .basics import (
+    hello,
+    example_cython,
+    example_cython_nogil,
+    compute_sum,
+    compute_sum_mod,
+)
+from .memview import (
+    memoryview_example,
+    sum_2d,
+    sum_2d_gil,
+    row_sums,
+    scale_2d,
+)
+
+__all__ = [
+    "hello",
+    "example_cython",
+    "example_cython_nogil",
+    "compute_sum",
+    "compute_sum_mod",
+    "memoryview_example",
+    "sum_2d",
+    "sum_2d_gil",
+    "row_sums",
+    "scale_2d",
+]
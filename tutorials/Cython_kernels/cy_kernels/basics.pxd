@@ -0,0 +1,3 @@
+# C-level entry points, usable with cimport from other Cython modules
+cdef int compute_sum_c(int a, int b) noexcept nogil
+cdef long long count_up(long long n) noexcept nogil
@@ -0,0 +1,47 @@
+# cython: language_level=3
+"""
+Static typing and functions, from the notebook cells.
+
+Every cpdef/def entry point has a GIL-free core (cdef ... nogil), so the same
+code can be called from other Cython code inside a nogil block or a prange.
+"""
+
+
+def hello():
+    print("Hello, World!")
+
+
+def example_cython():
+    """simply increment j by 1 for 1000 times"""
+    # declare the integer type before using it
+    cdef int i, j = 0
+    for i in range(1000):
+        j += 1
+    return j
+
+
+cdef long long count_up(long long n) noexcept nogil:
+    cdef long long i, j = 0
+    for i in range(n):
+        j += 1
+    return j
+
+
+def example_cython_nogil(long long n=1000):
+    """example_cython for any n, with the GIL released during the loop."""
+    cdef long long j
+    with nogil:
+        j = count_up(n)
+    return j
+
+
+cdef int compute_sum_c(int a, int b) noexcept nogil:
+    return a + b
+
+
+cpdef int compute_sum(int a, int b):
+    return compute_sum_c(a, b)
+
+
+cpdef inline int compute_sum_mod(int a, int b):
+    return a + b
@@ -0,0 +1,66 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Typed memoryview kernels, from the double[:, :] notebook cell.
+
+The *_gil variants keep the GIL for comparison; all the others release it, so
+several Python threads can run them at the same time on different data.
+"""
+
+import numpy as np
+
+
+def memoryview_example():
+    """The notebook cell: a 3 x 3 memoryview with its second row set to 1."""
+    # declare memoryviews by using : in the []
+    cdef double[:, :] b = np.zeros((3, 3), dtype="float64")
+    b[1] = 1
+    return np.asarray(b)
+
+
+cdef double _sum_2d(const double[:, :] a) noexcept nogil:
+    cdef Py_ssize_t i, j
+    cdef double s = 0
+    for i in range(a.shape[0]):
+        for j in range(a.shape[1]):
+            s += a[i, j]
+    return s
+
+
+def sum_2d(const double[:, :] a):
+    """Sum of a 2-D float64 array, without the GIL."""
+    cdef double s
+    with nogil:
+        s = _sum_2d(a)
+    return s
+
+
+def sum_2d_gil(const double[:, :] a):
+    """Same loop, GIL held: threads calling it run one at a time."""
+    return _sum_2d(a)
+
+
+def row_sums(const double[:, :] a, double[:] out=None):
+    """Sum of every row, written into out when given."""
+    cdef Py_ssize_t i, j
+    cdef double s
+    if out is None:
+        out = np.empty(a.shape[0])
+    if out.shape[0] != a.shape[0]:
+        raise ValueError("out must have %d items, got %d" % (a.shape[0], out.shape[0]))
+    with nogil:
+        for i in range(a.shape[0]):
+            s = 0
+            for j in range(a.shape[1]):
+                s += a[i, j]
+            out[i] = s
+    return np.asarray(out)
+
+
+def scale_2d(double[:, :] a, double factor):
+    """a *= factor in place, without the GIL."""
+    cdef Py_ssize_t i, j
+    with nogil:
+        for i in range(a.shape[0]):
+            for j in range(a.shape[1]):
+                a[i, j] *= factor
+    return np.asarray(a)
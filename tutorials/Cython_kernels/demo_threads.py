@@ -0,0 +1,50 @@
+"""
+What? Call the compiled memoryview kernels from a thread pool
+
+sum_2d releases the GIL, so a ThreadPoolExecutor running it on row blocks
+of one array uses several cores. sum_2d_gil is the same loop with the GIL
+held: its threads run one after the other.
+"""
+
+# Import modules
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from cy_kernels import (
+    sum_2d,
+    sum_2d_gil,
+    example_cython,
+    compute_sum,
+    memoryview_example,
+)
+
+
+def threaded_sum(kernel, a, n_threads):
+    blocks = np.array_split(a, n_threads)
+    with ThreadPoolExecutor(n_threads) as pool:
+        return sum(pool.map(kernel, blocks))
+
+
+if __name__ == "__main__":
+    print("example_cython() =", example_cython())
+    print("compute_sum(5, 3) =", compute_sum(5, 3))
+    print("memoryview_example() =\n", memoryview_example())
+
+    a = np.random.default_rng(0).random((4000, 4000))
+    assert np.isclose(sum_2d(a), a.sum())
+    n_cores = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count()
+    )
+    print("\nCores: %d, array %.0f MB" % (n_cores, a.nbytes / 1e6))
+    print("%8s %14s %14s" % ("threads", "nogil [s]", "gil [s]"))
+    for n_threads in sorted({1, 2, 4, n_cores}):
+        row = []
+        for kernel in (sum_2d, sum_2d_gil):
+            start = time.perf_counter()
+            total = threaded_sum(kernel, a, n_threads)
+            row.append(time.perf_counter() - start)
+            assert np.isclose(total, a.sum())
+        print("%8d %14.4f %14.4f" % (n_threads, *row))
@@ -0,0 +1,16 @@
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="cy_kernels",
+    packages=["cy_kernels"],
+    ext_modules=cythonize(
+        [
+            "cy_kernels/basics.pyx",
+            "cy_kernels/memview.pyx",
+        ],
+        annotate=True,
+        language_level=3,
+    ),
+    package_data={"cy_kernels": ["*.pxd", "*.pyx"]},
+)
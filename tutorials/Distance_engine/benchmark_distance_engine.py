@@ -0,0 +1,74 @@
+"""
+What? Extend the orders_n sweep of "Vectorizing a classic for-loop in NumPy"
+      from two vectors to M queries x N points.
+
+Compared implementations:
+    - eucldist_vectorized called once per (query, point) pair
+    - plain NumPy broadcasting, which materialises an (M, N, d) temporary
+    - the blocked GEMM engine in float64 and in float32
+"""
+
+# Import modules
+import timeit
+import numpy as np
+from distance_engine import cdist
+
+
+def eucldist_vectorized(coords1, coords2):
+    """Calculates the euclidean distance between 2 lists of coordinates."""
+    return np.sqrt(np.sum((coords1 - coords2) ** 2))
+
+
+def pairs_loop(Q, P):
+    D = np.empty((Q.shape[0], P.shape[0]))
+    for i, q in enumerate(Q):
+        for j, p in enumerate(P):
+            D[i, j] = eucldist_vectorized(q, p)
+    return D
+
+
+def broadcasting(Q, P):
+    return np.sqrt(((Q[:, None, :] - P[None, :, :]) ** 2).sum(axis=-1))
+
+
+def engine_float64(Q, P):
+    return cdist(Q, P, dtype=np.float64)
+
+
+def engine_float32(Q, P):
+    return cdist(Q, P, dtype=np.float32)
+
+
+funcs = ("pairs_loop", "broadcasting", "engine_float64", "engine_float32")
+# The loop over pairs is only run while it stays below a few seconds, the
+# broadcasting while its (M, N, d) temporary stays below ~250 MB (M = 100,
+# d = 32: N = 10**5 would need 2.5 GB)
+max_n = {"pairs_loop": 10**3, "broadcasting": 10**4}
+
+
+if __name__ == "__main__":
+    M, d = 100, 32
+    orders_n = [10**i for i in range(1, 6)]
+    times = {f: [] for f in funcs}
+    rng = np.random.default_rng(123)
+
+    for n in orders_n:
+        Q = rng.random((M, d))
+        P = rng.random((n, d))
+        # above max_n the reference would be too large: no comparison
+        ref = broadcasting(Q, P) if n <= max_n["broadcasting"] else None
+        for f in funcs:
+            if n > max_n.get(f, n):
+                times[f].append(float("nan"))
+                continue
+            func = globals()[f]
+            if ref is not None:
+                assert np.allclose(func(Q, P), ref, atol=1e-3), f
+            times[f].append(
+                min(timeit.Timer(lambda: func(Q, P)).repeat(repeat=5, number=1))
+            )
+
+    print("M = %s queries, d = %s features, time in milliseconds\n" % (M, d))
+    print("%10s" % "N" + "".join("%18s" % f for f in funcs))
+    for k, n in enumerate(orders_n):
+        print("%10s" % n + "".join("%18.3f" % (times[f][k] * 1e3) for f in funcs))
@@ -0,0 +1,326 @@
+"""
+What? Blocked M x N distance engine (Euclidean, cosine, Manhattan)
+
+The "Vectorizing a classic for-loop in NumPy" tutorial only computes one
+distance between two vectors. Real workloads need the distances from M
+queries to N points. The Euclidean and cosine distances are computed with the
+GEMM trick:
+
+    ||q - p||^2 = ||q||^2 + ||p||^2 - 2 q.p
+
+so the heavy lifting is one matrix product per tile, handed to BLAS. Tiles
+are sized so that the working set never exceeds 'max_bytes'.
+
+Precision modes and error bounds
+--------------------------------
+The GEMM trick is fast but it cancels: when ||q - p|| is small compared to
+||q|| + ||p|| most of the significant digits are lost. With u the unit
+roundoff (u64 = 2**-53, u32 = 2**-24), d the number of features,
+D = ||q - p|| and S = (||q|| + ||p||)**2, the 'precision' argument selects:
+
+    "float64"      GEMM in float64.
+                   |D^2_hat - D^2| <= (d + 4) u64 S
+    "float32"      GEMM in float32, inputs rounded to float32.
+                   |D^2_hat - D^2| <= (d + 4) u32 S
+    "mixed"        GEMM in float32, norms and combination in float64. Any
+                   entry whose float32 bound above exceeds 2 rtol D^2_hat is
+                   recomputed from direct float64 differences, so the
+                   relative error on D is at most about max(rtol, d u64).
+    "compensated"  direct float64 differences, summed over the features with
+                   Neumaier's compensated summation. Relative error on D is
+                   about 2 u64, independent of d and of S.
+
+The relative error on D is roughly half the relative error on D^2. For the
+cosine distance the bounds are absolute and S is replaced by 1 (the vectors
+are normalised first). Manhattan has no GEMM form; it is summed directly and
+its relative error is at most (d + 1) u, "mixed" takes float32 differences and
+accumulates them in float64, "compensated" uses Neumaier summation.
+
+Reference: https://nbviewer.org/github/rasbt/One-Python-benchmark-per-day/blob/master/ipython_nbs/day16_numpy_vectorization.ipynb
+           Higham, Accuracy and Stability of Numerical Algorithms, ch. 3-4
+"""
+
+# Import modules
+import numpy as np
+
+METRICS = ("euclidean", "cosine", "manhattan")
+PRECISIONS = ("float64", "float32", "mixed", "compensated")
+UNIT_ROUNDOFF = {np.dtype(np.float32): 2.0**-24, np.dtype(np.float64): 2.0**-53}
+
+
+def pick_dtype(Q, P, dtype=None, precision=None):
+    """
+    Working precision: explicit dtype if given, float32 if both inputs are
+    already single (or half) precision, float64 otherwise. "mixed" and
+    "compensated" always return float64 results.
+    """
+    if precision is not None:
+        if dtype is not None:
+            raise ValueError("Pass either dtype or precision, not both")
+        if precision not in PRECISIONS:
+            raise ValueError(
+                "precision must be one of %s, got %r" % (PRECISIONS, precision)
+            )
+        return np.dtype(np.float32 if precision == "float32" else np.float64)
+    if dtype is not None:
+        return np.dtype(dtype)
+    small = (np.float16, np.float32)
+    if Q.dtype.type in small and P.dtype.type in small:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def block_shape(M, N, d, itemsize, metric="euclidean", max_bytes=64 * 2**20, tiles=1):
+    """
+    Rows of Q and P handled per tile so that 'tiles' output-sized temporaries
+    plus the copies of both input blocks fit in max_bytes. Manhattan has no
+    GEMM form, its (bq, bp, d) broadcast temporary is counted as well.
+    """
+    budget = max(max_bytes // itemsize, 1)
+    bq, bp = max(M, 1), max(N, 1)
+    while bq > 1 or bp > 1:
+        words = tiles * bq * bp + (bq + bp) * d
+        if metric == "manhattan":
+            words += bq * bp * d
+        if words <= budget:
+            break
+        if bp >= bq:
+            bp = max(bp // 2, 1)
+        else:
+            bq = max(bq // 2, 1)
+    return bq, bp
+
+
+def _tile(Qb, Pb, qn, pn, metric):
+    if metric == "manhattan":
+        return np.abs(Qb[:, None, :] - Pb[None, :, :]).sum(axis=-1)
+    G = Qb @ Pb.T
+    if metric == "euclidean":
+        G *= -2
+        G += qn[:, None]
+        G += pn[None, :]
+        np.maximum(G, 0, out=G)  # rounding can make tiny distances negative
+        return np.sqrt(G, out=G)
+    # cosine
+    G /= qn[:, None]
+    G /= pn[None, :]
+    np.subtract(1, G, out=G)
+    return G
+
+
+def _neumaier_add(s, c, x):
+    """One step of Neumaier's compensated summation, c is updated in place."""
+    t = s + x
+    c += np.where(np.abs(s) >= np.abs(x), (s - t) + x, (x - t) + s)
+    return t
+
+
+def _compensated_norms(X):
+    s = np.zeros(X.shape[0])
+    c = np.zeros(X.shape[0])
+    for k in range(X.shape[1]):
+        s = _neumaier_add(s, c, X[:, k] * X[:, k])
+    n = np.sqrt(s + c)
+    n[n == 0] = 1
+    return n
+
+
+def _tile_compensated(Qb, Pb, qn, pn, metric):
+    s = np.zeros((Qb.shape[0], Pb.shape[0]))
+    c = np.zeros_like(s)
+    for k in range(Qb.shape[1]):
+        if metric == "cosine":
+            x = Qb[:, k, None] * Pb[None, :, k]
+        else:
+            x = Qb[:, k, None] - Pb[None, :, k]
+            x = x * x if metric == "euclidean" else np.abs(x, out=x)
+        s = _neumaier_add(s, c, x)
+    s += c
+    if metric == "euclidean":
+        return np.sqrt(s, out=s)
+    if metric == "cosine":
+        s /= qn[:, None]
+        s /= pn[None, :]
+        np.subtract(1, s, out=s)
+    return s
+
+
+def _tile_mixed(Qb, Pb, Qb32, Pb32, qn, pn, metric, rtol):
+    if metric == "manhattan":
+        diff = np.abs(Qb32[:, None, :] - Pb32[None, :, :])
+        return diff.sum(axis=-1, dtype=np.float64)
+
+    d = Qb.shape[1]
+    u = UNIT_ROUNDOFF[np.dtype(np.float32)]
+    G = (Qb32 @ Pb32.T).astype(np.float64)
+    if metric == "euclidean":
+        G *= -2
+        G += qn[:, None] ** 2
+        G += pn[None, :] ** 2
+        np.maximum(G, 0, out=G)
+        # relative error on D is half the relative error on D^2
+        bound = (d + 4) * u * (qn[:, None] + pn[None, :]) ** 2
+        i, j = np.nonzero(bound > 2 * rtol * G)
+    else:
+        # cosine, Qb/Pb are already normalised
+        np.subtract(1, G, out=G)
+        i, j = np.nonzero((d + 4) * u > rtol * np.abs(G))
+
+    # refine the ill-conditioned entries from the float64 inputs, in chunks
+    # so that the gathered rows never exceed the size of the tile
+    step = max(G.size // max(d, 1), 1)
+    for a in range(0, len(i), step):
+        ii, jj = i[a : a + step], j[a : a + step]
+        if metric == "euclidean":
+            diff = Qb[ii] - Pb[jj]
+            G[ii, jj] = np.einsum("ij,ij->i", diff, diff)
+        else:
+            G[ii, jj] = 1 - np.einsum("ij,ij->i", Qb[ii], Pb[jj])
+    if metric == "euclidean":
+        np.sqrt(G, out=G)
+    return G
+
+
+def _norms(X, metric):
+    if metric == "euclidean":
+        return np.einsum("ij,ij->i", X, X)
+    if metric == "cosine":
+        n = np.sqrt(np.einsum("ij,ij->i", X, X))
+        n[n == 0] = 1  # a zero vector is at distance 1 from everything
+        return n
+    return None
+
+
+def iter_tiles(
+    Q,
+    P,
+    metric="euclidean",
+    dtype=None,
+    max_bytes=64 * 2**20,
+    precision=None,
+    rtol=1e-4,
+):
+    """
+    Yield (row_slice, col_slice, tile) covering the M x N distance matrix.
+
+    Useful when the full matrix does not fit in memory and the caller only
+    needs to reduce it (e.g. keep a running minimum per query). See the
+    module docstring for the precision modes; rtol is only used by "mixed".
+    """
+    if metric not in METRICS:
+        raise ValueError("metric must be one of %s, got %r" % (METRICS, metric))
+    Q = np.atleast_2d(np.asarray(Q))
+    P = np.atleast_2d(np.asarray(P))
+    if Q.shape[1] != P.shape[1]:
+        raise ValueError("Q and P must have the same number of features")
+    dt = pick_dtype(Q, P, dtype, precision)
+    Q = np.ascontiguousarray(Q, dtype=dt)
+    P = np.ascontiguousarray(P, dtype=dt)
+    M, N, d = Q.shape[0], P.shape[0], Q.shape[1]
+
+    if precision == "compensated":
+        bq, bp = block_shape(M, N, d, dt.itemsize, "euclidean", max_bytes, 5)
+        qn_all = pn_all = None
+        if metric == "cosine":
+            qn_all, pn_all = _compensated_norms(Q), _compensated_norms(P)
+        for i in range(0, M, bq):
+            rows = slice(i, min(i + bq, M))
+            qn = None if qn_all is None else qn_all[rows]
+            for j in range(0, N, bp):
+                cols = slice(j, min(j + bp, N))
+                pn = None if pn_all is None else pn_all[cols]
+                yield rows, cols, _tile_compensated(Q[rows], P[cols], qn, pn, metric)
+        return
+
+    if precision == "mixed":
+        bq, bp = block_shape(M, N, d, dt.itemsize, metric, max_bytes, 3)
+        qn_all = pn_all = None
+        if metric != "manhattan":
+            qn_all = np.sqrt(np.einsum("ij,ij->i", Q, Q))
+            pn_all = np.sqrt(np.einsum("ij,ij->i", P, P))
+        if metric == "cosine":
+            qn_all[qn_all == 0] = 1
+            pn_all[pn_all == 0] = 1
+            Q = Q / qn_all[:, None]
+            P = P / pn_all[:, None]
+        Q32 = Q.astype(np.float32)
+        P32 = P.astype(np.float32)
+        for i in range(0, M, bq):
+            rows = slice(i, min(i + bq, M))
+            qn = None if qn_all is None else qn_all[rows]
+            for j in range(0, N, bp):
+                cols = slice(j, min(j + bp, N))
+                pn = None if pn_all is None else pn_all[cols]
+                tile = _tile_mixed(
+                    Q[rows], P[cols], Q32[rows], P32[cols], qn, pn, metric, rtol
+                )
+                yield rows, cols, tile
+        return
+
+    bq, bp = block_shape(M, N, d, dt.itemsize, metric, max_bytes)
+    qn_all = _norms(Q, metric)
+    pn_all = _norms(P, metric)
+    for i in range(0, M, bq):
+        rows = slice(i, min(i + bq, M))
+        qn = None if qn_all is None else qn_all[rows]
+        for j in range(0, N, bp):
+            cols = slice(j, min(j + bp, N))
+            pn = None if pn_all is None else pn_all[cols]
+            yield rows, cols, _tile(Q[rows], P[cols], qn, pn, metric)
+
+
+def cdist(
+    Q,
+    P,
+    metric="euclidean",
+    dtype=None,
+    max_bytes=64 * 2**20,
+    out=None,
+    precision=None,
+    rtol=1e-4,
+):
+    """
+    Distances between every row of Q (M x d) and every row of P (N x d).
+
+    'out' may be a preallocated (M, N) array or np.memmap; the working set
+    on top of it is bounded by max_bytes.
+    """
+    Q = np.atleast_2d(np.asarray(Q))
+    P = np.atleast_2d(np.asarray(P))
+    if out is None:
+        dt = pick_dtype(Q, P, dtype, precision)
+        out = np.empty((Q.shape[0], P.shape[0]), dtype=dt)
+    for rows, cols, tile in iter_tiles(Q, P, metric, dtype, max_bytes, precision, rtol):
+        out[rows, cols] = tile
+    return out
+
+
+def one_to_many(
+    q, P, metric="euclidean", dtype=None, max_bytes=64 * 2**20, precision=None
+):
+    """Distances from a single vector q to every row of P."""
+    q = np.asarray(q)[None, :]
+    return cdist(q, P, metric, dtype, max_bytes, precision=precision)[0]
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(123)
+    Q = rng.random((7, 5))
+    P = rng.random((11, 5))
+    ref = {
+        "euclidean": np.sqrt(((Q[:, None] - P[None]) ** 2).sum(-1)),
+        "manhattan": np.abs(Q[:, None] - P[None]).sum(-1),
+        "cosine": 1
+        - (Q @ P.T)
+        / np.linalg.norm(Q, axis=1)[:, None]
+        / np.linalg.norm(P, axis=1)[None, :],
+    }
+    for metric in METRICS:
+        # a tiny max_bytes forces many tiles
+        got = cdist(Q, P, metric, max_bytes=256)
+        assert np.allclose(got, ref[metric]), metric
+        for precision in PRECISIONS:
+            got = cdist(Q, P, metric, max_bytes=256, precision=precision)
+            assert np.allclose(got, ref[metric], atol=1e-5), (metric, precision)
+    assert np.allclose(one_to_many(Q[0], P), ref["euclidean"][0])
+    print("All metrics and precision modes agree with the broadcasting reference")
@@ -0,0 +1,216 @@
+"""
+What? Exact k nearest neighbours with the distances fused into per-row
+      bounded heaps
+
+The usual route, pairwise_numba2(X) followed by np.argsort(D, axis=1), keeps
+the whole M x M matrix and sorts all of it to read k columns per row. Here
+every query row keeps a max-heap of its k best candidates; a candidate only
+enters if it beats the heap top, and its distance accumulation is abandoned
+as soon as the partial sum exceeds the heap top. Query rows are processed 4
+at a time, so every candidate row loaded from memory serves 4 queries, and
+the blocks of 4 run in parallel (prange). The memory is O(M k).
+
+    indices, distances = knn(X, k)         # neighbours within X, self excluded
+    indices, distances = knn(P, k, Q)      # neighbours in P of every row of Q
+
+Rows of the output are sorted by distance, ties in index order.
+
+Reference: https://en.wikipedia.org/wiki/K-nearest_neighbors_algorithm
+"""
+
+# Import modules
+import numpy as np
+from numba import njit, prange
+from pairwise_condensed import pairwise_numba2
+
+# Number of features summed between two early-abandon checks
+ABANDON_STRIDE = 16
+# Query rows sharing each load of a candidate row
+QUERY_BLOCK = 4
+
+
+@njit(cache=True)
+def _before(d1, i1, d2, i2):
+    """(d1, i1) ranks before (d2, i2): smaller distance, then smaller index."""
+    return d1 < d2 or (d1 == d2 and i1 < i2)
+
+
+@njit(cache=True)
+def _sift_down(heap_d, heap_i, root, size):
+    """Max-heap on (distance, index)."""
+    while True:
+        child = 2 * root + 1
+        if child >= size:
+            return
+        if child + 1 < size and _before(
+            heap_d[child], heap_i[child], heap_d[child + 1], heap_i[child + 1]
+        ):
+            child += 1
+        if not _before(heap_d[root], heap_i[root], heap_d[child], heap_i[child]):
+            return
+        heap_d[root], heap_d[child] = heap_d[child], heap_d[root]
+        heap_i[root], heap_i[child] = heap_i[child], heap_i[root]
+        root = child
+
+
+@njit(cache=True)
+def _sift_up(heap_d, heap_i, node):
+    while node > 0:
+        parent = (node - 1) // 2
+        if not _before(heap_d[parent], heap_i[parent], heap_d[node], heap_i[node]):
+            return
+        heap_d[parent], heap_d[node] = heap_d[node], heap_d[parent]
+        heap_i[parent], heap_i[node] = heap_i[node], heap_i[parent]
+        node = parent
+
+
+@njit(cache=True)
+def _push(heap_d, heap_i, size, k, dist, j):
+    """Offer candidate j to a bounded heap holding 'size' items, new size."""
+    if size < k:
+        heap_d[size] = dist
+        heap_i[size] = j
+        _sift_up(heap_d, heap_i, size)
+        return size + 1
+    if _before(dist, j, heap_d[0], heap_i[0]):
+        heap_d[0] = dist
+        heap_i[0] = j
+        _sift_down(heap_d, heap_i, 0, k)
+    return size
+
+
+@njit(cache=True)
+def _finish(heap_d, heap_i, size):
+    """Heapsort in place to ascending (distance, index), then take the root."""
+    for end in range(size - 1, 0, -1):
+        heap_d[0], heap_d[end] = heap_d[end], heap_d[0]
+        heap_i[0], heap_i[end] = heap_i[end], heap_i[0]
+        _sift_down(heap_d, heap_i, 0, end)
+    for t in range(size):
+        heap_d[t] = np.sqrt(heap_d[t])
+
+
+@njit(parallel=True, cache=True)
+def _knn(P, Q, k, exclude_self, stride):
+    M, d = Q.shape
+    N = P.shape[0]
+    out_i = np.empty((M, k), dtype=np.int64)
+    out_d = np.empty((M, k), dtype=np.float64)
+    n_blocks = (M + QUERY_BLOCK - 1) // QUERY_BLOCK
+    for b in prange(n_blocks):
+        q0 = b * QUERY_BLOCK
+        if q0 + QUERY_BLOCK > M:
+            # ragged last block: one query at a time
+            for q in range(q0, M):
+                size = 0
+                for j in range(N):
+                    if exclude_self and j == q:
+                        continue
+                    bound = out_d[q, 0] if size == k else np.inf
+                    dist = 0.0
+                    for f0 in range(0, d, stride):
+                        for f in range(f0, min(f0 + stride, d)):
+                            tmp = Q[q, f] - P[j, f]
+                            dist += tmp * tmp
+                        if dist > bound:
+                            break  # cannot enter the heap any more
+                    size = _push(out_d[q], out_i[q], size, k, dist, j)
+                _finish(out_d[q], out_i[q], size)
+            continue
+        # 4 queries share every load of P[j, f]
+        s0 = s1 = s2 = s3 = 0
+        for j in range(N):
+            b0 = out_d[q0, 0] if s0 == k else np.inf
+            b1 = out_d[q0 + 1, 0] if s1 == k else np.inf
+            b2 = out_d[q0 + 2, 0] if s2 == k else np.inf
+            b3 = out_d[q0 + 3, 0] if s3 == k else np.inf
+            d0 = d1 = d2 = d3 = 0.0
+            for f0 in range(0, d, stride):
+                for f in range(f0, min(f0 + stride, d)):
+                    p = P[j, f]
+                    t0 = Q[q0, f] - p
+                    t1 = Q[q0 + 1, f] - p
+                    t2 = Q[q0 + 2, f] - p
+                    t3 = Q[q0 + 3, f] - p
+                    d0 += t0 * t0
+                    d1 += t1 * t1
+                    d2 += t2 * t2
+                    d3 += t3 * t3
+                if d0 > b0 and d1 > b1 and d2 > b2 and d3 > b3:
+                    break  # none of the 4 can take it
+            if not (exclude_self and j == q0):
+                s0 = _push(out_d[q0], out_i[q0], s0, k, d0, j)
+            if not (exclude_self and j == q0 + 1):
+                s1 = _push(out_d[q0 + 1], out_i[q0 + 1], s1, k, d1, j)
+            if not (exclude_self and j == q0 + 2):
+                s2 = _push(out_d[q0 + 2], out_i[q0 + 2], s2, k, d2, j)
+            if not (exclude_self and j == q0 + 3):
+                s3 = _push(out_d[q0 + 3], out_i[q0 + 3], s3, k, d3, j)
+        _finish(out_d[q0], out_i[q0], s0)
+        _finish(out_d[q0 + 1], out_i[q0 + 1], s1)
+        _finish(out_d[q0 + 2], out_i[q0 + 2], s2)
+        _finish(out_d[q0 + 3], out_i[q0 + 3], s3)
+    return out_i, out_d
+
+
+def knn(P, k, Q=None, stride=ABANDON_STRIDE):
+    """
+    (indices, distances), both (M, k): the k nearest rows of P for every row
+    of Q. With Q=None the queries are the rows of P and a row is not its own
+    neighbour.
+    """
+    P = np.ascontiguousarray(P, dtype=np.float64)
+    exclude_self = Q is None
+    Q = P if Q is None else np.ascontiguousarray(Q, dtype=np.float64)
+    if P.ndim != 2 or Q.ndim != 2 or P.shape[1] != Q.shape[1]:
+        raise ValueError("Expected 2-D inputs with the same number of features")
+    available = P.shape[0] - exclude_self
+    if not 1 <= k <= available:
+        raise ValueError("k must be between 1 and %d, got %d" % (available, k))
+    return _knn(P, Q, k, exclude_self, stride)
+
+
+# The dense route, for comparison
+def knn_dense(X, k):
+    """pairwise_numba2 + argsort, dropping the row itself (column 0)."""
+    D = pairwise_numba2(X)
+    np.fill_diagonal(D, -1.0)
+    idx = np.argsort(D, axis=1, kind="stable")[:, 1 : k + 1]
+    return idx, np.take_along_axis(D, idx, axis=1)
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((500, 24))
+    for k in (1, 5, 499):
+        idx, dist = knn(X, k)
+        ref_idx, ref_dist = knn_dense(X, k)
+        assert (idx == ref_idx).all()
+        np.testing.assert_allclose(dist, ref_dist, rtol=1e-12)
+    Q = rng.standard_normal((50, 24))
+    idx, dist = knn(X, 7, Q)
+    full = np.sqrt(((Q[:, None, :] - X[None, :, :]) ** 2).sum(-1))
+    assert (idx == np.argsort(full, axis=1, kind="stable")[:, :7]).all()
+    print("knn agrees with pairwise_numba2 + argsort")
+
+    k = 10
+    print("\n%6s %4s %20s %20s" % ("M", "d", "dense [s / MiB]", "knn [s / MiB]"))
+    for M, d in ((1000, 32), (4000, 32), (8000, 32), (4000, 256)):
+        X = rng.standard_normal((M, d))
+        row = []
+        for f in (knn_dense, knn):
+            f(X[:20], 3)  # compile
+            tracemalloc.start()
+            start = time.perf_counter()
+            f(X, k)
+            row.append(
+                (
+                    time.perf_counter() - start,
+                    tracemalloc.get_traced_memory()[1] / 2**20,
+                )
+            )
+            tracemalloc.stop()
+        print("%6d %4d %11.3f / %6.1f %11.3f / %6.1f" % (M, d, *row[0], *row[1]))
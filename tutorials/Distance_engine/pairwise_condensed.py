@@ -0,0 +1,265 @@
+"""
+What? Symmetric, cache-blocked, load-balanced pairwise distances with
+      condensed (upper-triangular) output
+
+pairwise_numba1/pairwise_numba2 in "Cython & Numba, C-like performance"
+fill a dense M x M matrix whose lower half mirrors the upper one, and
+prange(M) over the triangle gives the first threads M - 1 pairs and the last
+ones almost none. Here:
+
+    - only the M (M - 1) / 2 pairs i < j are stored, in the condensed order
+      of scipy.spatial.distance.pdist: half the memory
+    - the triangle is cut into bi x bj row tiles, and every tile is
+      accumulated over feature tiles of bk columns, so the rows of both
+      sides stay in cache while the whole feature dimension is swept; the
+      innermost loop computes 4 pairs per load of X[i, k]
+    - tiles are assigned to threads by pair count (longest processing time
+      first), so every thread gets the same amount of work
+    - pdist_chunks() yields the condensed vector in pieces of bounded size,
+      for M too large for the full output
+
+Reference: https://docs.scipy.org/doc/scipy/reference/generated/scipy.spatial.distance.pdist.html
+"""
+
+# Import modules
+import heapq
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+METRICS = ("euclidean", "sqeuclidean")
+TILE = (32, 256, 128)  # bi, bj, bk: tuned for d = 256 on a 48 KB L1
+
+
+def condensed_offset(i, M):
+    """Position of the pair (i, i + 1) in the condensed vector."""
+    return i * M - i * (i + 1) // 2
+
+
+def condensed_index(i, j, M):
+    """Position of the pair (i, j), i < j."""
+    return condensed_offset(i, M) + j - i - 1
+
+
+def square_to_condensed(D):
+    return D[np.triu_indices(D.shape[0], 1)]
+
+
+def condensed_to_square(c, M):
+    D = np.zeros((M, M), dtype=c.dtype)
+    D[np.triu_indices(M, 1)] = c
+    return D + D.T
+
+
+def _tiles(M, r0, r1, bi, bj):
+    """(i0, i1, j0, j1) tiles covering the pairs of rows r0..r1-1, and their pair counts."""
+    tiles, weights = [], []
+    for i0 in range(r0, r1, bi):
+        i1 = min(i0 + bi, r1)
+        for j0 in range(i0, M, bj):
+            j1 = min(j0 + bj, M)
+            if j0 >= i1:
+                pairs = (i1 - i0) * (j1 - j0)
+            else:  # tile crossing the diagonal: pairs i < j only
+                pairs = sum(max(0, j1 - max(j0, i + 1)) for i in range(i0, i1))
+            if pairs:
+                tiles.append((i0, i1, j0, j1))
+                weights.append(pairs)
+    return np.array(tiles, dtype=np.int64).reshape(-1, 4), np.array(weights)
+
+
+def balance(weights, n_parts):
+    """
+    Longest processing time first: tile order and CSR pointers so that part p
+    gets tiles order[ptr[p]:ptr[p + 1]] with about sum(weights) / n_parts.
+    """
+    heap = [(0, p) for p in range(n_parts)]
+    parts = [[] for _ in range(n_parts)]
+    for t in np.argsort(weights, kind="stable")[::-1]:
+        load, p = heapq.heappop(heap)
+        parts[p].append(t)
+        heapq.heappush(heap, (load + weights[t], p))
+    order = np.array([t for part in parts for t in part], dtype=np.int64)
+    ptr = np.cumsum([0] + [len(part) for part in parts]).astype(np.int64)
+    loads = np.array([sum(weights[t] for t in part) for part in parts])
+    return order, ptr, loads
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _pdist_tiles(X, tiles, order, ptr, bk, squared, base, out):
+    M, N = X.shape
+    n_parts = ptr.shape[0] - 1
+    for p in prange(n_parts):
+        for t in range(ptr[p], ptr[p + 1]):
+            i0, i1, j0, j1 = (
+                tiles[order[t], 0],
+                tiles[order[t], 1],
+                tiles[order[t], 2],
+                tiles[order[t], 3],
+            )
+            acc = np.zeros((i1 - i0, j1 - j0))
+            for k0 in range(0, N, bk):
+                k1 = min(k0 + bk, N)
+                for i in range(i0, i1):
+                    j = max(j0, i + 1)
+                    # 1 x 4 register block: X[i, k] is loaded once for 4 pairs
+                    while j + 4 <= j1:
+                        d0 = d1 = d2 = d3 = 0.0
+                        for k in range(k0, k1):
+                            x = X[i, k]
+                            t0 = x - X[j, k]
+                            t1 = x - X[j + 1, k]
+                            t2 = x - X[j + 2, k]
+                            t3 = x - X[j + 3, k]
+                            d0 += t0 * t0
+                            d1 += t1 * t1
+                            d2 += t2 * t2
+                            d3 += t3 * t3
+                        acc[i - i0, j - j0] += d0
+                        acc[i - i0, j + 1 - j0] += d1
+                        acc[i - i0, j + 2 - j0] += d2
+                        acc[i - i0, j + 3 - j0] += d3
+                        j += 4
+                    while j < j1:
+                        d = 0.0
+                        for k in range(k0, k1):
+                            tmp = X[i, k] - X[j, k]
+                            d += tmp * tmp
+                        acc[i - i0, j - j0] += d
+                        j += 1
+            for i in range(i0, i1):
+                row = i * M - i * (i + 1) // 2 - i - 1 - base
+                for j in range(max(j0, i + 1), j1):
+                    d = acc[i - i0, j - j0]
+                    out[row + j] = d if squared else np.sqrt(d)
+
+
+def _pdist_rows(X, r0, r1, out, metric, tile, n_threads):
+    M = X.shape[0]
+    bi, bj, bk = tile
+    tiles, weights = _tiles(M, r0, r1, bi, bj)
+    if len(tiles) == 0:
+        return out
+    order, ptr, _ = balance(weights, n_threads)
+    base = condensed_offset(r0, M)
+    _pdist_tiles(X, tiles, order, ptr, bk, metric == "sqeuclidean", base, out)
+    return out
+
+
+def _check(X, metric):
+    if metric not in METRICS:
+        raise ValueError("metric must be one of %s" % (METRICS,))
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if X.ndim != 2:
+        raise ValueError("X must be 2-D, got %d-D" % X.ndim)
+    return X
+
+
+def pdist(X, metric="euclidean", out=None, tile=TILE, n_threads=None):
+    """Condensed distances of the rows of X, same layout as scipy's pdist."""
+    X = _check(X, metric)
+    M = X.shape[0]
+    size = M * (M - 1) // 2
+    if out is None:
+        out = np.empty(size)
+    elif out.shape != (size,):
+        raise ValueError("out must have shape (%d,), got %s" % (size, out.shape))
+    return _pdist_rows(X, 0, M, out, metric, tile, n_threads or get_num_threads())
+
+
+def row_chunks(M, max_items):
+    """Row ranges whose condensed output has at most max_items entries (or one row)."""
+    r0 = 0
+    while r0 < M:
+        r1, items = r0, 0
+        while r1 < M and (r1 == r0 or items + (M - 1 - r1) <= max_items):
+            items += M - 1 - r1
+            r1 += 1
+        yield r0, r1
+        r0 = r1
+
+
+def pdist_chunks(
+    X, metric="euclidean", max_bytes=64 * 2**20, tile=TILE, n_threads=None
+):
+    """
+    Yield (start, values): the condensed vector in consecutive pieces, values
+    being entries start..start+len(values)-1, each piece <= max_bytes.
+    The buffer is reused, copy it to keep it.
+    """
+    X = _check(X, metric)
+    M = X.shape[0]
+    n_threads = n_threads or get_num_threads()
+    max_items = max(1, max_bytes // 8)
+    # a single row is never split, so it may exceed max_items
+    buf = np.empty(max(min(max_items, M * (M - 1) // 2), M - 1, 0))
+    for r0, r1 in row_chunks(M, max_items):
+        start, stop = condensed_offset(r0, M), condensed_offset(r1, M)
+        if stop > start:
+            view = buf[: stop - start]
+            yield start, _pdist_rows(X, r0, r1, view, metric, tile, n_threads)
+
+
+# The tutorial kernels, for comparison
+@njit(parallel=True, cache=True)
+def pairwise_numba2(X):
+    M = X.shape[0]
+    N = X.shape[1]
+    D = np.zeros((M, M), dtype=np.float64)
+    for i in prange(M):
+        for j in range(i + 1, M):
+            d = 0.0
+            for k in range(N):
+                tmp = X[i, k] - X[j, k]
+                d += tmp * tmp
+            dist = np.sqrt(d)
+            D[i, j] = dist
+            D[j, i] = dist
+    return D
+
+
+def prange_imbalance(M, n_threads):
+    """Largest / mean pairs per thread with prange(M) split into equal row blocks."""
+    rows = np.array_split(np.arange(M), n_threads)
+    loads = np.array([(M - 1 - r).sum() for r in rows])
+    return loads.max() / loads.mean()
+
+
+if __name__ == "__main__":
+    import time
+    from scipy.spatial.distance import pdist as scipy_pdist
+
+    rng = np.random.default_rng(0)
+    for M, N in ((1, 3), (2, 3), (97, 5), (300, 130)):
+        X = rng.standard_normal((M, N))
+        np.testing.assert_allclose(pdist(X), scipy_pdist(X), rtol=1e-12)
+        np.testing.assert_allclose(
+            pdist(X, "sqeuclidean"), scipy_pdist(X, "sqeuclidean"), rtol=1e-12
+        )
+        pieces = np.concatenate(
+            [v.copy() for _, v in pdist_chunks(X, max_bytes=2000)] or [np.empty(0)]
+        )
+        np.testing.assert_allclose(pieces, scipy_pdist(X), rtol=1e-12)
+    print("pdist and pdist_chunks agree with scipy.spatial.distance.pdist")
+
+    M = 4000
+    for n_threads in (4, 16):
+        tiles, weights = _tiles(M, 0, M, *TILE[:2])
+        loads = balance(weights, n_threads)[2]
+        print(
+            "%2d threads: max/mean pairs per thread, prange(M) %.2f, balanced tiles %.2f"
+            % (n_threads, prange_imbalance(M, n_threads), loads.max() / loads.mean())
+        )
+
+    X = rng.standard_normal((M, 256))
+    pdist(X[:10]), pairwise_numba2(X[:10])  # compile
+    print("\n%-20s %10s %12s" % ("M = %d, d = 256" % M, "time [s]", "output [MB]"))
+    for name, f in (
+        ("pairwise_numba2", pairwise_numba2),
+        ("pdist (condensed)", pdist),
+        ("scipy pdist", scipy_pdist),
+    ):
+        start = time.perf_counter()
+        D = f(X)
+        print(
+            "%-20s %10.3f %12.1f" % (name, time.perf_counter() - start, D.nbytes / 1e6)
+        )
@@ -0,0 +1,146 @@
+"""
+What? Tiled parallel ufunc evaluation on a grid without materialising x, y
+
+In "Implicit Multithreading in NumPy" the kernel f_vec is evaluated with
+
+    grid = np.linspace(-3, 3, 5000)
+    x, y = np.meshgrid(grid, grid)
+    np.max(f_vec(x, y))
+
+which allocates two 200 MB coordinate arrays, a third 200 MB array for the
+result and then makes another full pass over it for np.max. Here the kernel
+gets the 1-D axes broadcast against each other, one tile of rows at a time,
+and the reduction is applied to the tile while it is still in cache. Peak
+memory is O(tile) and tiles are spread over a thread pool.
+
+Reference: https://github.com/QuantEcon/lecture-python-programming.notebooks/blob/master/parallelization.ipynb
+"""
+
+# Import modules
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from thread_control import cpu_count
+
+REDUCTIONS = ("max", "min", "sum", "argmax", "argmin")
+
+
+def _reduce_tile(tile, reduction, row0):
+    """Partial result of one tile: value, plus its (row, col) for arg*."""
+    if reduction == "sum":
+        return tile.sum()
+    if reduction in ("max", "min"):
+        return tile.max() if reduction == "max" else tile.min()
+    k = int(tile.argmax() if reduction == "argmax" else tile.argmin())
+    i, j = divmod(k, tile.shape[1])
+    return tile[i, j], (row0 + i, j)
+
+
+def _combine(parts, reduction):
+    if reduction == "sum":
+        return np.sum(parts)
+    if reduction == "max":
+        return np.max(parts)
+    if reduction == "min":
+        return np.min(parts)
+    # parts are in row order, so on ties the first occurrence wins, like
+    # np.argmax/np.argmin on the full array
+    values = np.array([v for v, _ in parts])
+    best = values.argmax() if reduction == "argmax" else values.argmin()
+    return parts[best][1]
+
+
+def grid_reduce(
+    kernel, x_axis, y_axis, reduction="max", tile_bytes=4 * 2**20, n_threads=None
+):
+    """
+    reduction(kernel(x, y)) over the grid np.meshgrid(x_axis, y_axis),
+    without building the grid.
+
+    Row i of the grid is y_axis[i], column j is x_axis[j], as with meshgrid.
+    For "argmax"/"argmin" the (i, j) index of the grid is returned.
+
+    The tiles are spread over n_threads threads, which relies on the kernel
+    releasing the GIL (NumPy and numba cpu ufuncs do). A kernel compiled with
+    target="parallel" is already threaded: pass n_threads=1, numba's
+    workqueue layer does not support being launched from several threads.
+    """
+    if reduction not in REDUCTIONS:
+        raise ValueError("reduction must be one of %s" % (REDUCTIONS,))
+    x_row = np.asarray(x_axis)[None, :]
+    y_col = np.asarray(y_axis)[:, None]
+    n_rows, n_cols = y_col.shape[0], x_row.shape[1]
+    itemsize = np.result_type(x_row, y_col).itemsize
+    rows = max(1, tile_bytes // (itemsize * n_cols))
+    starts = range(0, n_rows, rows)
+
+    def work(row0):
+        tile = kernel(x_row, y_col[row0 : row0 + rows])
+        return _reduce_tile(tile, reduction, row0)
+
+    n_threads = n_threads or cpu_count()
+    if n_threads == 1:
+        parts = [work(r) for r in starts]
+    else:
+        with ThreadPoolExecutor(n_threads) as pool:
+            parts = list(pool.map(work, starts))
+    return _combine(parts, reduction)
+
+
+def peak_memory(func, *args, **kwargs):
+    """(result, seconds, peak MiB traced by tracemalloc) of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def meshgrid_max(kernel, grid):
+    """The tutorial version."""
+    x, y = np.meshgrid(grid, grid)
+    return np.max(kernel(x, y))
+
+
+if __name__ == "__main__":
+    from numba import vectorize
+
+    # the tutorial kernel, once threaded by numba and once plain cpu
+    @vectorize("float64(float64, float64)", target="parallel")
+    def f_vec(x, y):
+        return np.cos(x**2 + y**2) / (1 + x**2 + y**2)
+
+    @vectorize("float64(float64, float64)")
+    def f_cpu(x, y):
+        return np.cos(x**2 + y**2) / (1 + x**2 + y**2)
+
+    small = np.linspace(-3, 3, 301)
+    x, y = np.meshgrid(small, small)
+    full = f_vec(x, y)
+    assert np.isclose(grid_reduce(f_cpu, small, small, "max", 4096), full.max())
+    assert np.isclose(grid_reduce(f_cpu, small, small, "sum", 4096), full.sum())
+    assert grid_reduce(f_cpu, small, small, "argmax", 4096) == np.unravel_index(
+        full.argmax(), full.shape
+    )
+    print("Tiled reductions agree with the meshgrid version")
+
+    grid = np.linspace(-3, 3, 5000)
+    meshgrid_max(f_vec, grid)  # Run once to compile
+    res, t, mem = peak_memory(meshgrid_max, f_vec, grid)
+    print(
+        "\nmeshgrid + np.max (parallel ufunc): %.4f in %.3f s, peak %.0f MiB"
+        % (res, t, mem)
+    )
+    res, t, mem = peak_memory(grid_reduce, f_vec, grid, grid, "max", n_threads=1)
+    print(
+        "grid_reduce (parallel ufunc)      : %.4f in %.3f s, peak %.0f MiB"
+        % (res, t, mem)
+    )
+    res, t, mem = peak_memory(grid_reduce, f_cpu, grid, grid, "max")
+    print(
+        "grid_reduce (cpu ufunc, %d threads): %.4f in %.3f s, peak %.0f MiB"
+        % (cpu_count(), res, t, mem)
+    )
@@ -0,0 +1,234 @@
+"""
+What? Thread-count control and oversubscription guard for implicit
+      NumPy/BLAS/OpenMP/numba multithreading
+
+"Implicit Multithreading in NumPy" shows that np.linalg.eigvals silently
+uses every BLAS thread. Run the same code inside a multiprocessing.Pool and
+each of the P workers starts its own C BLAS threads: P x C threads fight for
+C cores and the performance collapses. This module:
+
+    - reports how many threads every native pool currently uses
+    - detects nested parallelism (we are inside a worker process/thread)
+    - caps BLAS/OpenMP (via threadpoolctl when installed), numexpr and numba
+      with a context manager
+    - provides a Pool initializer, and a Pool factory, that set those caps
+      automatically to cores // workers
+
+Reference: https://github.com/joblib/threadpoolctl
+           https://numba.readthedocs.io/en/stable/user/threading-layer.html
+"""
+
+# Import modules
+import os
+import sys
+import time
+import threading
+import warnings
+import multiprocessing
+from contextlib import contextmanager
+
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+# Read by OpenMP/BLAS/numexpr/numba when they are loaded, so setting them
+# before the first import is the only thing that works without threadpoolctl
+ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "NUMBA_NUM_THREADS",
+)
+# Set by pool_initializer so a worker knows how many siblings it has
+WORKERS_ENV = "HPC_POOL_WORKERS"
+
+# Limits applied by pool_initializer live as long as the worker does
+_worker_limits = None
+
+
+def cpu_count():
+    """Cores this process may actually run on (honours taskset/cgroups)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def threads_per_worker(n_workers, n_cores=None):
+    """Fair share of the cores for each of n_workers workers, at least 1."""
+    n_cores = n_cores or cpu_count()
+    return max(1, n_cores // max(1, n_workers))
+
+
+def native_threads():
+    """
+    Current thread count of every native pool that is already loaded, e.g.
+    {"blas:openblas": 8, "openmp:libgomp": 8, "numexpr": 8, "numba": 8}.
+    """
+    info = {}
+    if threadpoolctl is not None:
+        for lib in threadpoolctl.threadpool_info():
+            key = "%s:%s" % (lib["user_api"], lib["internal_api"])
+            info[key] = max(info.get(key, 0), lib["num_threads"])
+    if "numexpr" in sys.modules:
+        info["numexpr"] = sys.modules["numexpr"].get_num_threads()
+    if "numba" in sys.modules:
+        info["numba"] = sys.modules["numba"].get_num_threads()
+    return info
+
+
+def detect_nested_parallelism():
+    """
+    Describe the parallel context we are running in.
+
+    'nested' is True when we are inside a worker process or a non-main
+    thread. 'oversubscribed' is True when workers x native threads exceeds
+    the cores available.
+    """
+    in_process = multiprocessing.parent_process() is not None
+    in_thread = threading.current_thread() is not threading.main_thread()
+    n_workers = int(os.environ.get(WORKERS_ENV, "1"))
+    if in_thread:
+        n_workers = max(n_workers, threading.active_count() - 1)
+    threads = native_threads()
+    widest = max(threads.values(), default=1)
+    return {
+        "nested": in_process or in_thread,
+        "in_worker_process": in_process,
+        "in_worker_thread": in_thread,
+        "workers": n_workers,
+        "cores": cpu_count(),
+        "native_threads": threads,
+        "oversubscribed": n_workers * widest > cpu_count(),
+    }
+
+
+@contextmanager
+def limit_threads(n_threads=None):
+    """
+    Cap BLAS, OpenMP, numexpr and numba to n_threads inside the block.
+
+    With n_threads=None the cap is derived from the parallel context: the fair
+    share of the cores if we are nested, otherwise nothing changes.
+    """
+    if n_threads is None:
+        ctx = detect_nested_parallelism()
+        if not ctx["nested"]:
+            yield native_threads()
+            return
+        n_threads = threads_per_worker(ctx["workers"], ctx["cores"])
+
+    # every change is recorded as soon as it is made, so that the finally
+    # undoes exactly what was done even if a later step raises
+    restore = []
+    blas = None
+    try:
+        if threadpoolctl is not None:
+            blas = threadpoolctl.threadpool_limits(limits=n_threads)
+        if "numexpr" in sys.modules:
+            ne = sys.modules["numexpr"]
+            restore.append((ne.set_num_threads, ne.set_num_threads(n_threads)))
+        if "numba" in sys.modules:
+            nb = sys.modules["numba"]
+            old = nb.get_num_threads()
+            # numba cannot go above the NUMBA_NUM_THREADS it was started with
+            nb.set_num_threads(min(n_threads, nb.config.NUMBA_NUM_THREADS))
+            restore.append((nb.set_num_threads, old))
+        yield native_threads()
+    finally:
+        if blas is not None:
+            blas.restore_original_limits()
+        for setter, old in reversed(restore):
+            setter(old)
+
+
+def pool_initializer(n_threads, n_workers=1):
+    """
+    Pool initializer capping the native thread pools of each worker.
+
+    The environment variables cover libraries the task imports later, the
+    runtime limits cover the ones inherited from the parent.
+    """
+    global _worker_limits
+    os.environ[WORKERS_ENV] = str(n_workers)
+    for var in ENV_VARS:
+        os.environ[var] = str(n_threads)
+    _worker_limits = limit_threads(n_threads)
+    _worker_limits.__enter__()
+
+
+def capped_pool(processes=None, n_threads=None, **kwargs):
+    """
+    multiprocessing.Pool whose workers share the cores instead of each one
+    starting cpu_count() BLAS threads.
+    """
+    processes = processes or cpu_count()
+    n_threads = n_threads or threads_per_worker(processes)
+    return multiprocessing.Pool(
+        processes,
+        initializer=pool_initializer,
+        initargs=(n_threads, processes),
+        **kwargs
+    )
+
+
+def guard_oversubscription(n_workers, n_threads=None):
+    """
+    Warn when n_workers x current native threads would exceed the cores, and
+    return the per-worker thread count that avoids it.
+    """
+    widest = max(native_threads().values(), default=1)
+    if n_workers * widest > cpu_count():
+        warnings.warn(
+            "%d workers x %d native threads > %d cores, use %d thread(s) "
+            "per worker"
+            % (n_workers, widest, cpu_count(), threads_per_worker(n_workers)),
+            RuntimeWarning,
+        )
+    return n_threads or threads_per_worker(n_workers)
+
+
+def eigvals_task(seed, m=500):
+    """One iteration of the loop in the tutorial."""
+    import numpy as np
+
+    X = np.random.default_rng(seed).standard_normal((m, m))
+    np.linalg.eigvals(X)
+    return detect_nested_parallelism()["native_threads"]
+
+
+if __name__ == "__main__":
+    # load BLAS in the parent so that it shows up in native_threads()
+    import numpy as np
+
+    n_tasks = 16
+    print("Cores available:", cpu_count())
+    print("Native thread pools in the parent:", native_threads())
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(cpu_count()) as pool:
+        threads = pool.map(eigvals_task, range(n_tasks))
+    print(
+        "\nPlain Pool : %.2f s, threads per worker %s"
+        % (time.perf_counter() - start, threads[0])
+    )
+
+    start = time.perf_counter()
+    with capped_pool(cpu_count()) as pool:
+        threads = pool.map(eigvals_task, range(n_tasks))
+    print(
+        "Capped Pool: %.2f s, threads per worker %s"
+        % (time.perf_counter() - start, threads[0])
+    )
+
+    with limit_threads(1):
+        start = time.perf_counter()
+        for seed in range(4):
+            eigvals_task(seed)
+        print(
+            "\nSerial, BLAS capped to 1 thread: %.2f s" % (time.perf_counter() - start)
+        )
+    print("Limits restored:", native_threads())
@@ -0,0 +1,188 @@
+"""
+What? Line-level allocation tracker for NumPy temporaries in hot loops
+
+The in-place operator tutorial only infers the cost of 'a = a + b' from
+timings. This tracker shows it directly: NumPy reports every data buffer to
+tracemalloc, and a line tracer reads the traced memory at each line
+boundary of the functions being watched. The traced memory is the total of
+all domains, Python objects included: it is not filtered down to NumPy's
+domain (np.lib.tracemalloc_domain), which would need a snapshot per line;
+min_bytes keeps small Python objects out of the allocation counts. For
+every line it records:
+
+    - hits:            how many times the line ran
+    - allocations:     executions during which the traced memory went up by
+                       at least 'min_bytes' (tracemalloc only exposes the
+                       current and the peak size, so several temporaries
+                       created inside one execution count once)
+    - bytes allocated: sum over executions of (peak - memory at line start)
+    - peak temporary:  largest (peak - memory kept after the line), i.e. the
+                       memory that was allocated and already freed again
+    - net:             memory still held after the line
+
+tracemalloc.reset_peak() runs at every line, so a caller that was already
+tracing loses its own peak; tracker.peak holds the highest traced memory
+over the block, the peak at entry included, to make up for it.
+
+Reference: https://docs.python.org/3/library/tracemalloc.html
+           https://numpy.org/doc/stable/reference/c-api/data_memory.html
+"""
+
+# Import modules
+import sys
+import linecache
+import tracemalloc
+from collections import defaultdict
+import numpy as np
+
+
+class LineStats:
+    __slots__ = ("hits", "allocations", "bytes_allocated", "peak_temporary", "net")
+
+    def __init__(self):
+        self.hits = 0
+        self.allocations = 0
+        self.bytes_allocated = 0
+        self.peak_temporary = 0
+        self.net = 0
+
+
+class AllocationTracker:
+    """
+    Context manager tracing the lines of the given functions.
+
+        with AllocationTracker(f, g) as tracker:
+            f(...)
+        tracker.print_report()
+    """
+
+    def __init__(self, *funcs, min_bytes=1024):
+        self.codes = {getattr(f, "__wrapped__", f).__code__ for f in funcs}
+        self.min_bytes = min_bytes
+        self.stats = defaultdict(LineStats)
+        self._stack = []  # [code, lineno, start, peak] per watched frame
+        self._started_tracemalloc = False
+        self._old_trace = None
+        self.peak = 0
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.peak = tracemalloc.get_traced_memory()[1]
+        self._old_trace = sys.gettrace()
+        sys.settrace(self._global_trace)
+        return self
+
+    def __exit__(self, *exc):
+        sys.settrace(self._old_trace)
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        return False
+
+    def _boundary(self):
+        """Close the line running in the innermost watched frame."""
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        # nested watched calls reset the peak, so propagate it outwards
+        for entry in self._stack:
+            entry[3] = max(entry[3], peak)
+        code, lineno, start, line_peak = self._stack[-1]
+        if lineno is not None:
+            s = self.stats[(code.co_filename, code.co_name, lineno)]
+            s.hits += 1
+            allocated = line_peak - start
+            if allocated >= self.min_bytes:
+                s.allocations += 1
+                s.bytes_allocated += allocated
+            s.peak_temporary = max(s.peak_temporary, line_peak - max(start, current))
+            s.net += current - start
+        tracemalloc.reset_peak()
+        return current
+
+    def _global_trace(self, frame, event, arg):
+        if event == "call" and frame.f_code in self.codes:
+            current = tracemalloc.get_traced_memory()[0]
+            self._stack.append([frame.f_code, None, current, current])
+            return self._local_trace
+        return None
+
+    def _local_trace(self, frame, event, arg):
+        if event == "line":
+            current = self._boundary()
+            self._stack[-1][1:] = [frame.f_lineno, current, current]
+        elif event == "return":
+            self._boundary()
+            self._stack.pop()
+        return self._local_trace
+
+    def report(self):
+        """Rows (file, function, line, LineStats), most bytes allocated first."""
+        rows = [(f, fn, ln, s) for (f, fn, ln), s in self.stats.items()]
+        return sorted(rows, key=lambda r: r[3].bytes_allocated, reverse=True)
+
+    def print_report(self, top=10):
+        print(
+            "%-24s %6s %7s %14s %12s %12s  %s"
+            % (
+                "function:line",
+                "hits",
+                "allocs",
+                "bytes alloc.",
+                "peak temp.",
+                "net",
+                "source",
+            )
+        )
+        for filename, func, lineno, s in self.report()[:top]:
+            source = linecache.getline(filename, lineno).strip()
+            print(
+                "%-24s %6d %7d %14d %12d %12d  %s"
+                % (
+                    "%s:%d" % (func, lineno),
+                    s.hits,
+                    s.allocations,
+                    s.bytes_allocated,
+                    s.peak_temporary,
+                    s.net,
+                    source,
+                )
+            )
+
+
+def track_allocations(func):
+    """Decorator printing the allocation report after every call."""
+
+    def wrapper(*args, **kwargs):
+        with AllocationTracker(func) as tracker:
+            result = func(*args, **kwargs)
+        tracker.print_report()
+        return result
+
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+# Loops from the tutorial
+def out_of_place(a, b, n):
+    for _ in range(n):
+        a = a + b
+    return a
+
+
+def in_place(a, b, n):
+    for _ in range(n):
+        a += b
+    return a
+
+
+if __name__ == "__main__":
+    print("NumPy tracemalloc domain:", np.lib.tracemalloc_domain)
+    for i in (100, 500, 1000):
+        b = np.ones((i, i))
+        with AllocationTracker(out_of_place, in_place) as tracker:
+            out_of_place(np.ones((i, i)), b, 100)
+            in_place(np.ones((i, i)), b, 100)
+        print("\nN = %d, one array is %d bytes" % (i, b.nbytes))
+        tracker.print_report()
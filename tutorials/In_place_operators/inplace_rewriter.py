@@ -0,0 +1,433 @@
+"""
+What? AST pass that rewrites 'a = a op b' array updates into
+      'np.op(a, b, out=a)'
+
+"Python's and NumPy's in-place operator functions" shows that 'a += b' on a
+NumPy array avoids the temporary created by 'a = a + b'. The @inplace
+decorator below applies that rewrite to a whole function:
+
+    1. the source of the function is parsed with the ast module
+    2. a name is a candidate only if it is a local that is always bound to a
+       freshly allocated value (a BinOp result, np.zeros, x.copy(), ...) and
+       never escapes: it is not a parameter, not global/nonlocal, not
+       captured by a nested function, not bound to another name, not
+       sliced/viewed into another variable, not passed to unknown code. This
+       proves that no other reference can observe the in-place update.
+    3. every 'a = a op b' (or 'a = b op a' for commutative ops) on such a name
+       becomes 'a = _inplace_binop(np.op, a, b)', which runs np.op(a, b,
+       out=a) when a is a writeable ndarray and b does not change its shape
+       or dtype, and falls back to 'a op b' otherwise.
+
+The decorated function exposes what was rewritten (inplace_report) and how
+many temporaries were actually avoided at run time (inplace_stats).
+
+Reference: https://docs.python.org/3/library/ast.html
+           https://numpy.org/doc/stable/reference/ufuncs.html#output-type-determination
+"""
+
+# Import modules
+import ast
+import inspect
+import operator
+import textwrap
+import timeit
+import functools
+import numpy as np
+
+# Elementwise operators that have an equivalent ufunc accepting out=
+UFUNCS = {
+    ast.Add: "add",
+    ast.Sub: "subtract",
+    ast.Mult: "multiply",
+    ast.Div: "true_divide",
+    ast.FloorDiv: "floor_divide",
+    ast.Mod: "remainder",
+    ast.Pow: "power",
+    ast.BitAnd: "bitwise_and",
+    ast.BitOr: "bitwise_or",
+    ast.BitXor: "bitwise_xor",
+    ast.LShift: "left_shift",
+    ast.RShift: "right_shift",
+}
+# Python operator used when the in-place ufunc does not apply
+OPERATORS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "true_divide": operator.truediv,
+    "floor_divide": operator.floordiv,
+    "remainder": operator.mod,
+    "power": operator.pow,
+    "bitwise_and": operator.and_,
+    "bitwise_or": operator.or_,
+    "bitwise_xor": operator.xor,
+    "left_shift": operator.lshift,
+    "right_shift": operator.rshift,
+}
+COMMUTATIVE = {"add", "multiply", "bitwise_and", "bitwise_or", "bitwise_xor"}
+
+# Calls returning a new array that the name can be bound to
+FRESH_NUMPY = {
+    "array", "zeros", "ones", "empty", "full", "zeros_like", "ones_like",
+    "empty_like", "full_like", "copy", "arange", "linspace", "eye", "identity",
+}  # fmt: skip
+FRESH_METHODS = {"copy", "astype"}
+# Uses of the name that cannot create another reference to the array
+SAFE_ATTRS = {
+    "shape", "dtype", "size", "ndim", "nbytes", "sum", "mean", "min", "max",
+    "std", "var", "any", "all", "copy", "astype", "dot", "item", "tolist",
+}  # fmt: skip
+SAFE_NUMPY = {
+    "sum", "mean", "min", "max", "std", "var", "dot", "sqrt", "exp", "log",
+    "abs", "sin", "cos", "allclose", "array_equal", "isclose", "copy", "all",
+    "any", "count_nonzero",
+}  # fmt: skip
+SAFE_BUILTINS = {"len", "print", "float", "int", "bool", "isinstance", "repr", "str"}
+NUMPY_NAMES = {"np", "numpy"}
+
+
+def _numpy_attr(func):
+    """'zeros' for np.zeros / numpy.zeros / np.random.zeros, else None."""
+    root = func
+    while isinstance(root, ast.Attribute):
+        root = root.value
+    if isinstance(func, ast.Attribute) and isinstance(root, ast.Name):
+        if root.id in NUMPY_NAMES:
+            return func.attr
+    return None
+
+
+def _copies(call):
+    """
+    False if the call may return its input: np.array(b, copy=False) and
+    a.astype(dtype, copy=False) give back the same array when no conversion
+    is needed. Only an absent copy= or the literal copy=True is trusted.
+    """
+    if isinstance(call.func, ast.Attribute) and call.func.attr == "astype":
+        # astype(dtype, order, casting, subok, copy)
+        if len(call.args) > 4:
+            return False
+    if any(isinstance(arg, ast.Starred) for arg in call.args):
+        return False
+    for kw in call.keywords:
+        if kw.arg is None:
+            return False  # **kwargs may hold copy=False
+        if kw.arg == "copy":
+            return isinstance(kw.value, ast.Constant) and kw.value.value is True
+    return True
+
+
+def _is_fresh(value):
+    if isinstance(
+        value, (ast.BinOp, ast.UnaryOp, ast.Constant, ast.List, ast.ListComp)
+    ):
+        return True
+    if isinstance(value, ast.Call):
+        if _numpy_attr(value.func) in FRESH_NUMPY:
+            return _copies(value)
+        if isinstance(value.func, ast.Attribute) and value.func.attr in FRESH_METHODS:
+            return _copies(value)
+    return False
+
+
+def _candidate(stmt):
+    """(name, ufunc name, other operand, swapped) if stmt is 'a = a op b'."""
+    if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1):
+        return None
+    target, value = stmt.targets[0], stmt.value
+    if not (isinstance(target, ast.Name) and isinstance(value, ast.BinOp)):
+        return None
+    ufunc = UFUNCS.get(type(value.op))
+    if ufunc is None:
+        return None
+    if isinstance(value.left, ast.Name) and value.left.id == target.id:
+        return target.id, ufunc, value.right, False
+    if ufunc in COMMUTATIVE:
+        if isinstance(value.right, ast.Name) and value.right.id == target.id:
+            return target.id, ufunc, value.left, True
+    return None
+
+
+class _Analysis(ast.NodeVisitor):
+    """Collects, for every local name, why it cannot be updated in place."""
+
+    def __init__(self, func_def):
+        self.func_def = func_def
+        self.unsafe = {}
+        self.parents = {}
+        for node in ast.walk(func_def):
+            for child in ast.iter_child_nodes(node):
+                self.parents[child] = node
+        args = func_def.args
+        for a in args.posonlyargs + args.args + args.kwonlyargs:
+            self.unsafe.setdefault(a.arg, "parameter")
+        for a in (args.vararg, args.kwarg):
+            if a is not None:
+                self.unsafe.setdefault(a.arg, "parameter")
+
+    def _mark(self, name, reason):
+        self.unsafe.setdefault(name, reason)
+
+    def _safe_use(self, node):
+        """True if this Load of a name cannot create a second reference."""
+        parent = self.parents.get(node)
+        if isinstance(parent, (ast.BinOp, ast.UnaryOp, ast.Compare)):
+            return True
+        if isinstance(parent, (ast.Tuple, ast.List)):
+            parent = self.parents.get(parent)
+        if isinstance(parent, ast.Return):
+            # nothing runs after a return, so nobody sees later updates
+            return True
+        if isinstance(parent, ast.Attribute) and parent.attr in SAFE_ATTRS:
+            if parent.attr != "astype":
+                return True
+            # a.astype(..., copy=False) may be a itself
+            call = self.parents.get(parent)
+            return isinstance(call, ast.Call) and call.func is parent and _copies(call)
+        if isinstance(parent, ast.Subscript) and parent.value is node:
+            if isinstance(parent.ctx, ast.Store):
+                return True
+            # a[i] is a view: safe only if the view itself is consumed safely
+            return self._safe_use(parent)
+        if isinstance(parent, ast.Call) and node in parent.args:
+            if _numpy_attr(parent.func) in SAFE_NUMPY:
+                return True
+            if isinstance(parent.func, ast.Name):
+                return parent.func.id in SAFE_BUILTINS
+        return False
+
+    def _in_nested_scope(self, node):
+        parent = self.parents.get(node)
+        while parent is not None and parent is not self.func_def:
+            if isinstance(parent, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                return True
+            parent = self.parents.get(parent)
+        return False
+
+    def visit_Global(self, node):
+        for name in node.names:
+            self._mark(name, "global")
+
+    def visit_Nonlocal(self, node):
+        for name in node.names:
+            self._mark(name, "nonlocal")
+
+    def visit_Assign(self, node):
+        simple = len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+        if simple and not _is_fresh(node.value):
+            self._mark(node.targets[0].id, "bound to a non-fresh value")
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if self._in_nested_scope(node):
+            self._mark(node.id, "captured by a nested function")
+        elif isinstance(node.ctx, ast.Load):
+            if not self._safe_use(node):
+                self._mark(node.id, "escapes (aliasing possible)")
+        elif isinstance(node.ctx, ast.Del):
+            self._mark(node.id, "deleted")
+        else:
+            parent = self.parents.get(node)
+            if isinstance(parent, ast.AugAssign):
+                return  # 'a += b' is already in place
+            if not isinstance(parent, ast.Assign) or len(parent.targets) != 1:
+                # for-loop targets, tuple unpacking, with ... as, walrus, ...
+                self._mark(node.id, "bound by unpacking or a loop")
+
+
+class _Rewriter(ast.NodeTransformer):
+    def __init__(self, unsafe, lines):
+        self.unsafe = unsafe
+        self.lines = lines
+        self.rewritten = []
+        self.skipped = []
+
+    def visit_Assign(self, node):
+        cand = _candidate(node)
+        if cand is None:
+            return node
+        name, ufunc, other, swapped = cand
+        line = self.lines[node.lineno - 1].strip()
+        if name in self.unsafe:
+            self.skipped.append((node.lineno, line, self.unsafe[name]))
+            return node
+        self.rewritten.append((node.lineno, line))
+        call = ast.Call(
+            func=ast.Name(id="_inplace_binop", ctx=ast.Load()),
+            args=[
+                ast.Constant(value=ufunc),
+                ast.Name(id=name, ctx=ast.Load()),
+                other,
+                ast.Constant(value=swapped),
+            ],
+            keywords=[],
+        )
+        new = ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=call)
+        return ast.copy_location(new, node)
+
+
+def _output_dtype(ufunc, a, b):
+    """
+    dtype the ufunc outputs for (a, b), or None; e.g. float64 for int64 / int64,
+    which cannot be written into an int64 a. Python scalars are passed as
+    their type so that they do not promote a (float32 + 0.5 stays float32).
+    """
+    other = type(b) if type(b) in (int, float, complex) else np.asarray(b).dtype
+    try:
+        out = ufunc.resolve_dtypes((a.dtype, other, None))[-1]
+    except (TypeError, np.exceptions.DTypePromotionError):
+        return None
+    return out if np.can_cast(out, a.dtype, "same_kind") else None
+
+
+def _make_binop(stats):
+    def _inplace_binop(ufunc, a, b, swapped):
+        if (
+            isinstance(a, np.ndarray)
+            and a.flags.writeable
+            and _output_dtype(getattr(np, ufunc), a, b) == a.dtype
+            and np.broadcast_shapes(a.shape, np.shape(b)) == a.shape
+        ):
+            stats["inplace"] += 1
+            return getattr(np, ufunc)(a, b, out=a)
+        stats["fallback"] += 1
+        # keep the original operator semantics (lists, scalars, ...)
+        op = OPERATORS[ufunc]
+        return op(b, a) if swapped else op(a, b)
+
+    return _inplace_binop
+
+
+def inplace(func=None, verbose=False):
+    """
+    Decorator rewriting safe 'a = a op b' array updates into in-place ufuncs.
+
+    Functions whose source is unavailable or is not a def statement
+    (lambdas), and functions that close over variables, are returned
+    unchanged (with an empty report).
+    """
+    if func is None:
+        return functools.partial(inplace, verbose=verbose)
+
+    stats = {"inplace": 0, "fallback": 0}
+    report = {"rewritten": [], "skipped": []}
+    try:
+        source = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        source = None
+    try:
+        module = ast.parse(source) if source is not None else None
+    except SyntaxError:
+        # e.g. the source line of a lambda inside a larger expression
+        module = None
+    func_def = module.body[0] if module is not None and module.body else None
+    if (
+        not isinstance(func_def, (ast.FunctionDef, ast.AsyncFunctionDef))
+        or func_def.name != func.__name__
+        or func.__code__.co_freevars
+    ):
+        func.inplace_report, func.inplace_stats = report, stats
+        return func
+
+    func_def.decorator_list = []
+    analysis = _Analysis(func_def)
+    analysis.visit(func_def)
+    rewriter = _Rewriter(analysis.unsafe, source.splitlines())
+    rewriter.visit(func_def)
+    report["rewritten"], report["skipped"] = rewriter.rewritten, rewriter.skipped
+
+    # wrap the function in a factory so _inplace_binop is a closure variable
+    # and the module globals stay untouched
+    factory = ast.FunctionDef(
+        name="_inplace_factory",
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg="_inplace_binop")],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        ),
+        body=[func_def, ast.Return(value=ast.Name(id=func_def.name, ctx=ast.Load()))],
+        decorator_list=[],
+    )
+    module.body = [factory]
+    ast.fix_missing_locations(module)
+    first_line = func.__code__.co_firstlineno - 1
+    ast.increment_lineno(module, first_line)
+    code = compile(module, inspect.getsourcefile(func) or "<inplace>", "exec")
+    namespace = {}
+    exec(code, func.__globals__, namespace)
+    new_func = namespace["_inplace_factory"](_make_binop(stats))
+    new_func = functools.wraps(func)(new_func)
+    new_func.__wrapped__ = func
+    new_func.inplace_report, new_func.inplace_stats = report, stats
+
+    if verbose:
+        print(
+            "@inplace %s: %d update(s) rewritten, %d skipped"
+            % (func.__name__, len(report["rewritten"]), len(report["skipped"]))
+        )
+        for lineno, line in report["rewritten"]:
+            print("  line %d rewritten: %s" % (lineno + first_line, line))
+        for lineno, line, reason in report["skipped"]:
+            print("  line %d skipped (%s): %s" % (lineno + first_line, reason, line))
+    return new_func
+
+
+if __name__ == "__main__":
+
+    def smooth(b, n):
+        a = np.ones_like(b)
+        for _ in range(n):
+            a = a + b
+            a = a * 0.5
+            a = 2.0 * a
+        return a
+
+    def not_safe(b, n):
+        a = np.ones_like(b)
+        view = a[1:]  # view aliases a, the rewrite would change it
+        for _ in range(n):
+            a = a + b
+        return a, view
+
+    def alias_array(b):
+        a = np.array(b, copy=False)  # a is b: no copy needed
+        a = a + 1
+        return a
+
+    def alias_astype(a):
+        c = a.astype(a.dtype, copy=False)  # c is a: same dtype
+        c = c + 1
+        return c
+
+    def divide(n):
+        a = np.arange(n)
+        a = a / 2  # int64 / int -> float64, cannot go into a
+        return a
+
+    smooth_inplace = inplace(smooth, verbose=True)
+    not_safe_inplace = inplace(not_safe, verbose=True)
+
+    # the rewrite must never change what the caller sees
+    for func, make in (
+        (alias_array, lambda: np.zeros(3, dtype=int)),
+        (alias_astype, lambda: np.zeros(3)),
+        (divide, lambda: 5),
+    ):
+        x, y = make(), make()
+        expected, got = func(x), inplace(func)(y)
+        assert np.array_equal(expected, got) and expected.dtype == got.dtype
+        assert np.array_equal(x, y), "%s changed its input" % func.__name__
+
+    b = np.random.default_rng(0).random((1000, 1000))
+    assert np.allclose(smooth(b, 10), smooth_inplace(b, 10))
+    assert all(
+        np.allclose(x, y) for x, y in zip(not_safe(b, 3), not_safe_inplace(b, 3))
+    )
+
+    t_orig = min(timeit.Timer(lambda: smooth(b, 10)).repeat(repeat=3, number=5))
+    t_new = min(timeit.Timer(lambda: smooth_inplace(b, 10)).repeat(repeat=3, number=5))
+    print("\noriginal : %.3f s" % t_orig)
+    print("@inplace : %.3f s" % t_new)
+    print("temporaries avoided at run time:", smooth_inplace.inplace_stats)
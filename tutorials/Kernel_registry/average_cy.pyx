@@ -0,0 +1,31 @@
+# cython: language_level=3
+"""
+The Cython versions of average_* from "NumPy vs. Numba vs. Cython".
+
+s is a double here: the float of the notebook stops growing once s reaches
+2**24 * ulp, which at n = 10**7 gives a visibly wrong average.
+"""
+
+import random
+from libc.stdlib cimport rand
+
+cdef extern from "limits.h":
+    int INT_MAX
+
+
+def average_cy1(int n):
+    """Static type declarations for the variables n, i, and s."""
+    cdef int i
+    cdef double s = 0
+    for i in range(n):
+        s += random.random()
+    return s / n
+
+
+def average_cy2(int n):
+    """C random number generator, no Python object in the loop."""
+    cdef int i
+    cdef double s = 0
+    for i in range(n):
+        s += rand() / <double>INT_MAX
+    return s / n
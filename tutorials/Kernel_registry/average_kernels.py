@@ -0,0 +1,96 @@
+"""
+What? The average_* variants of "NumPy vs. Numba vs. Cython" registered as
+      backends of one "average" operation
+
+The Cython backends need
+
+    python setup_average.py build_ext --inplace
+
+and are listed as unavailable otherwise.
+"""
+
+# Import modules
+import os
+import sys
+import random
+import tempfile
+import numpy as np
+import numba
+from kernel_registry import KernelRegistry
+
+try:
+    from average_cy import average_cy1, average_cy2
+except ImportError:
+    average_cy1 = average_cy2 = None
+
+registry = KernelRegistry()
+
+
+def _size(n):
+    return (n,)
+
+
+def _close_to_half(result, n):
+    """The mean of n uniform numbers is 0.5 +- 1/sqrt(12 n), allow 6 sigma."""
+    return abs(result - 0.5) < 6 / np.sqrt(12 * n) + 1e-12
+
+
+def average_py(n):
+    s = 0
+    for i in range(n):
+        s += random.random()
+    return s / n
+
+
+def average_listcomp(n):
+    return sum([random.random() for _ in range(n)]) / n
+
+
+def average_np(n):
+    s = np.random.random(n)
+    return s.mean()
+
+
+average_nb = numba.jit(average_py)
+
+for backend, func in (
+    ("python", average_py),
+    ("python_listcomp", average_listcomp),
+    ("numpy", average_np),
+    ("numba", average_nb),
+    ("cython_typed", average_cy1),
+    ("cython_crand", average_cy2),
+):
+    registry.register("average", backend, make_args=_size, check=_close_to_half)(func)
+
+
+if __name__ == "__main__":
+    # by default the fleet file goes to the temporary folder, not the cwd
+    if len(sys.argv) > 1:
+        fleet_file = sys.argv[1]
+    else:
+        fleet_file = os.path.join(tempfile.gettempdir(), "average_fleet.json")
+    print("Host %s: %s" % (registry.host, registry.fingerprint))
+    print("Available backends:", registry.backends("average"))
+    print(
+        "Unavailable       :",
+        sorted(
+            set(registry.backends("average", False)) - set(registry.backends("average"))
+        ),
+    )
+
+    for n in [10**k for k in range(2, 8)]:
+        winner = registry.winner("average", n)
+        print(
+            "n = %9d -> %-16s average = %.4f" % (n, winner, registry("average", n, n))
+        )
+
+    print("\n%10s %-16s %s" % ("n <=", "winner", "seconds per backend"))
+    for size, winner, seconds in registry.table("average"):
+        cells = ", ".join(
+            "%s %.2e" % kv for kv in sorted(seconds.items(), key=lambda kv: kv[1])
+        )
+        print("%10d %-16s %s" % (size, winner, cells))
+
+    registry.export_results(fleet_file)
+    print("\nResults cached in %s and exported to %s" % (registry.path, fleet_file))
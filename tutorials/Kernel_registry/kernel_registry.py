@@ -0,0 +1,237 @@
+"""
+What? Multi-backend kernel registry with per-host, per-size autotuning
+
+"NumPy vs. Numba vs. Cython" writes average_* five ways and picks the fastest
+by eye from %time. Here one logical operation has several implementations,
+each registered with its backend:
+
+    registry = KernelRegistry()
+
+    @registry.register("average", "numpy", make_args=lambda n: (n,))
+    def average_np(n):
+        ...
+
+    registry("average", n, n)  # size, then the kernel arguments
+
+On the first call for a (host, operation, size bucket) every available
+implementation is timed, the winner is saved in a JSON file under
+cache_dir/<host id>.json and later calls dispatch straight to it. Size
+buckets are powers of 2, so tuning runs at most once per octave of size.
+
+export_results() merges the tables of this host into a fleet-wide JSON file,
+and import_results() loads the entries of a fleet file that match this host,
+so a tuning run on one machine of a kind serves all of them.
+
+Reference: https://github.com/yhilpisch/py4fi2nd/blob/master/code/ch10/10_performance_python.ipynb
+"""
+
+# Import modules
+import os
+import json
+import time
+import hashlib
+import platform
+from datetime import datetime, timezone
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "hpc_kernel_registry"
+)
+
+
+def host_fingerprint():
+    """What makes timings comparable between two machines."""
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu": cpu,
+        "cores": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def host_id(fingerprint=None):
+    fingerprint = fingerprint or host_fingerprint()
+    blob = json.dumps(fingerprint, sort_keys=True).encode()
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+
+def size_bucket(n):
+    """Power-of-2 bucket of the input size, as a string for JSON keys."""
+    return str(max(0, int(n) - 1).bit_length())
+
+
+class Kernel:
+    def __init__(self, op, backend, func, make_args, check):
+        self.op = op
+        self.backend = backend
+        self.func = func
+        self.make_args = make_args
+        self.check = check
+
+    def __repr__(self):
+        return "Kernel(%r, %r)" % (self.op, self.backend)
+
+
+class KernelRegistry:
+    def __init__(self, cache_dir=None, repeat=3, max_seconds=2.0):
+        self.cache_dir = cache_dir or os.environ.get(
+            "HPC_KERNEL_CACHE", DEFAULT_CACHE_DIR
+        )
+        self.repeat = repeat
+        self.max_seconds = max_seconds
+        self.kernels = {}  # op -> {backend: Kernel}
+        self.fingerprint = host_fingerprint()
+        self.host = host_id(self.fingerprint)
+        self.results = self._load()
+
+    # Registration
+    def register(self, op, backend, make_args=None, check=None):
+        """
+        Decorator registering the 'backend' implementation of op.
+        make_args(n) builds the arguments of a size-n tuning call and
+        check(result, n) rejects a wrong result. Decorating None (e.g. a
+        backend that failed to import) keeps the backend listed but
+        unavailable.
+        """
+
+        def decorator(func):
+            kernel = Kernel(op, backend, func, make_args, check)
+            self.kernels.setdefault(op, {})[backend] = kernel
+            return func
+
+        return decorator
+
+    def backends(self, op, available=True):
+        kernels = self.kernels.get(op, {})
+        return [b for b, k in kernels.items() if k.func is not None or not available]
+
+    # Tuning
+    def _time(self, kernel, args):
+        best, result = float("inf"), None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = kernel.func(*args)
+            elapsed = time.perf_counter() - start
+            best = min(best, elapsed)
+            if elapsed > self.max_seconds:
+                break  # too slow to be worth repeating
+        return best, result
+
+    def autotune(self, op, n, save=True):
+        """Time every available backend of op at size n and store the winner."""
+        timings, rejected = {}, []
+        for backend in self.backends(op):
+            kernel = self.kernels[op][backend]
+            if kernel.make_args is None:
+                raise ValueError("%r has no make_args, it cannot be tuned" % kernel)
+            args = kernel.make_args(n)
+            kernel.func(*kernel.make_args(min(n, 16)))  # JIT compilation
+            seconds, result = self._time(kernel, args)
+            if kernel.check is not None and not kernel.check(result, n):
+                rejected.append(backend)
+                continue
+            timings[backend] = seconds
+        if not timings:
+            raise RuntimeError("No backend of %r passed its check at n=%d" % (op, n))
+        entry = {
+            "winner": min(timings, key=timings.get),
+            "n": int(n),
+            "seconds": timings,
+            "rejected": rejected,
+            "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self.results.setdefault(op, {})[size_bucket(n)] = entry
+        if save:
+            self.save()
+        return entry
+
+    def winner(self, op, n, tune=True):
+        entry = self.results.get(op, {}).get(size_bucket(n))
+        if entry is not None and entry["winner"] in self.backends(op):
+            return entry["winner"]
+        if not tune:
+            return None
+        return self.autotune(op, n)["winner"]
+
+    def __call__(self, op, n, *args, **kwargs):
+        """Run op with the backend tuned for size n."""
+        return self.kernels[op][self.winner(op, n)].func(*args, **kwargs)
+
+    # Persistence
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, "%s.json" % self.host)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)["results"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = "%s.%d.tmp" % (self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump({"host": self.fingerprint, "results": self.results}, f, indent=1)
+        os.replace(tmp, self.path)  # atomic, concurrent processes never see half a file
+
+    def export_results(self, path):
+        """Merge this host's table into the fleet file at path."""
+        try:
+            with open(path) as f:
+                fleet = json.load(f)
+        except (OSError, ValueError):
+            fleet = {}
+        fleet[self.host] = {"host": self.fingerprint, "results": self.results}
+        # written next to path and renamed, as in save(): a crash or another
+        # host reading the shared file never sees half a fleet
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(fleet, f, indent=1)
+        os.replace(tmp, path)
+        return fleet
+
+    def import_results(self, path, overwrite=False):
+        """
+        Load the fleet entries of this host. Without an exact match the
+        entries of a host with the same cpu, machine and cores are used.
+        """
+        with open(path) as f:
+            fleet = json.load(f)
+        source = fleet.get(self.host)
+        if source is None:
+            same = ("cpu", "machine", "cores")
+            for other in fleet.values():
+                if all(other["host"].get(k) == self.fingerprint[k] for k in same):
+                    source = other
+                    break
+        if source is None:
+            return 0
+        count = 0
+        for op, buckets in source["results"].items():
+            for bucket, entry in buckets.items():
+                if overwrite or bucket not in self.results.get(op, {}):
+                    self.results.setdefault(op, {})[bucket] = entry
+                    count += 1
+        self.save()
+        return count
+
+    def table(self, op):
+        """Rows (bucket upper size, winner, {backend: seconds}) sorted by size."""
+        rows = self.results.get(op, {})
+        return [
+            (2 ** int(b), rows[b]["winner"], rows[b]["seconds"])
+            for b in sorted(rows, key=int)
+        ]
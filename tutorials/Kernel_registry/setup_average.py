@@ -0,0 +1,12 @@
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    ext_modules=cythonize(
+        [
+            "average_cy.pyx",
+        ],
+        annotate=True,
+        language_level=3,
+    )
+)
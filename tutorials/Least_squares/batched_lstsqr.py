@@ -0,0 +1,174 @@
+"""
+What? Batched least-squares line fits over many independent series
+
+The tutorial fits one line per call; with one regression per sensor and
+millions of sensors the Python call overhead dominates. Here one call fits
+every series, in parallel over series with numba:
+
+    slope, intercept = lstsqr_batched(x, y)            # (n_series, n_points)
+    slope, intercept = lstsqr_batched(t, y)            # t (n_points,) shared
+    slope, intercept = lstsqr_ragged(offsets, x, y)    # series i is
+                                                       # x[offsets[i]:offsets[i+1]]
+
+Each series uses the same two-pass formula as python_lstsqr (means first,
+then centred sums), which is stable far from the origin. Series with fewer
+than 2 points or a constant x get NaN.
+"""
+
+# Import modules
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def _fit(x, y):
+    n = x.shape[0]
+    if n < 2:
+        return np.nan, np.nan
+    x_avg = 0.0
+    y_avg = 0.0
+    for i in range(n):
+        x_avg += x[i]
+        y_avg += y[i]
+    x_avg /= n
+    y_avg /= n
+    var_x = 0.0
+    cov_xy = 0.0
+    for i in range(n):
+        temp = x[i] - x_avg
+        var_x += temp * temp
+        cov_xy += temp * (y[i] - y_avg)
+    if var_x == 0.0:
+        return np.nan, np.nan
+    slope = cov_xy / var_x
+    return slope, y_avg - slope * x_avg
+
+
+@njit(parallel=True, cache=True)
+def _batched_2d(x, y, slope, intercept):
+    for s in prange(y.shape[0]):
+        slope[s], intercept[s] = _fit(x[s], y[s])
+
+
+@njit(parallel=True, cache=True)
+def _batched_shared_x(x, y, slope, intercept):
+    for s in prange(y.shape[0]):
+        slope[s], intercept[s] = _fit(x, y[s])
+
+
+@njit(parallel=True, cache=True)
+def _batched_ragged(offsets, x, y, slope, intercept):
+    for s in prange(offsets.shape[0] - 1):
+        lo, hi = offsets[s], offsets[s + 1]
+        slope[s], intercept[s] = _fit(x[lo:hi], y[lo:hi])
+
+
+def lstsqr_batched(x, y):
+    """
+    Slope and intercept arrays, one entry per row of y. x is either shaped
+    like y or a 1-D array of n_points shared by every series.
+    """
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    if y.ndim != 2:
+        raise ValueError("y must be (n_series, n_points), got %s" % (y.shape,))
+    slope = np.empty(y.shape[0])
+    intercept = np.empty(y.shape[0])
+    if x.ndim == 1 and x.shape[0] == y.shape[1]:
+        _batched_shared_x(x, y, slope, intercept)
+    elif x.shape == y.shape:
+        _batched_2d(x, y, slope, intercept)
+    else:
+        raise ValueError("x %s does not match y %s" % (x.shape, y.shape))
+    return slope, intercept
+
+
+def lstsqr_ragged(offsets, x, y):
+    """Series of different lengths stored back to back, CSR style."""
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x and y must be 1-D arrays of the same length")
+    if offsets.ndim != 1 or len(offsets) < 1:
+        raise ValueError("offsets must be a 1-D array with at least one entry (0)")
+    if offsets[0] != 0 or offsets[-1] != len(x) or np.any(np.diff(offsets) < 0):
+        raise ValueError("offsets must rise from 0 to len(x)")
+    n_series = len(offsets) - 1
+    slope = np.empty(n_series)
+    intercept = np.empty(n_series)
+    _batched_ragged(offsets, x, y, slope, intercept)
+    return slope, intercept
+
+
+def lstsqr_batched_numpy(x, y):
+    """Vectorised NumPy version (2-D x), for comparison: allocates 4 (n_series, n_points) temporaries."""
+    dx = x - x.mean(axis=1, keepdims=True)
+    y_avg = y.mean(axis=1)
+    slope = (dx * (y - y_avg[:, None])).sum(axis=1) / (dx * dx).sum(axis=1)
+    return slope, y_avg - slope * x.mean(axis=1)
+
+
+def python_lstsqr(x_list, y_list):
+    """The tutorial version, called once per series."""
+    N = len(x_list)
+    x_avg = sum(x_list) / N
+    y_avg = sum(y_list) / N
+    var_x, cov_xy = 0, 0
+    for x, y in zip(x_list, y_list):
+        temp = x - x_avg
+        var_x += temp**2
+        cov_xy += temp * (y - y_avg)
+    slope = cov_xy / var_x
+    y_interc = y_avg - slope * x_avg
+    return (slope, y_interc)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n_series, n_points = 10**6, 16
+    x = np.cumsum(rng.random((n_series, n_points)), axis=1)
+    true_slope = rng.standard_normal(n_series)
+    y = true_slope[:, None] * x + 3.0 + 0.1 * rng.standard_normal((n_series, n_points))
+
+    # checks, on a few series
+    s, b = lstsqr_batched(x[:100], y[:100])
+    ref = np.array(
+        [python_lstsqr(xi.tolist(), yi.tolist()) for xi, yi in zip(x[:100], y[:100])]
+    )
+    np.testing.assert_allclose(np.c_[s, b], ref, rtol=1e-10)
+    lengths = rng.integers(0, 30, 1000)
+    offsets = np.r_[0, np.cumsum(lengths)]
+    xr, yr = rng.random(offsets[-1]), rng.random(offsets[-1])
+    s, b = lstsqr_ragged(offsets, xr, yr)
+    for i in np.flatnonzero(lengths >= 2)[:50]:
+        lo, hi = offsets[i], offsets[i + 1]
+        np.testing.assert_allclose(
+            (s[i], b[i]), python_lstsqr(xr[lo:hi], yr[lo:hi]), rtol=1e-10
+        )
+    assert np.isnan(s[lengths < 2]).all()
+    t = np.arange(n_points, dtype=np.float64)
+    np.testing.assert_allclose(
+        lstsqr_batched(t, y[:10])[0], lstsqr_batched(np.tile(t, (10, 1)), y[:10])[0]
+    )
+    print("Batched, ragged and shared-x fits agree with python_lstsqr")
+
+    lstsqr_batched(x[:10], y[:10])  # compile
+    print("\n%d series x %d points" % (n_series, n_points))
+    start = time.perf_counter()
+    for i in range(10**4):
+        python_lstsqr(x[i], y[i])
+    loop = (time.perf_counter() - start) * n_series / 10**4
+    print(
+        "%-28s %8.2f s (extrapolated from 10**4 series)"
+        % ("python_lstsqr per series", loop)
+    )
+    for name, f in (
+        ("NumPy vectorised", lstsqr_batched_numpy),
+        ("numba batched", lstsqr_batched),
+    ):
+        start = time.perf_counter()
+        f(x, y)
+        print("%-28s %8.2f s" % (name, time.perf_counter() - start))
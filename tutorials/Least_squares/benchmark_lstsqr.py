@@ -0,0 +1,53 @@
+"""
+What? The timeit benchmark of "Cython - Bridging the gap between Python and
+      Fortran", run on whichever of the compiled kernels are built
+
+Build them first with
+
+    python setup_lstsqr.py build_ext --inplace
+
+Backends that are missing are reported and left out of the table.
+"""
+
+# Import modules
+import timeit
+import platform
+import numpy as np
+from lstsqr_kernels import BACKENDS, available_backends, lstsqr
+
+orders_n = [10**n for n in range(1, 7)]
+# the pure Python loop is skipped above this size
+PYTHON_MAX_N = 10**5
+
+
+def time_backend(name, x, y, number):
+    """Best of 3 repeats, seconds per call."""
+    func = BACKENDS[name]
+    if name != "python":
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+    return min(timeit.repeat(lambda: func(x, y), repeat=3, number=number)) / number
+
+
+if __name__ == "__main__":
+    names = available_backends()
+    missing = [name for name in BACKENDS if name not in names]
+    print("Python %s, NumPy %s" % (platform.python_version(), np.__version__))
+    if missing:
+        print("Not built, left out: %s" % ", ".join(missing))
+
+    rng = np.random.default_rng(12345)
+    print("\n%9s" % "n" + "".join("%14s" % name for name in names) + "  [s per call]")
+    for n in orders_n:
+        x = np.arange(n) * rng.integers(8, 12, n) / 10
+        y = np.arange(n) * rng.integers(10, 14, n) / 10
+        reference = lstsqr(x, y, "numpy")
+        row = []
+        for name in names:
+            if name == "python" and n > PYTHON_MAX_N:
+                row.append("%14s" % "-")
+                continue
+            np.testing.assert_allclose(lstsqr(x, y, name), reference, rtol=1e-9)
+            number = max(1, 10**5 // n)
+            row.append("%14.3e" % time_backend(name, x, y, number))
+        print("%9d" % n + "".join(row))
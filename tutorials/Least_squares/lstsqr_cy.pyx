@@ -0,0 +1,31 @@
+# cython_lstsqr from "Cython - Bridging the gap between Python and Fortran"
+cimport cython
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef cython_lstsqr(x_ary, y_ary):
+    """ Computes the least-squares solution to a linear matrix equation. """
+    cdef double x_avg, y_avg, var_x, cov_xy, slope, y_interc, temp
+    cdef const double[:] x = x_ary  # memoryview
+    cdef const double[:] y = y_ary
+    cdef Py_ssize_t N, i
+
+    N = x.shape[0]
+    x_avg = 0
+    y_avg = 0
+    for i in range(N):
+        x_avg += x[i]
+        y_avg += y[i]
+    x_avg = x_avg / N
+    y_avg = y_avg / N
+    var_x = 0
+    cov_xy = 0
+    for i in range(N):
+        temp = x[i] - x_avg
+        var_x += temp**2
+        cov_xy += temp * (y[i] - y_avg)
+    slope = cov_xy / var_x
+    y_interc = y_avg - slope * x_avg
+    return (slope, y_interc)
@@ -0,0 +1,32 @@
+! fortran_lstsqr from "Cython - Bridging the gap between Python and Fortran",
+! with explicit-shape arrays so that f2py can infer n from x.
+!
+!     python setup_lstsqr.py build_ext --inplace
+!
+! builds it as the lstsqr_f extension module.
+
+SUBROUTINE fortran_lstsqr(ary_x, ary_y, n, slope, y_interc)
+    ! Computes the least-squares solution to a linear matrix equation.
+    IMPLICIT NONE
+    INTEGER(8), INTENT(in) :: n
+    REAL(8), INTENT(in), DIMENSION(n) :: ary_x, ary_y
+    REAL(8), INTENT(out) :: slope, y_interc
+    REAL(8) :: x_avg, y_avg, var_x, cov_xy, temp
+    INTEGER(8) :: i
+    !f2py integer(8) intent(hide), depend(ary_x) :: n = shape(ary_x, 0)
+
+    x_avg = SUM(ary_x) / n
+    y_avg = SUM(ary_y) / n
+    var_x = 0
+    cov_xy = 0
+
+    DO i = 1, n
+        temp = ary_x(i) - x_avg
+        var_x = var_x + temp**2
+        cov_xy = cov_xy + (temp*(ary_y(i) - y_avg))
+    END DO
+
+    slope = cov_xy / var_x
+    y_interc = y_avg - slope*x_avg
+
+END SUBROUTINE fortran_lstsqr
@@ -0,0 +1,92 @@
+"""
+What? One lstsqr entry point over the Python, NumPy, Cython and Fortran
+      versions of "Cython - Bridging the gap between Python and Fortran"
+
+The notebook builds the Fortran version with the fortranmagic IPython
+extension, which only works inside a notebook. Here the compiled kernels
+are extension modules built by
+
+    python setup_lstsqr.py build_ext --inplace
+
+and are optional: lstsqr() uses the first available backend of PREFERENCE,
+so without gfortran it runs the Cython kernel, and without a build the
+NumPy one.
+"""
+
+# Import modules
+import numpy as np
+
+try:
+    from lstsqr_f import fortran_lstsqr
+except ImportError:
+    fortran_lstsqr = None
+
+try:
+    from lstsqr_cy import cython_lstsqr
+except ImportError:
+    cython_lstsqr = None
+
+
+def python_lstsqr(x_list, y_list):
+    """Computes the least-squares solution to a linear matrix equation."""
+    N = len(x_list)
+    x_avg = sum(x_list) / N
+    y_avg = sum(y_list) / N
+    var_x, cov_xy = 0, 0
+    for x, y in zip(x_list, y_list):
+        temp = x - x_avg
+        var_x += temp**2
+        cov_xy += temp * (y - y_avg)
+    slope = cov_xy / var_x
+    y_interc = y_avg - slope * x_avg
+    return (slope, y_interc)
+
+
+def numpy_lstsqr(x_ary, y_ary):
+    """Same two passes, vectorised."""
+    x_avg = x_ary.mean()
+    y_avg = y_ary.mean()
+    temp = x_ary - x_avg
+    slope = (temp @ (y_ary - y_avg)) / (temp @ temp)
+    return (float(slope), float(y_avg - slope * x_avg))
+
+
+BACKENDS = {
+    "fortran": fortran_lstsqr,
+    "cython": cython_lstsqr,
+    "numpy": numpy_lstsqr,
+    "python": python_lstsqr,
+}
+PREFERENCE = ("fortran", "cython", "numpy")
+
+
+def available_backends():
+    return [name for name, func in BACKENDS.items() if func is not None]
+
+
+def lstsqr(x, y, backend=None):
+    """(slope, y_interc) with the given backend, or the fastest one built."""
+    if backend is None:
+        backend = next(name for name in PREFERENCE if BACKENDS[name] is not None)
+    func = BACKENDS.get(backend)
+    if func is None:
+        raise ValueError(
+            "Backend %r is not available, choose from %s"
+            % (backend, available_backends())
+        )
+    if backend != "python":
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+    return func(x, y)
+
+
+if __name__ == "__main__":
+    print("Available backends: %s" % ", ".join(available_backends()))
+    rng = np.random.default_rng(12345)
+    x = np.arange(500) * rng.integers(8, 12, 500) / 10
+    y = np.arange(100, 600) * rng.integers(8, 12, 500) / 10
+    reference = python_lstsqr(x, y)
+    for name in available_backends():
+        np.testing.assert_allclose(lstsqr(x, y, name), reference, rtol=1e-12)
+        print("%-8s slope %.10f intercept %.10f" % (name, *lstsqr(x, y, name)))
+    print("lstsqr() uses %s" % next(n for n in PREFERENCE if BACKENDS[n] is not None))
@@ -0,0 +1,243 @@
+"""
+What? Single-pass, mergeable least-squares fits for streamed data
+
+python_lstsqr, cython_lstsqr and fortran_lstsqr in "Cython - Bridging the
+gap between Python and Fortran" need x and y in memory and read them twice:
+once for the means, once for var(x) and cov(x, y). Here:
+
+    - OnlineLinearFit keeps (n, mean_x, mean_y, Sxx, Sxy, Syy), updated per
+      point with Welford's recurrence or per chunk with Chan et al.'s
+      pairwise formula. Two states merge exactly like two chunks, so workers
+      can fit disjoint parts of the data and be combined afterwards.
+    - OnlineQR keeps the triangular factor R of [X | y] (with a column of
+      ones for the intercept). A chunk is absorbed by re-factorising
+      [R; X_chunk | y_chunk], two states merge by factorising [R_a; R_b].
+      The coefficients come from R by back substitution, never through the
+      normal equations X^T X, whose condition number is squared.
+
+Reference: https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Covariance
+           Golub & Van Loan, Matrix Computations, section 6.5 (updating QR)
+"""
+
+# Import modules
+import numpy as np
+from scipy.linalg import solve_triangular
+
+
+class OnlineLinearFit:
+    """y = slope x + intercept, fitted one point or one chunk at a time."""
+
+    __slots__ = ("n", "mean_x", "mean_y", "sxx", "sxy", "syy")
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.sxx = self.sxy = self.syy = 0.0
+
+    def push(self, x, y):
+        """Welford update with a single point."""
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        # dx uses the old mean, (y - mean_y) the new one: exact co-moment update
+        self.sxx += dx * (x - self.mean_x)
+        self.sxy += dx * (y - self.mean_y)
+        self.syy += dy * (y - self.mean_y)
+        return self
+
+    @classmethod
+    def from_chunk(cls, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        out = cls()
+        if len(x) == 0:
+            return out
+        out.n = len(x)
+        out.mean_x = float(x.mean())
+        out.mean_y = float(y.mean())
+        dx = x - out.mean_x
+        dy = y - out.mean_y
+        out.sxx = float(dx @ dx)
+        out.sxy = float(dx @ dy)
+        out.syy = float(dy @ dy)
+        return out
+
+    def update(self, x, y):
+        """Absorb a chunk of points."""
+        return self.merge(OnlineLinearFit.from_chunk(x, y), inplace=True)
+
+    def merge(self, other, inplace=False):
+        out = self if inplace else OnlineLinearFit()
+        if other.n == 0:
+            if not inplace:
+                out.n, out.mean_x, out.mean_y = self.n, self.mean_x, self.mean_y
+                out.sxx, out.sxy, out.syy = self.sxx, self.sxy, self.syy
+            return out
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        w = self.n * other.n / n
+        out.sxx = self.sxx + other.sxx + dx * dx * w
+        out.sxy = self.sxy + other.sxy + dx * dy * w
+        out.syy = self.syy + other.syy + dy * dy * w
+        out.mean_x = self.mean_x + dx * other.n / n
+        out.mean_y = self.mean_y + dy * other.n / n
+        out.n = n
+        return out
+
+    @property
+    def slope(self):
+        return self.sxy / self.sxx
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    @property
+    def r2(self):
+        return self.sxy**2 / (self.sxx * self.syy)
+
+    def result(self):
+        """(slope, y_interc), like python_lstsqr."""
+        return (self.slope, self.intercept)
+
+
+class OnlineQR:
+    """Multivariate least squares y ~ X b (+ intercept) by incremental QR."""
+
+    def __init__(self, n_features, fit_intercept=True):
+        self.n_features = n_features
+        self.fit_intercept = fit_intercept
+        self.n = 0
+        width = n_features + fit_intercept + 1  # [1 | X | y]
+        self.R = np.zeros((0, width))
+
+    def _augment(self, X, y):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        y = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+        cols = [X, y]
+        if self.fit_intercept:
+            cols.insert(0, np.ones((len(X), 1)))
+        return np.hstack(cols)
+
+    def _absorb(self, rows):
+        R = np.linalg.qr(np.vstack([self.R, rows]), mode="r")
+        # keep at most width rows: R stays (width, width) whatever n is
+        self.R = R[: self.R.shape[1]]
+
+    def update(self, X, y):
+        A = self._augment(X, y)
+        self.n += len(A)
+        self._absorb(A)
+        return self
+
+    def merge(self, other):
+        out = OnlineQR(self.n_features, self.fit_intercept)
+        out.R = self.R
+        out.n = self.n + other.n
+        out._absorb(other.R)
+        return out
+
+    def coef(self):
+        """(coefficients, intercept); intercept is 0.0 without fit_intercept."""
+        p = self.R.shape[1] - 1
+        if self.R.shape[0] < p:
+            raise ValueError("Need at least %d points, got %d" % (p, self.n))
+        beta = solve_triangular(self.R[:p, :p], self.R[:p, p])
+        if self.fit_intercept:
+            return beta[1:], float(beta[0])
+        return beta, 0.0
+
+    def residual_norm(self):
+        """||y - X b|| of the fitted coefficients, read off R."""
+        p = self.R.shape[1] - 1
+        return float(abs(self.R[p, p])) if self.R.shape[0] > p else 0.0
+
+
+def python_lstsqr(x_list, y_list):
+    """The tutorial version: two passes over in-memory data."""
+    N = len(x_list)
+    x_avg = sum(x_list) / N
+    y_avg = sum(y_list) / N
+    var_x, cov_xy = 0, 0
+    for x, y in zip(x_list, y_list):
+        temp = x - x_avg
+        var_x += temp**2
+        cov_xy += temp * (y - y_avg)
+    slope = cov_xy / var_x
+    y_interc = y_avg - slope * x_avg
+    return (slope, y_interc)
+
+
+def naive_lstsqr(x, y):
+    """One pass through sum(x), sum(x^2), sum(xy): the unstable textbook formula."""
+    n = len(x)
+    sx, sy, sxx, sxy = x.sum(), y.sum(), (x * x).sum(), (x * y).sum()
+    slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    return slope, (sy - slope * sx) / n
+
+
+def chunks(x, y, size):
+    for lo in range(0, len(x), size):
+        yield x[lo : lo + size], y[lo : lo + size]
+
+
+def _fit_part(args):
+    x, y = args
+    fit = OnlineLinearFit()
+    for xc, yc in chunks(x, y, 4096):
+        fit.update(xc, yc)
+    return fit
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+
+    rng = np.random.default_rng(12345)
+    x = np.arange(500) * rng.integers(8, 12, 500) / 10
+    y = np.arange(100, 600) * rng.integers(8, 12, 500) / 10
+    reference = python_lstsqr(x, y)
+
+    point = OnlineLinearFit()
+    for xi, yi in zip(x, y):
+        point.push(xi, yi)
+    chunked = OnlineLinearFit()
+    for xc, yc in chunks(x, y, 37):
+        chunked.update(xc, yc)
+    with ProcessPoolExecutor(4) as pool:
+        parts = list(
+            pool.map(_fit_part, zip(np.array_split(x, 4), np.array_split(y, 4)))
+        )
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+    for name, fit in (("per point", point), ("chunks", chunked), ("4 workers", merged)):
+        np.testing.assert_allclose(fit.result(), reference, rtol=1e-12)
+        print("%-10s slope %.10f intercept %.10f" % (name, *fit.result()))
+    print("python_lstsqr slope %.10f intercept %.10f" % reference)
+
+    # far from the origin the one-pass textbook formula cancels, Welford does not
+    x_far, y_far = x + 1e8, y + 1e8
+    exact = python_lstsqr(x_far - 1e8, y_far - 1e8)[0]
+    print("\nx, y shifted by 1e8, exact slope %.10f" % exact)
+    print("textbook sums   %.10f" % naive_lstsqr(x_far, y_far)[0])
+    print("online (chunks) %.10f" % OnlineLinearFit().update(x_far, y_far).slope)
+
+    # multivariate: 3 features, streamed in chunks and merged across parts
+    X = rng.standard_normal((10**5, 3))
+    b = np.array([1.5, -2.0, 0.25])
+    yv = X @ b + 4.0 + 0.01 * rng.standard_normal(len(X))
+    qr_a, qr_b = OnlineQR(3), OnlineQR(3)
+    for Xc, yc in chunks(X[:60000], yv[:60000], 1000):
+        qr_a.update(Xc, yc)
+    for Xc, yc in chunks(X[60000:], yv[60000:], 1000):
+        qr_b.update(Xc, yc)
+    coef, intercept = qr_a.merge(qr_b).coef()
+    ref = np.linalg.lstsq(np.hstack([np.ones((len(X), 1)), X]), yv, rcond=None)[0]
+    np.testing.assert_allclose(np.r_[intercept, coef], ref, rtol=1e-10)
+    print(
+        "\nOnlineQR coefficients %s, intercept %.6f (match np.linalg.lstsq)"
+        % (coef, intercept)
+    )
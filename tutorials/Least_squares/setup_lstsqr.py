@@ -0,0 +1,43 @@
+"""
+Builds the compiled lstsqr kernels in place:
+
+    python setup_lstsqr.py build_ext --inplace
+
+    - lstsqr_cy: cython_lstsqr, needs a C compiler
+    - lstsqr_f:  fortran_lstsqr through f2py, needs gfortran (and meson and
+                 ninja from Python 3.12, where f2py has no distutils backend)
+
+The Fortran extension is optional: if it cannot be built a message is
+printed and lstsqr_kernels.py falls back to Cython, then NumPy.
+"""
+
+import shutil
+import subprocess
+import sys
+from setuptools import setup
+from Cython.Build import cythonize
+
+
+def build_fortran(source="lstsqr_f.f90", module="lstsqr_f"):
+    if shutil.which("gfortran") is None:
+        print("gfortran not found, skipping %s" % module)
+        return False
+    command = [sys.executable, "-m", "numpy.f2py", "-c", source, "-m", module]
+    done = subprocess.run(command + ["--opt=-O3"], check=False)
+    if done.returncode != 0:
+        print("f2py failed, skipping %s" % module)
+    return done.returncode == 0
+
+
+setup(
+    ext_modules=cythonize(
+        [
+            "lstsqr_cy.pyx",
+        ],
+        annotate=True,
+        language_level=3,
+    )
+)
+
+if "build_ext" in sys.argv:
+    build_fortran()
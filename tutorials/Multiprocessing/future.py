@@ -1,5 +1,6 @@
 import time
-from multiprocessing import Pool
+from concurrent.futures import FIRST_EXCEPTION
+from futures_manager import FutureManager
 
 
 def slow_add(nsecs, x, y):
@@ -26,42 +27,54 @@ def broken_function(nsecs):
     raise ValueError("Called broken function")
 
 
-if __name__ == "__main__":
-    futures = []
-
-    with Pool() as pool:
-        futures.append(pool.apply_async(slow_add, [3, 6, 7]))
-        futures.append(pool.apply_async(slow_diff, [2, 5, 2]))
-        futures.append(pool.apply_async(slow_add, [1, 8, 1]))
-        futures.append(pool.apply_async(slow_diff, [5, 9, 2]))
-        futures.append(pool.apply_async(broken_function, [4]))
-
-        while True:
-            all_finished = True
-
-            print("\nHave the workers finished?")
+def report(i, future):
+    """Done callback: called as soon as the result is back, no polling"""
+    if future.cancelled():
+        print("Process %s was cancelled" % i)
+    else:
+        print("Process %s has finished" % i)
 
-            for i, future in enumerate(futures):
-                if future.ready():
-                    print("Process %s has finished" % i)
-                else:
-                    all_finished = False
-                    print("Process %s is running..." % i)
 
-            if all_finished:
-                break
+if __name__ == "__main__":
+    with FutureManager() as manager:
+        futures = []
+        futures.append(manager.submit(slow_add, 3, 6, 7))
+        futures.append(manager.submit(slow_diff, 2, 5, 2))
+        futures.append(manager.submit(slow_add, 1, 8, 1))
+        futures.append(manager.submit(slow_diff, 5, 9, 2))
+        futures.append(manager.submit(broken_function, 4))
 
-            time.sleep(1)
+        for i, future in enumerate(futures):
+            future.add_done_callback(lambda future, i=i: report(i, future))
+
+        # block until every task is done, or until the first one fails
+        done, not_done = manager.wait(futures, timeout=60, return_when=FIRST_EXCEPTION)
+        if not_done:
+            if any(future.exception() is not None for future in done):
+                print(
+                    "\nA task failed, %s not sent yet cancelled"
+                    % manager.cancel_pending()
+                )
+            else:
+                print(
+                    "\nTimed out, %s not sent yet cancelled" % manager.cancel_pending()
+                )
+            manager.wait(futures)
 
         print("\nHere are the results.")
 
         for i, future in enumerate(futures):
-            if future.successful():
-                print("Process %s was successful. Result is %s" % (i, future.get()))
+            if future.cancelled():
+                print("Process %s was cancelled" % i)
+            elif future.exception() is None:
+                print("Process %s was successful. Result is %s" % (i, future.result()))
             else:
                 print("Process %s failed!" % i)
 
                 try:
-                    future.get()
+                    future.result()
                 except Exception as e:
                     print("    Error = %s : %s" % (type(e), e))
+
+        print("\nLatency per stage:")
+        manager.summary()
@@ -0,0 +1,379 @@
+"""
+What? Futures over a multiprocessing Pool, completed by callbacks: no
+      polling, errors, timeouts, cancellation and latency per task
+
+future.py asks every AsyncResult whether it is ready(), then sleeps a
+second: a task that ends just after a check is only noticed up to a
+second later. Here:
+
+    with FutureManager() as manager:
+        futures = [manager.submit(slow_add, 3, 6, 7), ...]
+        for future in manager.as_completed(futures, timeout=60):
+            print(future.result())
+        manager.summary()
+
+    - every task goes to Pool.apply_async with callback and error_callback:
+      the pool's result thread completes the future as soon as the result
+      arrives, and wakes whoever is waiting on it
+    - as_completed(), wait(return_when=FIRST_COMPLETED | FIRST_EXCEPTION |
+      ALL_COMPLETED) and future.result(timeout) block on a condition
+      variable, never on sleep(); a timeout raises TimeoutError
+    - an exception raised in a worker is re-raised by result(), with the
+      worker's traceback as its cause
+    - at most max_in_flight tasks (one per worker by default) are in the
+      pool at once, the others wait in the manager: those can still be
+      cancelled, as with concurrent.futures. A task already sent to the
+      pool runs to the end
+    - every future records when it was submitted, sent to the pool,
+      started and finished in the worker, and completed in the parent.
+      perf_counter() is system wide on Linux, macOS and Windows, so the
+      worker's and the parent's clocks can be compared
+    - done callbacks run in the pool's result thread: keep them short
+
+Reference: https://docs.python.org/3/library/concurrent.futures.html#future-objects
+"""
+
+# Import modules
+import os
+import time
+import threading
+import traceback
+from collections import deque, namedtuple
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    FIRST_EXCEPTION,
+    CancelledError,
+    TimeoutError,
+)
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.pool import ExceptionWithTraceback
+
+PENDING, RUNNING, CANCELLED, FINISHED = "PENDING", "RUNNING", "CANCELLED", "FINISHED"
+
+DoneAndNotDone = namedtuple("DoneAndNotDone", "done not_done")
+
+
+def _timed_call(fn, args, kwargs):
+    """Worker side: fn(*args, **kwargs), its error and when it ran."""
+    started = time.perf_counter()
+    try:
+        result, error = fn(*args, **kwargs), None
+    except Exception as e:
+        result, error = None, ExceptionWithTraceback(e, e.__traceback__)
+    return result, error, started, time.perf_counter()
+
+
+def _deadline(timeout):
+    return None if timeout is None else time.perf_counter() + timeout
+
+
+def _remaining(deadline):
+    return None if deadline is None else deadline - time.perf_counter()
+
+
+class PoolFuture:
+    def __init__(self, manager, fn, args, kwargs):
+        self._manager = manager
+        self._cond = manager._cond
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self._state = PENDING
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self.submitted = time.perf_counter()
+        self.dispatched = self.started = self.finished = self.completed = None
+
+    def __repr__(self):
+        return "<PoolFuture %s(%s) %s>" % (
+            getattr(self.fn, "__name__", self.fn),
+            ", ".join(map(repr, self.args)),
+            self._state,
+        )
+
+    # State
+    def cancel(self):
+        """Cancel the task if it has not been sent to the pool yet."""
+        return self._manager._cancel(self)
+
+    def cancelled(self):
+        return self._state == CANCELLED
+
+    def running(self):
+        return self._state == RUNNING
+
+    def done(self):
+        return self._state in (CANCELLED, FINISHED)
+
+    # Results
+    def _wait(self, timeout):
+        with self._cond:
+            if not self._cond.wait_for(self.done, timeout):
+                raise TimeoutError("%r not done after %s s" % (self, timeout))
+            if self._state == CANCELLED:
+                raise CancelledError()
+
+    def result(self, timeout=None):
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, fn):
+        """fn(future) once it is done, at once if it already is."""
+        with self._cond:
+            if not self.done():
+                self._callbacks.append(fn)
+                return
+        _run_callback(fn, self)
+
+    # Metrics
+    @property
+    def metrics(self):
+        """Seconds spent in each stage, None for the stages not reached."""
+
+        def span(a, b):
+            return None if a is None or b is None else b - a
+
+        return {
+            "task": getattr(self.fn, "__name__", repr(self.fn)),
+            "state": self._state,
+            "failed": self._exception is not None,
+            "queued": span(self.submitted, self.dispatched),
+            "to_worker": span(self.dispatched, self.started),
+            "run": span(self.started, self.finished),
+            "to_parent": span(self.finished, self.completed),
+            "latency": span(self.submitted, self.completed),
+        }
+
+
+def _run_callback(fn, future):
+    try:
+        fn(future)
+    except Exception:
+        traceback.print_exc()
+
+
+class FutureManager:
+    def __init__(
+        self, processes=None, initializer=None, initargs=(), max_in_flight=None
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.pool = Pool(self.processes, initializer, initargs)
+        self.max_in_flight = max_in_flight or self.processes
+        self.futures = []
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight = 0
+        self._completed = []  # futures in the order they completed
+        self._closed = False
+
+    # Submission
+    def submit(self, fn, *args, **kwargs):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("cannot submit after shutdown")
+            future = PoolFuture(self, fn, args, kwargs)
+            self.futures.append(future)
+            self._queue.append(future)
+            self._dispatch()
+        return future
+
+    def map(self, fn, *iterables, timeout=None):
+        """
+        Results of fn over iterables, in order. Every task is submitted now
+        and the timeout counts from this call, as with Executor.map; the
+        tasks not yet sent to the pool are cancelled if iteration stops early
+        or raises.
+        """
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        deadline = _deadline(timeout)
+
+        def results():
+            try:
+                for future in futures:
+                    yield future.result(_remaining(deadline))
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return results()
+
+    def _dispatch(self):
+        """Send queued tasks to the pool while there is room; holds _cond."""
+        while self._queue and self._in_flight < self.max_in_flight:
+            future = self._queue.popleft()
+            future._state = RUNNING
+            future.dispatched = time.perf_counter()
+            self._in_flight += 1
+            self.pool.apply_async(
+                _timed_call,
+                (future.fn, future.args, future.kwargs),
+                callback=partial(self._on_result, future),
+                error_callback=partial(self._on_error, future),
+            )
+
+    # Completion, in the pool's result thread
+    def _on_result(self, future, out):
+        result, error, started, finished = out
+        self._finish(future, result, error, started, finished)
+
+    def _on_error(self, future, error):
+        # the task could not be sent or its result not be returned
+        self._finish(future, None, error, None, None)
+
+    def _finish(self, future, result, error, started, finished):
+        with self._cond:
+            future._result, future._exception = result, error
+            future.started, future.finished = started, finished
+            future.completed = time.perf_counter()
+            future._state = FINISHED
+            self._in_flight -= 1
+            self._completed.append(future)
+            self._dispatch()
+            callbacks, future._callbacks = future._callbacks, []
+            self._cond.notify_all()
+        for fn in callbacks:
+            _run_callback(fn, future)
+
+    def _cancel(self, future):
+        with self._cond:
+            if future._state == CANCELLED:
+                return True
+            if future._state != PENDING:
+                return False
+            self._queue.remove(future)
+            future._state = CANCELLED
+            future.completed = time.perf_counter()
+            self._completed.append(future)
+            callbacks, future._callbacks = future._callbacks, []
+            self._cond.notify_all()
+        for fn in callbacks:
+            _run_callback(fn, future)
+        return True
+
+    def cancel_pending(self):
+        """Cancel every task not sent to the pool yet; returns how many."""
+        with self._cond:
+            queued = list(self._queue)
+        return sum(future.cancel() for future in queued)
+
+    # Waiting
+    def as_completed(self, futures=None, timeout=None):
+        """Yield futures as they complete; TimeoutError if some are still running."""
+        pending = set(self.futures if futures is None else futures)
+        deadline = _deadline(timeout)
+        seen = 0
+        while pending:
+            with self._cond:
+                while seen == len(self._completed):
+                    remaining = _remaining(deadline)
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(
+                            "%d future(s) not done after %s s" % (len(pending), timeout)
+                        )
+                    self._cond.wait(remaining)
+                new = self._completed[seen:]
+                seen = len(self._completed)
+            for future in new:
+                if future in pending:
+                    pending.discard(future)
+                    yield future
+
+    def wait(self, futures=None, timeout=None, return_when=ALL_COMPLETED):
+        """(done, not_done) once return_when holds or timeout expires."""
+        futures = set(self.futures if futures is None else futures)
+
+        def ready():
+            done = {f for f in futures if f.done()}
+            if return_when == FIRST_COMPLETED and done:
+                return True
+            if return_when == FIRST_EXCEPTION and any(
+                f._exception is not None for f in done
+            ):
+                return True
+            return len(done) == len(futures)
+
+        with self._cond:
+            self._cond.wait_for(ready, timeout)
+            done = {f for f in futures if f.done()}
+        return DoneAndNotDone(done, futures - done)
+
+    # Metrics
+    def metrics(self):
+        return [future.metrics for future in self.futures]
+
+    def summary(self):
+        """Mean and max of every stage over the finished tasks."""
+        rows = [m for m in self.metrics() if m["state"] == FINISHED]
+        print("%-10s %10s %10s" % ("[ms]", "mean", "max"))
+        for stage in ("queued", "to_worker", "run", "to_parent", "latency"):
+            values = [m[stage] for m in rows if m[stage] is not None]
+            if values:
+                print(
+                    "%-10s %10.2f %10.2f"
+                    % (stage, 1e3 * sum(values) / len(values), 1e3 * max(values))
+                )
+        failed = sum(m["failed"] for m in rows)
+        cancelled = sum(m["state"] == CANCELLED for m in self.metrics())
+        print("%d finished, %d failed, %d cancelled" % (len(rows), failed, cancelled))
+
+    # Shutdown
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop accepting tasks. wait=False terminates the workers; the futures
+        still running then never complete.
+        """
+        with self._cond:
+            self._closed = True
+        if cancel_pending:
+            self.cancel_pending()
+        if wait:
+            self.wait()
+            self.pool.close()
+        else:
+            self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=exc[0] is None, cancel_pending=exc[0] is not None)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+if __name__ == "__main__":
+    # 20 tasks of 0.05 to 0.2 s on every worker, noticed by polling every
+    # second as in future.py, and by the manager's callbacks
+    durations = [0.05 * (1 + i % 4) for i in range(20)]
+
+    with Pool() as pool:
+        start = time.perf_counter()
+        results = [pool.apply_async(_sleep, [d]) for d in durations]
+        noticed = {}
+        while len(noticed) < len(results):
+            for i, r in enumerate(results):
+                if i not in noticed and r.ready():
+                    noticed[i] = time.perf_counter() - start
+            time.sleep(1)
+        polling = time.perf_counter() - start
+
+    with FutureManager() as manager:
+        start = time.perf_counter()
+        futures = [manager.submit(_sleep, d) for d in durations]
+        for future in manager.as_completed(futures, timeout=60):
+            future.result()
+        callbacks = time.perf_counter() - start
+        print("Polling every second: %.2f s, callbacks: %.2f s" % (polling, callbacks))
+        print("(the tasks themselves: %.2f s of sleep)\n" % sum(durations))
+        manager.summary()
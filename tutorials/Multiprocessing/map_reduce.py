@@ -0,0 +1,183 @@
+"""
+What? Chunked map-reduce on a multiprocessing Pool: every worker reduces
+      its own chunk, the partial results are combined as a tree
+
+pool.py sends one task per item with pool.map(square, range(1, 5001)),
+keeps the whole list of squares and reduces it serially. Here:
+
+    total = map_reduce(square, range(1, 10**7), operator.add)
+
+    - the input is cut into chunks; a worker maps and reduces its chunk and
+      sends back a single value, so the mapped list never exists anywhere
+    - chunks are submitted with apply_async, at most 2 per worker in
+      flight, and read back in order: the input is consumed lazily and
+      'function' only has to be associative, not commutative
+    - the partial results are combined pairwise as they arrive,
+      ((p0 + p1) + (p2 + p3)) + ..., with a stack of O(log n) values
+    - chunksize: for inputs with a length, 4 chunks per worker as
+      Pool.map does; for iterators, it starts at 1 and doubles while a
+      chunk takes less than target_seconds in the worker
+    - a range is sliced, not listed: its chunks are sent as small ranges
+
+Reference: https://docs.python.org/3/library/multiprocessing.html#multiprocessing.pool.Pool
+"""
+
+# Import modules
+import os
+import math
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+_EMPTY = object()
+
+
+def _map_reduce_chunk(func, function, chunk):
+    """Worker side: reduce(function, map(func, chunk)) and its duration."""
+    start = time.perf_counter()
+    values = map(func, chunk)
+    acc = next(values)
+    for value in values:
+        acc = function(acc, value)
+    return acc, time.perf_counter() - start
+
+
+class _TreeReducer:
+    """Ordered pairwise reduction of a stream, like a binary counter."""
+
+    def __init__(self, function):
+        self.function = function
+        self.stack = []  # (level, value), levels strictly decreasing
+
+    def push(self, value):
+        level = 0
+        while self.stack and self.stack[-1][0] == level:
+            value = self.function(self.stack.pop()[1], value)
+            level += 1
+        self.stack.append((level, value))
+
+    def result(self):
+        value = _EMPTY
+        while self.stack:
+            left = self.stack.pop()[1]
+            value = left if value is _EMPTY else self.function(left, value)
+        return value
+
+
+def _chunks(iterable, size):
+    """
+    Chunks of iterable; size is a one-item list so that the caller can grow
+    it between chunks.
+    """
+    if isinstance(iterable, range):
+        pos = 0
+        while pos < len(iterable):
+            step = size[0]
+            yield iterable[pos : pos + step]
+            pos += step
+        return
+    items = iter(iterable)
+    while True:
+        chunk = list(islice(items, size[0]))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_reduce(
+    func,
+    iterable,
+    function,
+    initial=_EMPTY,
+    processes=None,
+    chunksize=None,
+    pool=None,
+    target_seconds=0.05,
+):
+    """
+    reduce(function, map(func, iterable)[, initial]) on a process pool.
+    func and function must be picklable (module level, not lambdas) and
+    function associative. pool is an existing Pool to use, otherwise one
+    with 'processes' workers is created and closed.
+    """
+    if pool is not None:
+        # Pool has no public size: the window and chunksize follow its workers
+        workers = processes or pool._processes
+    else:
+        workers = processes or os.cpu_count() or 1
+    adaptive = chunksize is None and not hasattr(iterable, "__len__")
+    if chunksize is not None:
+        size = [chunksize]
+    elif adaptive:
+        size = [1]
+    else:
+        size = [max(1, math.ceil(len(iterable) / (4 * workers)))]
+    own = pool is None
+    if own:
+        pool = Pool(workers)
+    tree = _TreeReducer(function)
+    pending = deque()
+    chunks = _chunks(iterable, size)
+    try:
+        for chunk in chunks:
+            pending.append(pool.apply_async(_map_reduce_chunk, (func, function, chunk)))
+            if len(pending) < 2 * workers:
+                continue
+            partial, seconds = pending.popleft().get()
+            tree.push(partial)
+            if adaptive and seconds < target_seconds:
+                size[0] *= 2
+        while pending:
+            tree.push(pending.popleft().get()[0])
+    finally:
+        if own:
+            pool.terminate()
+            pool.join()
+    result = tree.result()
+    if result is _EMPTY:
+        if initial is _EMPTY:
+            raise TypeError("map_reduce() of empty iterable with no initial value")
+        return initial
+    return result if initial is _EMPTY else function(initial, result)
+
+
+def square(x):
+    return x * x
+
+
+if __name__ == "__main__":
+    import operator
+    import tracemalloc
+    from functools import reduce
+
+    n = 2 * 10**6
+    expected = (n - 1) * n * (2 * n - 1) // 6
+    print("Sum of the squares of 1..%d, %d cores\n" % (n - 1, os.cpu_count()))
+    print("%-40s %9s %14s" % ("", "time [s]", "peak mem [MB]"))
+
+    def run(name, job):
+        tracemalloc.start()
+        start = time.perf_counter()
+        total = job()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        assert total == expected
+        print("%-40s %9.2f %14.1f" % (name, seconds, peak))
+
+    def pool_map():
+        with Pool() as pool:
+            return reduce(operator.add, pool.map(square, range(1, n)))
+
+    def pool_map_chunked():
+        with Pool() as pool:
+            return reduce(operator.add, pool.imap(square, range(1, n), 10000))
+
+    run("pool.map + reduce (pool.py)", pool_map)
+    run("pool.imap(chunksize=10000) + reduce", pool_map_chunked)
+    run("map_reduce(range)", lambda: map_reduce(square, range(1, n), operator.add))
+    run(
+        "map_reduce(iterator), adaptive chunks",
+        lambda: map_reduce(square, iter(range(1, n)), operator.add),
+    )
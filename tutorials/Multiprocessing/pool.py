@@ -1,5 +1,7 @@
 from functools import reduce
 from multiprocessing import Pool, cpu_count, current_process
+import operator
+from map_reduce import map_reduce
 
 
 def square(x):
@@ -27,3 +29,9 @@ if __name__ == "__main__":
     total = reduce(lambda x, y: x + y, result)
 
     print("The sum of the square of the first 5000 integers is %s" % total)
+
+    # the same sum, reduced inside the workers chunk by chunk: the list of
+    # squares is never built (see map_reduce.py)
+    total = map_reduce(square, range(1, 5001), operator.add)
+
+    print("The same sum with map_reduce is %s" % total)
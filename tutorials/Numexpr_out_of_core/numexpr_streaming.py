@@ -0,0 +1,224 @@
+"""
+What? Out-of-core numexpr evaluation over memory-mapped or chunked arrays
+
+The numexpr_* functions in "Speeding up NumPy array expressions with Numexpr"
+need A and B fully in RAM. Here the very same expression strings are evaluated
+block by block over np.memmap (or a list of .npy chunk files), reductions such
+as sum(...) are combined across blocks and the output is written to a memmap.
+The peak memory is therefore bounded by the block size and not by n.
+
+Reference: https://numexpr.readthedocs.io/en/latest/user_guide.html
+"""
+
+# Import modules
+import os
+import re
+import resource
+import tempfile
+import time
+import numpy as np
+import numexpr
+
+# Same expressions used by the numexpr_* functions in the tutorial
+EXPRESSIONS = {
+    "modulus": "A % B",
+    "difference": "A - B",
+    "multiplication": "A * B",
+    "division": "A / B",
+    "power": "A ** B",
+    "squareroot": "sqrt(A)",
+    "sum": "sum(A)",
+    "log": "log(A)",
+    "logic_operator": "A < B",
+    "complex_expr": "A*B-4.1*A > 2.5*B",
+}
+
+# numexpr only allows a reduction as the outermost operation
+_REDUCTION = re.compile(r"^\s*(sum|prod)\((.*?)(?:,\s*axis\s*=\s*(-?\d+))?\)\s*$")
+_COMBINE = {"sum": np.add, "prod": np.multiply}
+
+
+class ChunkedArray:
+    """
+    Read-only view over several .npy files stacked along the first axis.
+
+    Each chunk is opened with mmap_mode="r" so nothing is read until a
+    block is actually requested.
+    """
+
+    def __init__(self, paths):
+        self.chunks = [np.load(p, mmap_mode="r") for p in paths]
+        if not self.chunks:
+            raise ValueError("ChunkedArray needs at least one chunk")
+        tail = self.chunks[0].shape[1:]
+        for c in self.chunks:
+            if c.shape[1:] != tail or c.dtype != self.chunks[0].dtype:
+                raise ValueError("All chunks must share dtype and trailing shape")
+        self.offsets = np.cumsum([0] + [c.shape[0] for c in self.chunks])
+        self.shape = (int(self.offsets[-1]),) + tail
+        self.dtype = self.chunks[0].dtype
+        self.ndim = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        """Only contiguous row slices are supported (that is all we need)."""
+        start, stop, step = rows.indices(self.shape[0])
+        if step != 1:
+            raise ValueError("ChunkedArray only supports contiguous slices")
+        parts = []
+        for c, lo in zip(self.chunks, self.offsets[:-1]):
+            a, b = max(start - lo, 0), min(stop - lo, c.shape[0])
+            if a < b:
+                parts.append(c[a:b])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts, axis=0)
+
+
+def _row_bytes(arr):
+    return arr.dtype.itemsize * int(np.prod(arr.shape[1:], dtype=np.int64))
+
+
+def _pick_block_rows(operands, block_bytes):
+    """Number of rows per block so all operand blocks fit in block_bytes."""
+    per_row = sum(_row_bytes(a) for a in operands) or 1
+    # leave room for the output block and numexpr's own temporaries
+    return max(1, int(block_bytes // (2 * per_row)))
+
+
+def _open_output(out, shape, dtype):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=shape)
+    if out.shape != shape:
+        raise ValueError("out has shape %s, expected %s" % (out.shape, shape))
+    return out
+
+
+def evaluate_streaming(ex, local_dict, out=None, block_bytes=64 * 2**20):
+    """
+    Evaluate the numexpr string 'ex' block by block along the first axis.
+
+    local_dict maps variable names to np.ndarray, np.memmap, ChunkedArray or
+    scalars. Every array operand must have the same number of rows. Element-
+    wise expressions are written into 'out' (an array, a memmap or a path for
+    a new .npy memmap). Reductions sum()/prod() are combined across blocks:
+    full reductions and axis=0 return the combined value, also written into
+    'out' when it is given, axis=1 writes one value per row into 'out'. A
+    source with no rows gives an empty result, or the identity of the
+    reduction (0 for sum, 1 for prod).
+    """
+    arrays = {k: v for k, v in local_dict.items() if np.ndim(v) > 0}
+    scalars = {k: v for k, v in local_dict.items() if np.ndim(v) == 0}
+    if not arrays:
+        return numexpr.evaluate(ex, local_dict=scalars)
+
+    n_rows = {v.shape[0] for v in arrays.values()}
+    if len(n_rows) != 1:
+        raise ValueError("All array operands must have the same number of rows")
+    n_rows = n_rows.pop()
+    step = _pick_block_rows(arrays.values(), block_bytes)
+
+    match = _REDUCTION.match(ex)
+    reduction, axis = None, None
+    if match:
+        reduction, ex = match.group(1), match.group(2)
+        axis = None if match.group(3) is None else int(match.group(3))
+        ndim = next(iter(arrays.values())).ndim
+        if axis is not None and axis < 0:
+            axis += ndim
+
+    per_row = reduction is None or axis not in (None, 0)
+    result = None
+    # an empty source still runs once, on empty blocks
+    for start in range(0, max(n_rows, 1), step):
+        stop = min(start + step, n_rows)
+        block = {k: np.asarray(v[start:stop]) for k, v in arrays.items()}
+        block.update(scalars)
+
+        if reduction is None or n_rows == 0:
+            part = numexpr.evaluate(ex, local_dict=block)
+            if reduction is not None:
+                # numexpr returns an empty operand unreduced, numpy gives the
+                # identity instead
+                part = np.asarray(_COMBINE[reduction].reduce(part, axis=axis))
+        elif per_row:
+            part = numexpr.evaluate(
+                "%s(%s, axis=%d)" % (reduction, ex, axis), local_dict=block
+            )
+        else:
+            arg = "" if axis is None else ", axis=0"
+            part = numexpr.evaluate("%s(%s%s)" % (reduction, ex, arg), local_dict=block)
+
+        if per_row:
+            if result is None:
+                result = _open_output(out, (n_rows,) + part.shape[1:], part.dtype)
+            result[start:stop] = part
+        else:
+            result = part if result is None else _COMBINE[reduction](result, part)
+
+    if not per_row and out is not None:
+        # the combined value is only known once every block is done
+        combined = result
+        result = _open_output(out, combined.shape, combined.dtype)
+        result[...] = combined
+    if isinstance(result, np.memmap):
+        result.flush()
+    return result
+
+
+def make_memmap(path, n, seed):
+    """Write an n x n random matrix to disk in row blocks, never all in RAM."""
+    rng = np.random.default_rng(seed)
+    arr = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n, n))
+    step = max(1, 2**22 // n)
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        arr[start:stop] = rng.random((stop - start, n))
+    arr.flush()
+    return np.load(path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    print("Number of numexpr threads:", numexpr.nthreads)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Check the streaming evaluator against the in-memory one
+        n = 500
+        A = make_memmap(os.path.join(tmp, "A_small.npy"), n, 0)
+        B = make_memmap(os.path.join(tmp, "B_small.npy"), n, 1)
+        for name, ex in EXPRESSIONS.items():
+            ref = numexpr.evaluate(ex, local_dict={"A": A, "B": B})
+            got = evaluate_streaming(ex, {"A": A, "B": B}, block_bytes=2**18)
+            assert np.allclose(ref, got), name
+        print("Streaming results match numexpr.evaluate")
+
+        # The same via a chunked on-disk array
+        paths = []
+        for i, start in enumerate(range(0, n, 128)):
+            paths.append(os.path.join(tmp, "A_chunk_%d.npy" % i))
+            np.save(paths[-1], np.asarray(A[start : start + 128]))
+        A_chunked = ChunkedArray(paths)
+        assert np.isclose(
+            evaluate_streaming("sum(A)", {"A": A_chunked}), numexpr.evaluate("sum(A)")
+        )
+        print("ChunkedArray reduction matches")
+
+        # Larger problem, output written to a memmap on disk
+        n = 4000
+        A = make_memmap(os.path.join(tmp, "A.npy"), n, 0)
+        B = make_memmap(os.path.join(tmp, "B.npy"), n, 1)
+        print("\nn = %s, each operand is %.0f MB on disk" % (n, A.nbytes / 2**20))
+        for name in ["complex_expr", "sum"]:
+            out = os.path.join(tmp, "out_%s.npy" % name)
+            start = time.perf_counter()
+            evaluate_streaming(EXPRESSIONS[name], {"A": A, "B": B}, out=out)
+            print("%-15s %.3f s" % (name, time.perf_counter() - start))
+
+    print(
+        "Peak memory (MiB):",
+        int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+    )
@@ -0,0 +1,343 @@
+"""
+What? Sweep n_jobs and joblib backend for any estimator and recommend the
+      configuration
+
+run_profile() and run_profile_ctx_manager() in profile_SKLearn_model.py print
+three clocks for a handful of hard-coded n_jobs and backends. Here every
+(backend, n_jobs) pair is fitted under joblib.parallel_config and measured:
+
+    - wall time (perf_counter), and the speed-up and efficiency against the
+      same backend with n_jobs=1: the scaling curve
+    - CPU seconds of every worker, sampled with psutil in a background
+      thread: worker processes for loky and multiprocessing, threads for
+      threading. Utilisation is CPU seconds / wall time per active worker
+    - time spent pickling the tasks sent to the workers, and their size:
+      loky's queue dumps() and the multiprocessing backend's pickler are
+      wrapped while the fit runs (threading sends nothing)
+    - peak resident memory of the whole process tree, above what it was
+      when the fit started (idle workers of earlier runs are not counted)
+
+The recommendation is the fastest configuration, or the one with the
+fewest jobs among those within 'tolerance' of it.
+
+Reference: https://joblib.readthedocs.io/en/stable/parallel.html
+"""
+
+# Import modules
+import os
+import time
+import threading
+from contextlib import contextmanager
+import psutil
+import joblib
+import joblib.pool
+from joblib.externals.loky.backend import queues as loky_queues
+from sklearn.base import clone
+
+BACKENDS = ("loky", "threading", "multiprocessing")
+
+
+def default_n_jobs():
+    """1, 2, 4, ... up to the logical CPU count, and the count itself."""
+    cpus = os.cpu_count() or 1
+    out, n = [], 1
+    while n < cpus:
+        out.append(n)
+        n *= 2
+    return out + [cpus]
+
+
+class ResourceSampler(threading.Thread):
+    """CPU seconds per process (or thread) and peak tree RSS, while running."""
+
+    def __init__(self, interval=0.02, threads=False):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.threads = threads
+        self.root = psutil.Process()
+        self._stop_event = threading.Event()
+        self.start_cpu = self._cpu()
+        self.last_cpu = dict(self.start_cpu)
+        self.start_rss = self._rss()
+        self.peak_rss = self.start_rss
+
+    def _procs(self):
+        try:
+            return [self.root] + self.root.children(recursive=True)
+        except psutil.Error:
+            return [self.root]
+
+    def _cpu(self):
+        """{worker id: user + system seconds}."""
+        out = {}
+        if self.threads:
+            sampler = getattr(self, "native_id", None)
+            for t in self.root.threads():
+                if t.id != sampler:
+                    out["thread %d" % t.id] = t.user_time + t.system_time
+            return out
+        for p in self._procs():
+            try:
+                c = p.cpu_times()
+                out["pid %d" % p.pid] = c.user + c.system
+            except psutil.Error:
+                pass
+        return out
+
+    def _rss(self):
+        rss = 0
+        for p in self._procs():
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, self._rss())
+        self.last_cpu.update(self._cpu())
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self._sample()
+
+    def cpu_seconds(self):
+        """CPU seconds used since start, per worker; new workers started at 0."""
+        return {
+            k: v - self.start_cpu.get(k, 0.0)
+            for k, v in self.last_cpu.items()
+            if v - self.start_cpu.get(k, 0.0) > 0
+        }
+
+
+@contextmanager
+def count_serialization():
+    """Time and bytes of the task payloads pickled by loky and multiprocessing."""
+    stats = {"seconds": 0.0, "bytes": 0, "messages": 0}
+    lock = threading.Lock()
+    loky_dumps = loky_queues.dumps
+    pickler = joblib.pool.CustomizablePickler
+    pickler_init, pickler_dump = pickler.__init__, pickler.dump
+
+    def add(seconds, nbytes):
+        with lock:
+            stats["seconds"] += seconds
+            stats["bytes"] += nbytes
+            stats["messages"] += 1
+
+    def dumps(obj, reducers=None):
+        start = time.perf_counter()
+        out = loky_dumps(obj, reducers=reducers)
+        add(time.perf_counter() - start, len(out))
+        return out
+
+    def init(self, writer, *args, **kwargs):
+        self._profiled_writer = writer
+        pickler_init(self, writer, *args, **kwargs)
+
+    def dump(self, obj):
+        start = time.perf_counter()
+        pickler_dump(self, obj)
+        writer = getattr(self, "_profiled_writer", None)
+        add(
+            time.perf_counter() - start, writer.tell() if hasattr(writer, "tell") else 0
+        )
+
+    loky_queues.dumps = dumps
+    pickler.__init__, pickler.dump = init, dump
+    try:
+        yield stats
+    finally:
+        loky_queues.dumps = loky_dumps
+        pickler.__init__, pickler.dump = pickler_init, pickler_dump
+
+
+def _set_n_jobs(estimator, n_jobs):
+    """n_jobs of the estimator and of any nested estimator that has one."""
+    params = {
+        k: n_jobs for k in estimator.get_params() if k.split("__")[-1] == "n_jobs"
+    }
+    return estimator.set_params(**params)
+
+
+def profile_fit(
+    estimator,
+    X,
+    y=None,
+    backend="loky",
+    n_jobs=1,
+    interval=0.02,
+    warmup=True,
+    **fit_params
+):
+    """
+    Fit a clone of estimator with (backend, n_jobs) and measure it. warmup
+    first sends the estimator to every worker, untimed, so that loky's
+    reusable workers are started and have imported its modules.
+    """
+    model = _set_n_jobs(clone(estimator), n_jobs)
+    with joblib.parallel_config(backend=backend, n_jobs=n_jobs):
+        if warmup and n_jobs != 1:
+            joblib.Parallel()(joblib.delayed(type)(model) for _ in range(n_jobs))
+        sampler = ResourceSampler(interval, threads=backend == "threading")
+        with count_serialization() as ipc:
+            sampler.start()
+            start, p_start = time.perf_counter(), time.process_time()
+            model.fit(X, y, **fit_params)
+            wall, parent_cpu = (
+                time.perf_counter() - start,
+                time.process_time() - p_start,
+            )
+            sampler.stop()
+    workers = sampler.cpu_seconds()
+    if backend == "threading":
+        dispatcher = "thread %d" % threading.main_thread().native_id
+    else:
+        dispatcher = "pid %d" % os.getpid()
+    active = {k: v for k, v in workers.items() if v > 0.01 * wall}
+    if len(active) > 1:
+        # the dispatcher only counts when it ran the fit itself (n_jobs=1)
+        active.pop(dispatcher, None)
+    return {
+        "backend": backend,
+        "n_jobs": n_jobs,
+        "wall": wall,
+        "parent_cpu": parent_cpu,
+        "worker_cpu": workers,
+        "active_workers": len(active),
+        "utilisation": (sum(active.values()) / wall / len(active)) if active else 0.0,
+        "ipc_seconds": ipc["seconds"],
+        "ipc_mb": ipc["bytes"] / 1e6,
+        "ipc_messages": ipc["messages"],
+        "peak_rss_mb": (sampler.peak_rss - sampler.start_rss) / 2**20,
+    }
+
+
+class BackendProfiler:
+    def __init__(self, backends=BACKENDS, n_jobs=None, repeat=1, interval=0.02):
+        self.backends = tuple(backends)
+        self.n_jobs = list(n_jobs or default_n_jobs())
+        self.repeat = repeat
+        self.interval = interval
+        self.results = []
+
+    def profile(self, estimator, X, y=None, **fit_params):
+        """Every (backend, n_jobs); the fastest of 'repeat' fits is kept."""
+        self.results = []
+        for backend in self.backends:
+            for n_jobs in self.n_jobs:
+                runs = [
+                    profile_fit(
+                        estimator, X, y, backend, n_jobs, self.interval, **fit_params
+                    )
+                    for _ in range(self.repeat)
+                ]
+                self.results.append(min(runs, key=lambda r: r["wall"]))
+        self._add_scaling()
+        return self.results
+
+    def _add_scaling(self):
+        for r in self.results:
+            base = [
+                b["wall"]
+                for b in self.results
+                if b["backend"] == r["backend"] and b["n_jobs"] == min(self.n_jobs)
+            ]
+            r["speedup"] = base[0] / r["wall"] * min(self.n_jobs)
+            r["efficiency"] = r["speedup"] / r["n_jobs"]
+
+    def scaling_curve(self):
+        """{backend: [(n_jobs, wall, speedup), ...]}."""
+        curve = {}
+        for r in self.results:
+            curve.setdefault(r["backend"], []).append(
+                (r["n_jobs"], r["wall"], r["speedup"])
+            )
+        return curve
+
+    def recommend(self, tolerance=0.05):
+        """Fewest jobs, then lowest memory, within tolerance of the fastest."""
+        best = min(r["wall"] for r in self.results)
+        close = [r for r in self.results if r["wall"] <= best * (1 + tolerance)]
+        return min(close, key=lambda r: (r["n_jobs"], r["peak_rss_mb"], r["wall"]))
+
+    def report(self):
+        print(
+            "%-16s %6s %8s %8s %6s %8s %8s %10s %9s %9s"
+            % (
+                "backend",
+                "n_jobs",
+                "wall[s]",
+                "speedup",
+                "eff",
+                "workers",
+                "util",
+                "ipc[s]",
+                "ipc[MB]",
+                "+mem[MB]",
+            )
+        )
+        for r in self.results:
+            print(
+                "%-16s %6d %8.3f %8.2f %6.2f %8d %8.2f %10.4f %9.2f %9.0f"
+                % (
+                    r["backend"],
+                    r["n_jobs"],
+                    r["wall"],
+                    r["speedup"],
+                    r["efficiency"],
+                    r["active_workers"],
+                    r["utilisation"],
+                    r["ipc_seconds"],
+                    r["ipc_mb"],
+                    r["peak_rss_mb"],
+                )
+            )
+        rec = self.recommend()
+        print(
+            "\nRecommended: backend=%r, n_jobs=%d (%.3f s)"
+            % (rec["backend"], rec["n_jobs"], rec["wall"])
+        )
+
+    def plot(self, path="scaling_curve.png"):
+        """Speed-up against n_jobs per backend, with the ideal line."""
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from matplotlib import pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(6, 4))
+        for backend, points in self.scaling_curve().items():
+            n, _, speedup = zip(*points)
+            ax.plot(n, speedup, "o-", label=backend)
+        ax.plot(self.n_jobs, self.n_jobs, "k--", lw=1, label="ideal")
+        ax.set_xlabel("n_jobs")
+        ax.set_ylabel("speed-up")
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(path)
+        plt.close(fig)
+        return path
+
+
+if __name__ == "__main__":
+    from sklearn.datasets import make_classification
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = make_classification(
+        n_samples=10000, n_features=20, n_informative=15, n_redundant=5, random_state=3
+    )
+    profiler = BackendProfiler(n_jobs=default_n_jobs())
+    print("Logical CPUs: %d, n_jobs swept: %s\n" % (os.cpu_count(), profiler.n_jobs))
+    profiler.profile(RandomForestClassifier(n_estimators=100, random_state=0), X, y)
+    profiler.report()
+    try:
+        print("Scaling curve saved to %s" % profiler.plot())
+    except ImportError:
+        pass
@@ -0,0 +1,137 @@
+"""
+What? A cache of generated datasets, in memory and as .npy files on disk,
+      keyed by the generator and its parameters
+
+train_SKL_model() in profile_SKLearn_model.py calls make_classification on
+every invocation: every profiling point pays for the generation, and two
+runs only see the same data if random_state is fixed. Here:
+
+    X, y = cached_dataset(make_classification, n_samples=10000, random_state=3)
+
+    - the key is a hash of the generator's qualified name, its parameters
+      and the scikit-learn version (generators may change between versions)
+    - the first call generates the arrays and saves them under
+      cache_dir/<key>/arr_<i>.npy, written to a temporary folder and renamed
+      so that concurrent processes never see half a dataset
+    - later calls in the same process with the same cache_dir and
+      mmap_mode get the same arrays from memory, a new process maps the .npy files read-only (np.load(mmap_mode="r")):
+      no generation, no copy, and joblib passes memmaps to its workers by
+      reference
+    - without random_state the first draw is the one every run sees
+
+Reference: https://numpy.org/doc/stable/reference/generated/numpy.load.html
+"""
+
+# Import modules
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import sklearn
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "hpc_datasets")
+
+# (key, cache folder, mmap_mode) -> tuple of arrays, for this process
+_MEMORY = {}
+
+
+def _cache_dir(cache_dir=None):
+    return cache_dir or os.environ.get("HPC_DATASET_CACHE", DEFAULT_CACHE_DIR)
+
+
+def dataset_key(generator, **params):
+    blob = json.dumps(
+        {
+            "generator": "%s.%s" % (generator.__module__, generator.__qualname__),
+            "params": params,
+            "sklearn": sklearn.__version__,
+        },
+        sort_keys=True,
+        default=repr,
+    ).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def _load(folder, mmap_mode):
+    with open(os.path.join(folder, "meta.json")) as f:
+        n_arrays = json.load(f)["n_arrays"]
+    return tuple(
+        np.load(os.path.join(folder, "arr_%d.npy" % i), mmap_mode=mmap_mode)
+        for i in range(n_arrays)
+    )
+
+
+def _save(folder, arrays, meta):
+    parent = os.path.dirname(folder)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp_")
+    for i, a in enumerate(arrays):
+        np.save(os.path.join(tmp, "arr_%d.npy" % i), np.ascontiguousarray(a))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(dict(meta, n_arrays=len(arrays)), f, indent=1, default=repr)
+    try:
+        os.rename(tmp, folder)
+    except OSError:
+        # another process saved the same dataset first: keep theirs
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def cached_dataset(generator, cache_dir=None, mmap_mode="r", **params):
+    """
+    generator(**params), e.g. make_classification(...), from the memory
+    cache, else from the disk cache, else generated and saved. Returns a
+    tuple of arrays (memory-mapped read-only when they come from disk).
+    """
+    key = dataset_key(generator, **params)
+    folder = os.path.join(os.path.abspath(_cache_dir(cache_dir)), key)
+    memory_key = (key, folder, mmap_mode)
+    if memory_key in _MEMORY:
+        return _MEMORY[memory_key]
+    if not os.path.isdir(folder):
+        out = generator(**params)
+        arrays = out if isinstance(out, tuple) else (out,)
+        generator_name = "%s.%s" % (generator.__module__, generator.__qualname__)
+        _save(folder, arrays, {"generator": generator_name, "params": params})
+    _MEMORY[memory_key] = _load(folder, mmap_mode)
+    return _MEMORY[memory_key]
+
+
+def clear_cache(memory=True, disk=False, cache_dir=None):
+    if memory:
+        _MEMORY.clear()
+    if disk:
+        shutil.rmtree(_cache_dir(cache_dir), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import time
+    from sklearn.datasets import make_classification
+
+    params = dict(
+        n_samples=200000, n_features=50, n_informative=15, n_redundant=5, random_state=3
+    )
+    cache_dir = tempfile.mkdtemp()
+
+    start = time.perf_counter()
+    X_ref, y_ref = make_classification(**params)
+    print("make_classification        %8.4f s" % (time.perf_counter() - start))
+
+    for label in ("first call (generate, save)", "same process (memory)"):
+        start = time.perf_counter()
+        X, y = cached_dataset(make_classification, cache_dir=cache_dir, **params)
+        print("%-26s %8.4f s" % (label, time.perf_counter() - start))
+    clear_cache()
+    start = time.perf_counter()
+    X, y = cached_dataset(make_classification, cache_dir=cache_dir, **params)
+    print("%-26s %8.4f s" % ("new process (memmap)", time.perf_counter() - start))
+
+    assert (X == X_ref).all() and (y == y_ref).all()
+    assert type(X) is np.memmap and not X.flags.writeable
+    other = cached_dataset(
+        make_classification, cache_dir=cache_dir, **dict(params, random_state=4)
+    )
+    assert not (other[0] == X).all()
+    print("Cached arrays are identical to the generated ones, keys differ by parameter")
+    shutil.rmtree(cache_dir)
@@ -4,6 +4,18 @@ from sklearn.datasets import make_classification
 from sklearn.ensemble import RandomForestClassifier
 from joblib import parallel_backend
 import multiprocessing, os, psutil
+from backend_profiler import BackendProfiler, default_n_jobs
+from dataset_cache import cached_dataset
+
+# every profiling point fits the same data
+DATASET = dict(
+    n_samples=10000, n_features=20, n_informative=15, n_redundant=5, random_state=3
+)
+
+
+def load_dataset():
+    """make_classification(**DATASET), from memory or from the .npy cache."""
+    return cached_dataset(make_classification, **DATASET)
 
 
 def train_SKL_model(n_jobs=None):
@@ -12,10 +24,8 @@ def train_SKL_model(n_jobs=None):
 
     This implements just some dummy ML method.
     """
-    # define dataset
-    X, y = make_classification(
-        n_samples=10000, n_features=20, n_informative=15, n_redundant=5, random_state=3
-    )
+    # define dataset: generated once, then loaded from the cache
+    X, y = load_dataset()
     # define the model
     model = RandomForestClassifier(n_estimators=500, n_jobs=n_jobs)
     # record current time
@@ -95,6 +105,21 @@ def run_profile_ctx_manager(backend_type, train):
         train(-1)
 
 
+def run_profile_sweep(estimator=None, n_jobs=None):
+    """
+    run_profile and run_profile_ctx_manager in one sweep over n_jobs and
+    backend, for any estimator: scaling curve, per-worker CPU, IPC time,
+    peak memory and the recommended configuration.
+    """
+    X, y = load_dataset()
+    if estimator is None:
+        estimator = RandomForestClassifier(n_estimators=500)
+    profiler = BackendProfiler(n_jobs=n_jobs)
+    profiler.profile(estimator, X, y)
+    profiler.report()
+    return profiler.recommend()
+
+
 if __name__ == "__main__":
     print("=============")
     print("START TESTING")
@@ -114,9 +139,13 @@ if __name__ == "__main__":
         psutil.cpu_count(logical=False),
     )
 
-    run_profile(train)
+    run_profile(train_SKL_model)
+
+    print("\n---------------------------")
+    run_profile_ctx_manager("loky", train_SKL_model)
+    run_profile_ctx_manager("threading", train_SKL_model)
+    run_profile_ctx_manager("multiprocessing", train_SKL_model)
 
     print("\n---------------------------")
-    run_profile_ctx_manager("loky", train)
-    run_profile_ctx_manager("threading", train)
-    run_profile_ctx_manager("multiprocessing", train)
+    # 1, 2, 4, ... up to the CPU count: never more workers than CPUs
+    run_profile_sweep(n_jobs=default_n_jobs())
@@ -0,0 +1,333 @@
+"""
+What? Successive halving and Hyperband for partial_fit estimators, on a
+      local process pool
+
+"How to optimise scikit-learn execution time" compares TuneGridSearchCV,
+which needs Ray Tune, with GridSearchCV(n_jobs=-1), which trains every
+candidate to the end. Here only the standard library and scikit-learn are
+used:
+
+    search = HyperbandSearch(SGDClassifier(), parameters, max_epochs=27)
+    search.fit(X, y)
+    search.best_params_, search.best_score_, search.predict(X_test)
+
+    - the resource is the number of epochs, one epoch being one partial_fit
+      call over the training part of the data
+    - successive halving trains n candidates for r epochs, keeps the best
+      1/eta of them, trains those up to r * eta epochs, and so on
+    - survivors are warm started: the estimator returned by a worker is sent
+      back for the next rung, so a rung only pays for its extra epochs
+    - a candidate whose validation score has not improved by tol for
+      'patience' epochs stops early and is ranked by its best score
+    - Hyperband runs several successive halvings (brackets) from many
+      candidates with few epochs to few candidates with many epochs
+    - the data is sent once per worker through the pool initializer, never
+      with the tasks
+
+Reference: https://jmlr.org/papers/v18/16-558.html (Hyperband)
+           https://scikit-learn.org/stable/modules/grid_search.html#successive-halving-user-guide
+"""
+
+# Import modules
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split
+
+# Worker state, filled once per process by _init
+_DATA = {}
+
+
+def _init(X_train, y_train, X_val, y_val, classes, scoring):
+    _DATA.update(
+        X_train=X_train,
+        y_train=y_train,
+        X_val=X_val,
+        y_val=y_val,
+        classes=classes,
+        scorer=None if scoring is None else get_scorer(scoring),
+    )
+
+
+class Candidate:
+    __slots__ = (
+        "cid",
+        "params",
+        "estimator",
+        "epochs",
+        "scores",
+        "best",
+        "stale",
+        "stopped",
+    )
+
+    def __init__(self, cid, params, estimator):
+        self.cid = cid
+        self.params = params
+        self.estimator = estimator
+        self.epochs = 0
+        self.scores = []
+        self.best = -math.inf
+        self.stale = 0
+        self.stopped = False
+
+    @property
+    def score(self):
+        """
+        Validation score used for ranking: the latest one, or the best one
+        seen once the candidate has stopped early (its last epochs did not
+        improve, they may have lowered the score a little).
+        """
+        if not self.scores:
+            return -math.inf
+        return max(self.scores) if self.stopped else self.scores[-1]
+
+
+def _train(args):
+    """Warm start candidate up to 'epochs' epochs, or until it stops early."""
+    candidate, epochs, patience, tol = args
+    d = _DATA
+    estimator = candidate.estimator
+    while candidate.epochs < epochs and not candidate.stopped:
+        estimator.partial_fit(d["X_train"], d["y_train"], classes=d["classes"])
+        candidate.epochs += 1
+        if d["scorer"] is None:
+            score = estimator.score(d["X_val"], d["y_val"])
+        else:
+            score = d["scorer"](estimator, d["X_val"], d["y_val"])
+        candidate.scores.append(float(score))
+        if score > candidate.best + tol:
+            candidate.best, candidate.stale = score, 0
+        else:
+            candidate.stale += 1
+            candidate.stopped = candidate.stale >= patience
+    return candidate
+
+
+class SuccessiveHalvingSearch:
+    """
+    params is a dict of lists (or scipy distributions). With n_candidates
+    None every point of the grid is a candidate, otherwise n_candidates are
+    sampled from it.
+    """
+
+    def __init__(
+        self,
+        estimator,
+        params,
+        n_candidates=None,
+        eta=3,
+        min_epochs=1,
+        max_epochs=27,
+        patience=3,
+        tol=1e-4,
+        scoring=None,
+        validation_fraction=0.2,
+        n_jobs=1,
+        random_state=0,
+    ):
+        if not hasattr(estimator, "partial_fit"):
+            raise TypeError("%s has no partial_fit" % type(estimator).__name__)
+        self.estimator = estimator
+        self.params = params
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.tol = tol
+        self.scoring = scoring
+        self.validation_fraction = validation_fraction
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _sample(self, n, seed):
+        if n is None:
+            return list(ParameterGrid(self.params))
+        return list(ParameterSampler(self.params, n, random_state=seed))
+
+    def _make(self, params_list):
+        out = []
+        for params in params_list:
+            estimator = clone(self.estimator).set_params(**params)
+            out.append(Candidate(len(self.epochs_), params, estimator))
+            self.epochs_[out[-1].cid] = 0
+        return out
+
+    def _run(self, run, candidates, r, bracket=0):
+        """Successive halving of candidates, starting from r epochs."""
+        rung = 0
+        while True:
+            active = [c for c in candidates if not c.stopped and c.epochs < r]
+            done = run([(c, r, self.patience, self.tol) for c in active])
+            trained = {c.cid: c for c in done}
+            candidates = [trained.get(c.cid, c) for c in candidates]
+            for c in candidates:
+                self.epochs_[c.cid] = c.epochs
+                self.history_.append(
+                    dict(
+                        bracket=bracket,
+                        rung=rung,
+                        cid=c.cid,
+                        params=c.params,
+                        epochs=c.epochs,
+                        score=c.score,
+                        stopped=c.stopped,
+                    )
+                )
+            candidates.sort(key=lambda c: (-c.score, c.cid))
+            keep = max(1, len(candidates) // self.eta)
+            if r >= self.max_epochs or len(candidates) == 1:
+                return candidates[0]
+            candidates = candidates[:keep]
+            r = min(self.max_epochs, r * self.eta)
+            rung += 1
+
+    def _brackets(self):
+        """(n_candidates, first rung epochs) of every successive halving."""
+        return [(self.n_candidates, self.min_epochs)]
+
+    def fit(self, X, y):
+        X_train, X_val, y_train, y_val = train_test_split(
+            X,
+            y,
+            test_size=self.validation_fraction,
+            stratify=y,
+            random_state=self.random_state,
+        )
+        initargs = (X_train, y_train, X_val, y_val, np.unique(y), self.scoring)
+        self.history_ = []
+        self.epochs_ = {}  # cid -> epochs trained
+        start = time.perf_counter()
+        if self.n_jobs == 1:
+            _init(*initargs)
+            pool, run = None, lambda tasks: [_train(t) for t in tasks]
+        else:
+            pool = ProcessPoolExecutor(
+                self.n_jobs, initializer=_init, initargs=initargs
+            )
+            run = lambda tasks: list(pool.map(_train, tasks))
+        try:
+            winners = []
+            for bracket, (n, r) in enumerate(self._brackets()):
+                params_list = self._sample(n, self.random_state + bracket)
+                winners.append(self._run(run, self._make(params_list), r, bracket))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        best = max(winners, key=lambda c: (c.score, -c.cid))
+        self.best_params_ = best.params
+        self.best_score_ = best.score
+        self.best_estimator_ = best.estimator
+        self.n_candidates_ = len(self.epochs_)
+        self.total_epochs_ = sum(self.epochs_.values())
+        self.fit_time_ = time.perf_counter() - start
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+    def score(self, X, y):
+        return self.best_estimator_.score(X, y)
+
+
+class HyperbandSearch(SuccessiveHalvingSearch):
+    """
+    Brackets s = s_max..0, s_max = floor(log_eta(max_epochs / min_epochs)):
+    bracket s starts ceil((s_max + 1) * eta^s / (s + 1)) sampled candidates
+    at max_epochs / eta^s epochs, so every bracket gets about the same budget.
+    """
+
+    def __init__(self, estimator, params, **kwargs):
+        kwargs.pop("n_candidates", None)
+        super().__init__(estimator, params, **kwargs)
+
+    def _brackets(self):
+        s_max = int(math.log(self.max_epochs / self.min_epochs, self.eta) + 1e-9)
+        return [
+            (
+                math.ceil((s_max + 1) * self.eta**s / (s + 1)),
+                max(self.min_epochs, round(self.max_epochs / self.eta**s)),
+            )
+            for s in range(s_max, -1, -1)
+        ]
+
+
+if __name__ == "__main__":
+    import os
+    import warnings
+    from sklearn.datasets import make_classification
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.exceptions import ConvergenceWarning
+
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+
+    # the notebook's dataset at half size, with a larger space than its 6 candidates
+    X, y = make_classification(
+        n_samples=5500,
+        n_features=500,
+        n_informative=50,
+        n_redundant=0,
+        n_classes=10,
+        class_sep=2.5,
+        random_state=0,
+    )
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=500, random_state=0
+    )
+    parameters = {
+        "alpha": [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1],
+        "loss": ["hinge", "log_loss", "modified_huber"],
+        "penalty": ["l2", "l1"],
+    }
+    n_jobs = min(4, os.cpu_count())
+
+    print(
+        "%-30s %9s %9s %11s %8s" % ("", "time [s]", "accuracy", "candidates", "epochs")
+    )
+    for name, search in (
+        (
+            "SuccessiveHalvingSearch",
+            SuccessiveHalvingSearch(
+                SGDClassifier(random_state=0), parameters, n_jobs=n_jobs
+            ),
+        ),
+        (
+            "HyperbandSearch",
+            HyperbandSearch(SGDClassifier(random_state=0), parameters, n_jobs=n_jobs),
+        ),
+    ):
+        search.fit(X_train, y_train)
+        print(
+            "%-30s %9.2f %9.3f %11d %8d"
+            % (
+                name,
+                search.fit_time_,
+                search.score(X_test, y_test),
+                search.n_candidates_,
+                search.total_epochs_,
+            )
+        )
+        print("    best: %s" % search.best_params_)
+
+    # same budget per candidate: at most max_epochs = 27 epochs
+    grid = GridSearchCV(
+        SGDClassifier(max_iter=27, random_state=0), parameters, cv=3, n_jobs=n_jobs
+    )
+    start = time.perf_counter()
+    grid.fit(X_train, y_train)
+    print(
+        "%-30s %9.2f %9.3f %11d %8s"
+        % (
+            "GridSearchCV(cv=3)",
+            time.perf_counter() - start,
+            grid.score(X_test, y_test),
+            len(grid.cv_results_["params"]),
+            "-",
+        )
+    )
+    print("    best: %s" % grid.best_params_)
@@ -0,0 +1,229 @@
+"""
+What? A registry of read-only datasets placed in shared memory once and
+      handed to every worker as a zero-copy view
+
+GridSearchCV(n_jobs=-1) in "How to optimise scikit-learn execution time"
+and RandomForestClassifier(n_jobs=...) in profile_SKLearn_model.py send
+X_train to the joblib workers on every call: pickled in full, or (above
+max_nbytes) dumped again to a fresh temporary memmap by each new Parallel
+call. Here:
+
+    registry = DatasetRegistry()
+    X_shared = registry.put("X_train", X_train)      # np.memmap, mode "r"
+    with registry.parallel_config("loky", n_jobs=4):
+        GridSearchCV(SGDClassifier(), parameters, n_jobs=4).fit(X_shared, y_train)
+
+    - put() writes the array once to a file under /dev/shm (RAM-backed on
+      Linux, another temporary folder elsewhere) and returns it memory
+      mapped read-only
+    - joblib's loky and multiprocessing backends pickle any memmap-backed
+      array, slices included, as (file name, offset, shape, dtype): workers
+      map the same pages, nothing is copied or dumped again
+    - parallel_config() turns joblib's own automatic dumping off, so an
+      array that was not registered is noticed (it gets pickled) instead of
+      being silently dumped again
+    - handle(name) is a small picklable reference for code that does not go
+      through joblib (multiprocessing.Pool, concurrent.futures), where a
+      memmap would be pickled as a full copy
+
+Reference: https://joblib.readthedocs.io/en/stable/parallel.html#working-with-numerical-data-in-shared-memory-memmapping
+"""
+
+# Import modules
+import os
+import re
+import shutil
+import weakref
+import tempfile
+import numpy as np
+import joblib
+
+
+# Names become file names: no separators, no "." or ".."
+_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.-]*")
+
+
+def _default_folder():
+    shm = "/dev/shm"
+    return shm if os.path.isdir(shm) and os.access(shm, os.W_OK) else None
+
+
+class ArrayHandle:
+    """Picklable reference to a registered array: a path, a dtype, a shape."""
+
+    __slots__ = ("path", "dtype", "shape")
+
+    def __init__(self, path, dtype, shape):
+        self.path = path
+        self.dtype = dtype
+        self.shape = shape
+
+    def open(self):
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=self.shape)
+
+    def __getstate__(self):
+        return (self.path, self.dtype, self.shape)
+
+    def __setstate__(self, state):
+        self.path, self.dtype, self.shape = state
+
+    def __repr__(self):
+        return "ArrayHandle(%r, %s, %s)" % (self.path, self.dtype, self.shape)
+
+
+class DatasetRegistry:
+    def __init__(self, folder=None):
+        self.folder = tempfile.mkdtemp(
+            prefix="hpc_datasets_", dir=folder or _default_folder()
+        )
+        self.handles = {}
+        self._views = {}
+        # removes the folder when the registry is collected or at exit,
+        # without keeping the registry alive as an atexit hook would
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self.folder, ignore_errors=True
+        )
+
+    def _path(self, name):
+        if not isinstance(name, str) or not _NAME.fullmatch(name):
+            raise ValueError(
+                "Invalid dataset name %r: use letters, digits, '_', '.' and '-'"
+                % (name,)
+            )
+        return os.path.join(self.folder, "%s.dat" % name)
+
+    def put(self, name, array, dtype=None):
+        """
+        Copy array into shared memory under name (replacing any previous
+        one) and return the read-only view. dtype converts on the way, e.g.
+        float32 for tree ensembles, which would otherwise convert in every
+        fit.
+        """
+        array = np.asarray(array, dtype=dtype)
+        if array.dtype.hasobject:
+            raise TypeError(
+                "Object arrays cannot be shared, %r is %s" % (name, array.dtype)
+            )
+        path = self._path(name)
+        self.remove(name)
+        if array.size == 0:
+            # np.memmap cannot map an empty file
+            self.handles[name] = ArrayHandle(path, array.dtype.str, array.shape)
+            self._views[name] = array
+            return array
+        out = np.memmap(path, dtype=array.dtype, mode="w+", shape=array.shape)
+        out[...] = array
+        out.flush()
+        del out
+        self.handles[name] = ArrayHandle(path, array.dtype.str, array.shape)
+        self._views[name] = self.handles[name].open()
+        return self._views[name]
+
+    def put_many(self, **arrays):
+        return {name: self.put(name, array) for name, array in arrays.items()}
+
+    def get(self, name):
+        return self._views[name]
+
+    def handle(self, name):
+        return self.handles[name]
+
+    def __contains__(self, name):
+        return name in self.handles
+
+    @property
+    def names(self):
+        return list(self.handles)
+
+    @property
+    def nbytes(self):
+        return sum(view.nbytes for view in self._views.values())
+
+    def remove(self, name):
+        self.handles.pop(name, None)
+        if self._views.pop(name, None) is not None:
+            path = self._path(name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def parallel_config(self, backend="loky", n_jobs=-1, **kwargs):
+        """joblib.parallel_config with automatic dumping of other arrays off."""
+        kwargs.setdefault("max_nbytes", None)
+        return joblib.parallel_config(backend=backend, n_jobs=n_jobs, **kwargs)
+
+    def close(self):
+        """Drop every array; views still alive keep their pages until deleted."""
+        self.handles.clear()
+        self._views.clear()
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _sum_handle(handle):
+    """Worker side of the demo: map the array, nothing was sent but the handle."""
+    return float(handle.open().sum())
+
+
+if __name__ == "__main__":
+    import time
+    import pickle
+    from multiprocessing import Pool
+    from sklearn.datasets import make_classification
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.model_selection import GridSearchCV
+
+    X, y = make_classification(
+        n_samples=11000,
+        n_features=1000,
+        n_informative=50,
+        n_redundant=0,
+        n_classes=10,
+        class_sep=2.5,
+        random_state=0,
+    )
+    X_train, y_train = X[:10000], y[:10000]
+    parameters = {"alpha": [1e-4, 1e-1, 1], "epsilon": [0.01, 0.1]}
+    n_jobs = 2
+
+    with DatasetRegistry() as registry:
+        X_shared = registry.put("X_train", X_train)
+        print(
+            "X_train: %.0f MB in %s, pickled view %d bytes"
+            % (
+                registry.nbytes / 1e6,
+                registry.folder,
+                len(pickle.dumps(registry.handle("X_train"))),
+            )
+        )
+        with Pool(2) as pool:
+            sums = pool.map(_sum_handle, [registry.handle("X_train")] * 4)
+        assert np.allclose(sums, X_train.sum())
+
+        # transfer alone: 20 Parallel calls of 4 tasks that only look at X
+        print("\n%-36s %14s %18s" % ("", "20 x Parallel", "3 x GridSearchCV"))
+        print("%-36s %14s %18s" % ("X_train sent as", "[s]", "[s]"))
+        for name, data, max_nbytes in (
+            ("ndarray, pickled (max_nbytes=None)", X_train, None),
+            ("ndarray, joblib auto-memmap", X_train, "1M"),
+            ("registry view", X_shared, None),
+        ):
+            with registry.parallel_config("loky", n_jobs=n_jobs, max_nbytes=max_nbytes):
+                start = time.perf_counter()
+                for _ in range(20):
+                    joblib.Parallel()(joblib.delayed(np.shape)(data) for _ in range(4))
+                transfer = time.perf_counter() - start
+                start = time.perf_counter()
+                for _ in range(3):
+                    # a few epochs per fit: the cost of moving X_train shows
+                    GridSearchCV(
+                        SGDClassifier(max_iter=5, tol=None, random_state=0),
+                        parameters,
+                        n_jobs=n_jobs,
+                    ).fit(data, y_train)
+                search = time.perf_counter() - start
+            print("%-36s %14.2f %18.2f" % (name, transfer, search))
@@ -0,0 +1,342 @@
+"""
+What? Automatic choice of the LogisticRegression solver from the shape of
+      the data
+
+"How to optimise scikit-learn execution time" fits newton-cg, lbfgs,
+liblinear, sag and saga on every sample size and prints the fastest. Here
+that loop becomes a reusable autotuner:
+
+    tuner = SolverAutotuner()
+    solver = tuner.select(X, y)           # "lbfgs", "saga", ...
+    model = tuner.make_estimator(X, y, C=0.5).fit(X, y)
+
+    - every solver is fitted on a few stratified subsamples of growing size
+      (at most 'subsample' rows), timed and scored on a held-out part
+    - a solver more than max_ratio times slower than the fastest one on a
+      subsample is not timed on the larger ones
+    - the timings feed a cost model per solver, log(seconds) linear in
+      log(n_samples), log(n_features), log(density) and log(n_classes),
+      fitted by ridge least squares on the subsamples of this dataset, or
+      on every profile seen so far when select() is told not to benchmark
+    - the winner is the solver with the smallest predicted time at the full
+      size, among those that converged and score within score_tol of the best
+    - winners are cached per data profile, a key made of power-of-2 buckets
+      of n_samples and n_features, a decade of density and n_classes, in a
+      JSON file per host, so later jobs with the same profile skip the
+      benchmark altogether
+
+Reference: https://scikit-learn.org/stable/modules/linear_model.html#solvers
+"""
+
+# Import modules
+import os
+import json
+import math
+import time
+import hashlib
+import platform
+import warnings
+import numpy as np
+import scipy.sparse as sp
+import sklearn
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+SOLVERS = ("newton-cg", "lbfgs", "liblinear", "sag", "saga")
+DEFAULT_SOLVER = "lbfgs"  # LogisticRegression's own default
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "hpc_solver_autotuner"
+)
+
+
+def host_id():
+    """Timings are only comparable on the same kind of machine and library."""
+    blob = json.dumps(
+        [platform.machine(), platform.processor(), os.cpu_count(), sklearn.__version__]
+    ).encode()
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+
+def data_profile(X, y, max_rows=5000):
+    """
+    (n_samples, n_features, density, n_classes) of a dataset. The density of
+    a dense X is counted on at most max_rows evenly spaced rows: the profile
+    is computed on every select(), cache hits included, and only needs the
+    decade of the density.
+    """
+    n, p = X.shape
+    if sp.issparse(X):
+        density = X.nnz / max(1, n * p)
+    else:
+        rows = X[:: max(1, -(-n // max_rows))]
+        density = np.count_nonzero(rows) / max(1, rows.size)
+    return {
+        "n_samples": int(n),
+        "n_features": int(p),
+        "density": float(max(density, 1e-6)),
+        "n_classes": int(len(np.unique(y))),
+    }
+
+
+def profile_key(profile):
+    """Cache key: octave of n_samples and n_features, decade of density."""
+    return "n%d-p%d-d%d-k%d" % (
+        max(0, profile["n_samples"] - 1).bit_length(),
+        max(0, profile["n_features"] - 1).bit_length(),
+        round(-math.log10(profile["density"])),
+        profile["n_classes"],
+    )
+
+
+def _features(profile):
+    return np.array(
+        [
+            1.0,
+            math.log(profile["n_samples"]),
+            math.log(profile["n_features"]),
+            math.log(profile["density"]),
+            math.log(profile["n_classes"]),
+        ]
+    )
+
+
+class CostModel:
+    """log(seconds) of one solver, linear in the log of the profile."""
+
+    def __init__(self, ridge=1e-3):
+        self.ridge = ridge
+        self.coef = None
+
+    def fit(self, records):
+        A = np.array([_features(r) for r in records])
+        b = np.log([max(r["seconds"], 1e-6) for r in records])
+        # ridge keeps the columns that are constant over the records (one
+        # dataset has a single n_features) from blowing up
+        self.coef = np.linalg.solve(A.T @ A + self.ridge * np.eye(A.shape[1]), A.T @ b)
+        return self
+
+    def predict(self, profile):
+        return float(np.exp(_features(profile) @ self.coef))
+
+
+def _fit_time(solver, X_train, y_train, X_test, y_test, max_iter, random_state):
+    model = LogisticRegression(
+        solver=solver, max_iter=max_iter, random_state=random_state
+    )
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ConvergenceWarning)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        seconds = time.perf_counter() - start
+    converged = not any(issubclass(w.category, ConvergenceWarning) for w in caught)
+    return seconds, float(model.score(X_test, y_test)), converged
+
+
+class SolverAutotuner:
+    def __init__(
+        self,
+        solvers=SOLVERS,
+        subsample=4000,
+        n_sizes=3,
+        max_iter=100,
+        score_tol=0.01,
+        max_ratio=10.0,
+        cache_dir=None,
+        random_state=0,
+    ):
+        self.solvers = tuple(solvers)
+        self.subsample = subsample
+        self.n_sizes = n_sizes
+        self.max_iter = max_iter
+        self.score_tol = score_tol
+        self.max_ratio = max_ratio
+        self.random_state = random_state
+        self.cache_dir = cache_dir or os.environ.get(
+            "HPC_SOLVER_CACHE", DEFAULT_CACHE_DIR
+        )
+        self.records, self.best = self._load()
+
+    # Benchmark
+    def benchmark(self, X, y):
+        """Time every solver on subsamples of X, add the timings to the records."""
+        n = X.shape[0]
+        top = min(n, self.subsample)
+        sizes = sorted({min(n, max(200, top >> i)) for i in range(self.n_sizes)})
+        rng = np.random.default_rng(self.random_state)
+        new, solvers = [], list(self.solvers)
+        for size in sizes:
+            idx = rng.choice(n, size, replace=False) if size < n else np.arange(n)
+            try:
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X[idx],
+                    y[idx],
+                    test_size=0.25,
+                    stratify=y[idx],
+                    random_state=self.random_state,
+                )
+            except ValueError:
+                # a class too small to be split: nothing to time at this size
+                continue
+            profile = data_profile(X_train, y_train)
+            timed = {}
+            for solver in solvers:
+                seconds, score, converged = _fit_time(
+                    solver,
+                    X_train,
+                    y_train,
+                    X_test,
+                    y_test,
+                    self.max_iter,
+                    self.random_state,
+                )
+                timed[solver] = seconds
+                new.append(
+                    dict(
+                        profile,
+                        solver=solver,
+                        seconds=seconds,
+                        score=score,
+                        converged=converged,
+                    )
+                )
+            fastest = min(timed.values())
+            solvers = [s for s in solvers if timed[s] <= self.max_ratio * fastest]
+        self.records.extend(new)
+        return new
+
+    def models(self, records=None):
+        """
+        A CostModel per solver, fitted on records (default: all of this
+        host). Solvers timed at a single size (pruned early) get none.
+        """
+        records = self.records if records is None else records
+        models = {}
+        for solver in self.solvers:
+            mine = [r for r in records if r["solver"] == solver]
+            if len({r["n_samples"] for r in mine}) >= 2:
+                models[solver] = CostModel().fit(mine)
+        return models
+
+    def predict(self, profile, records=None):
+        """Predicted seconds of every solver on a dataset of this profile."""
+        return {s: m.predict(profile) for s, m in self.models(records).items()}
+
+    def _largest(self, trial):
+        """Records of the largest subsample of a trial."""
+        largest = max(r["n_samples"] for r in trial)
+        return [r for r in trial if r["n_samples"] == largest]
+
+    def _eligible(self, trial):
+        """Solvers that converged and score close to the best on the largest subsample."""
+        if not trial:
+            return list(self.solvers)
+        last = self._largest(trial)
+        best_score = max(r["score"] for r in last)
+        good = [
+            r["solver"]
+            for r in last
+            if r["converged"] and r["score"] >= best_score - self.score_tol
+        ]
+        return good or [r["solver"] for r in last]
+
+    # Selection
+    def select(self, X, y, benchmark=True):
+        """
+        Best solver for (X, y): from the cache if this profile was seen,
+        otherwise from a benchmark on subsamples (or from the cost model
+        alone with benchmark=False, once there are records).
+        """
+        profile = data_profile(X, y)
+        key = profile_key(profile)
+        if key in self.best:
+            return self.best[key]["solver"]
+        trial = self.benchmark(X, y) if benchmark or not self.records else []
+        eligible = self._eligible(trial)
+        if trial:
+            predicted = self.predict(profile, trial)
+            # timed at a single size (small data, or pruned): use what was measured
+            for r in self._largest(trial):
+                predicted.setdefault(r["solver"], r["seconds"])
+        else:
+            # nothing could be timed on this data: cost model of earlier profiles
+            predicted = self.predict(profile)
+        if predicted:
+            solver = min(eligible, key=lambda s: predicted.get(s, math.inf))
+        else:
+            solver = DEFAULT_SOLVER
+        self.best[key] = {"solver": solver, "profile": profile, "seconds": predicted}
+        self.save()
+        return solver
+
+    def make_estimator(self, X, y, **params):
+        """LogisticRegression(solver=<best for X, y>, **params)."""
+        return LogisticRegression(solver=self.select(X, y), **params)
+
+    # Persistence
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, "%s.json" % host_id())
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data["records"], data["best"]
+        except (OSError, ValueError, KeyError):
+            return [], {}
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = "%s.%d.tmp" % (self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump({"records": self.records, "best": self.best}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.records, self.best = [], {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from sklearn.datasets import make_classification
+
+    tuner = SolverAutotuner(cache_dir=tempfile.mkdtemp())
+    print("%8s %6s %12s %10s %10s" % ("samples", "tuned", "best", "fit [s]", "cached"))
+    for sample in (1000, 10000, 100000):
+        X, y = make_classification(
+            n_samples=sample, n_features=int(0.01 * sample), n_classes=2, random_state=0
+        )
+        start = time.perf_counter()
+        solver = tuner.select(X, y)
+        tuned = time.perf_counter() - start
+        start = time.perf_counter()
+        LogisticRegression(solver=solver).fit(X, y)
+        fit = time.perf_counter() - start
+        start = time.perf_counter()
+        assert tuner.select(X, y) == solver
+        cached = time.perf_counter() - start
+        print("%8d %6.2f %12s %10.3f %10.1e" % (sample, tuned, solver, fit, cached))
+
+    # the brute-force loop of the notebook, at the largest size
+    print("\nAll solvers on the full 100000 samples:")
+    timings = {}
+    for solver in SOLVERS:
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            LogisticRegression(solver=solver).fit(X, y)
+        timings[solver] = time.perf_counter() - start
+    last = [r for r in tuner.records if r["n_features"] == X.shape[1]]
+    predicted = tuner.predict(data_profile(X, y), last)
+    for solver in SOLVERS:
+        print(
+            "%10s measured %6.3f s, predicted %s"
+            % (
+                solver,
+                timings[solver],
+                "%6.3f s" % predicted[solver] if solver in predicted else "(pruned)",
+            )
+        )
@@ -0,0 +1,163 @@
+"""
+What? Python 3 version of the "Cython vs. Numba vs. Parakeet on Bubblesort"
+      benchmark, with real sorting kernels next to the bubblesort baselines
+
+parakeet is no longer maintained and is dropped. The bubblesort baselines are
+O(n^2): the pure Python ones stop at PYTHON_MAX_N and the compiled ones at
+BUBBLE_MAX_N, the O(n log n) kernels and np.sort carry on to 10**7.
+
+Reference: https://nbviewer.org/github/rasbt/One-Python-benchmark-per-day/blob/master/ipython_nbs/day4_2_cython_numba_parakeet.ipynb
+"""
+
+# Import modules
+import copy
+import timeit
+import platform
+import numpy as np
+import sorting
+from sort_numba import numba_bubblesort
+
+try:
+    from sort_cy import cython_bubblesort
+except ImportError:
+    cython_bubblesort = None
+
+# Same sizes as the tutorial, plus two where only n log n sorts are usable
+orders_n = [10**n for n in range(1, 6)]
+SORT_ORDERS_N = orders_n + [10**6, 10**7]
+PYTHON_MAX_N = 10**4
+BUBBLE_MAX_N = 10**5
+
+
+def python_bubblesort(a_list):
+    """Bubblesort in Python for list objects."""
+    length = len(a_list)
+    swapped = 1
+    for i in range(0, length):
+        if swapped:
+            swapped = 0
+            for ele in range(0, length - i - 1):
+                if a_list[ele] > a_list[ele + 1]:
+                    temp = a_list[ele + 1]
+                    a_list[ele + 1] = a_list[ele]
+                    a_list[ele] = temp
+                    swapped = 1
+    return a_list
+
+
+def python_bubblesort_ary(np_ary):
+    """Bubblesort in Python for NumPy arrays."""
+    length = np_ary.shape[0]
+    swapped = 1
+    for i in range(0, length):
+        if swapped:
+            swapped = 0
+            for ele in range(0, length - i - 1):
+                if np_ary[ele] > np_ary[ele + 1]:
+                    temp = np_ary[ele + 1]
+                    np_ary[ele + 1] = np_ary[ele]
+                    np_ary[ele] = temp
+                    swapped = 1
+    return np_ary
+
+
+def candidates():
+    """{label: (function sorting its argument, largest n it is run on)}"""
+    funcs = {
+        "np.sort": (np.sort, max(SORT_ORDERS_N)),
+        "python_bubblesort": (python_bubblesort, PYTHON_MAX_N),
+        "python_bubblesort_ary": (python_bubblesort_ary, PYTHON_MAX_N),
+        "numba_bubblesort": (numba_bubblesort, BUBBLE_MAX_N),
+    }
+    if cython_bubblesort is not None:
+        funcs["cython_bubblesort"] = (cython_bubblesort, BUBBLE_MAX_N)
+    for kind, backend in sorting.available_sorters():
+        func = lambda a, k=kind, b=backend: sorting.sort(a, k, b, copy=False)
+        funcs["%s_%s" % (backend, kind)] = (func, max(SORT_ORDERS_N))
+    return funcs
+
+
+def run(sizes=SORT_ORDERS_N, repeat=3, seed=0):
+    """{label: [(n, best seconds), ...]}, each call sorting a fresh copy."""
+    rng = np.random.default_rng(seed)
+    funcs = candidates()
+    # compile every kernel before timing
+    warm = rng.integers(0, 100, 100)
+    for f, _ in funcs.values():
+        f(warm.copy())
+    timings = {label: [] for label in funcs}
+    for n in sizes:
+        data = rng.integers(0, n, n)
+        as_list = data.tolist()
+        for label, (f, max_n) in funcs.items():
+            if n > max_n:
+                continue
+            src = as_list if label == "python_bubblesort" else data
+            best = min(
+                timeit.repeat(
+                    "f(a)",
+                    setup="a = copy.copy(src)",
+                    globals={"f": f, "src": src, "copy": copy},
+                    repeat=repeat,
+                    number=1,
+                )
+            )
+            timings[label].append((n, best))
+    return timings
+
+
+def print_sysinfo():
+    import numba
+    import Cython
+
+    print("\nPython version  :", platform.python_version())
+    print("compiler        :", platform.python_compiler())
+    print("Cython version  :", Cython.__version__)
+    print("NumPy version   :", np.__version__)
+    print("Numba version   :", numba.__version__)
+    print("\nsystem     :", platform.system())
+    print("machine    :", platform.machine())
+    print("CPU count  :", numba.config.NUMBA_NUM_THREADS)
+
+
+def summary_table(timings):
+    """Milliseconds at every size, and M items/s at the largest size."""
+    sizes = sorted({n for rows in timings.values() for n, _ in rows})
+    print("\n%-24s" % "ms" + "".join("%11s" % ("n=%.0e" % n) for n in sizes))
+    for label, rows in timings.items():
+        t = dict(rows)
+        cells = ["%11.3f" % (1e3 * t[n]) if n in t else "%11s" % "-" for n in sizes]
+        print("%-24s" % label + "".join(cells))
+    ranked = sorted(
+        ((rows[-1][0] / rows[-1][1] / 1e6, rows[-1][0], label))
+        for label, rows in timings.items()
+        if rows
+    )
+    print("\n%-24s %14s %10s" % ("throughput", "M items/s", "at n"))
+    for rate, n, label in reversed(ranked):
+        print("%-24s %14.2f %10.0e" % (label, rate, n))
+
+
+def plot(timings, title="Sorting engine vs. bubblesort"):
+    import matplotlib.pyplot as plt
+
+    plt.rcParams.update({"font.size": 12})
+    plt.figure(figsize=(11, 10))
+    for label, rows in timings.items():
+        n, t = zip(*rows)
+        plt.plot(n, 1e3 * np.array(t), alpha=0.5, label=label, marker="o", lw=3)
+    plt.xlabel("sample size n (items in the array)")
+    plt.ylabel("time per computation in milliseconds")
+    plt.legend(loc=2)
+    plt.grid()
+    plt.xscale("log")
+    plt.yscale("log")
+    plt.title(title)
+    plt.show()
+
+
+if __name__ == "__main__":
+    print_sysinfo()
+    timings = run()
+    summary_table(timings)
+    plot(timings)
@@ -0,0 +1,229 @@
+"""
+What? Parallel external sort of fixed-dtype records stored in a binary file
+
+The file may be larger than the memory. It is read through np.memmap and
+sorted in two phases:
+
+    1. run generation: the file is cut into chunks of chunk_bytes, a process
+       pool reads, sorts and writes every chunk to its own run file
+    2. k-way merge: each run is read sequentially through a buffer of
+       buffer_bytes. At every step the smallest of the last buffered keys is
+       a bound that no record still on disk can be below, so every buffered
+       record <= bound is emitted with one vectorised merge and written out
+       with a single sequential write
+
+Records can be a plain dtype (sorted by value) or a structured dtype sorted
+on one of its fields, e.g. np.dtype([("key", "<u8"), ("payload", "V24")]).
+Memory use is about n_workers * chunk_bytes for phase 1 and
+(k + 2) * buffer_bytes for phase 2.
+
+Reference: https://en.wikipedia.org/wiki/External_sorting
+"""
+
+# Import modules
+import os
+import time
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+
+
+def _keys(records, key):
+    return records if key is None else records[key]
+
+
+def _sort_records(records, key):
+    if key is None:
+        records.sort()
+        return records
+    return records[np.argsort(records[key], kind="stable")]
+
+
+def _sort_chunk(args):
+    """Phase 1 task: sort records [start, stop) of src into run_path."""
+    src, dtype, key, start, stop, run_path = args
+    chunk = np.array(
+        np.memmap(src, dtype, "r", offset=start * dtype.itemsize, shape=(stop - start,))
+    )
+    _sort_records(chunk, key).tofile(run_path)
+    return run_path
+
+
+class _RunReader:
+    """Buffered sequential reader over one sorted run file."""
+
+    def __init__(self, path, dtype, buffer_items):
+        self.file = open(path, "rb")
+        self.dtype = dtype
+        self.buffer_items = buffer_items
+        self.buffer = np.empty(0, dtype)
+        self.refill()
+
+    def refill(self):
+        self.buffer = np.fromfile(self.file, self.dtype, self.buffer_items)
+        if len(self.buffer) == 0:
+            self.file.close()
+
+    @property
+    def exhausted(self):
+        return len(self.buffer) == 0
+
+
+def _merge_runs(run_paths, dst, dtype, key, buffer_bytes):
+    buffer_items = max(1, buffer_bytes // dtype.itemsize)
+    readers = [_RunReader(p, dtype, buffer_items) for p in run_paths]
+    with open(dst, "wb", buffering=buffer_bytes) as out:
+        while True:
+            readers = [r for r in readers if not r.exhausted]
+            if not readers:
+                break
+            if len(readers) == 1:
+                r = readers[0]
+                while not r.exhausted:
+                    r.buffer.tofile(out)
+                    r.refill()
+                break
+            bound = min(_keys(r.buffer, key)[-1] for r in readers)
+            pieces = []
+            for r in readers:
+                cut = np.searchsorted(_keys(r.buffer, key), bound, side="right")
+                pieces.append(r.buffer[:cut])
+                r.buffer = r.buffer[cut:]
+                if r.exhausted:
+                    r.refill()
+            # the pieces are sorted runs: the stable sort merges them in
+            # O(m log k) (timsort for the key, radix for small integers)
+            merged = np.concatenate(pieces)
+            if key is None:
+                merged.sort(kind="stable")
+            else:
+                merged = merged[np.argsort(merged[key], kind="stable")]
+            merged.tofile(out)
+
+
+def external_sort(
+    src,
+    dst,
+    dtype,
+    key=None,
+    chunk_bytes=64 * 2**20,
+    buffer_bytes=4 * 2**20,
+    n_workers=None,
+    tmp_dir=None,
+):
+    """
+    Sort the records of the binary file src into dst.
+
+    Returns a dict with the time of both phases, the number of runs and the
+    end-to-end throughput in GB/s (file size / total time).
+    """
+    dtype = np.dtype(dtype)
+    if key is not None and key not in (dtype.names or ()):
+        raise ValueError("%r is not a field of %s" % (key, dtype))
+    size = os.path.getsize(src)
+    if size % dtype.itemsize:
+        raise ValueError(
+            "%s is not a whole number of %d-byte records" % (src, dtype.itemsize)
+        )
+    n = size // dtype.itemsize
+    chunk_items = max(1, chunk_bytes // dtype.itemsize)
+    n_workers = n_workers or os.cpu_count()
+
+    tmp = tempfile.mkdtemp(dir=tmp_dir or os.path.dirname(os.path.abspath(dst)))
+    try:
+        start = time.perf_counter()
+        tasks = [
+            (
+                src,
+                dtype,
+                key,
+                lo,
+                min(lo + chunk_items, n),
+                os.path.join(tmp, "run_%06d.bin" % i),
+            )
+            for i, lo in enumerate(range(0, n, chunk_items))
+        ]
+        if len(tasks) <= 1 or n_workers == 1:
+            run_paths = [_sort_chunk(t) for t in tasks]
+        else:
+            with multiprocessing.Pool(min(n_workers, len(tasks))) as pool:
+                run_paths = pool.map(_sort_chunk, tasks, chunksize=1)
+        t_runs = time.perf_counter() - start
+
+        if len(run_paths) == 1:
+            shutil.move(run_paths[0], dst)
+        else:
+            _merge_runs(run_paths, dst, dtype, key, buffer_bytes)
+        total = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "records": n,
+        "runs": len(run_paths),
+        "run_seconds": t_runs,
+        "merge_seconds": total - t_runs,
+        "GB/s": size / total / 1e9 if total else float("inf"),
+    }
+
+
+def is_sorted_file(path, dtype, key=None, block_items=2**22):
+    """Check the order of a file block by block, through a memmap."""
+    dtype = np.dtype(dtype)
+    if os.path.getsize(path) == 0:
+        return True
+    data = np.memmap(path, dtype, "r")
+    previous = None
+    for lo in range(0, len(data), block_items):
+        keys = _keys(data[lo : lo + block_items], key)
+        if np.any(keys[1:] < keys[:-1]) or (
+            previous is not None and keys[0] < previous
+        ):
+            return False
+        previous = keys[-1]
+    return True
+
+
+def make_records(path, n, dtype, key=None, seed=0, block_items=2**22):
+    """Random records written block by block, so n can exceed the memory."""
+    dtype = np.dtype(dtype)
+    rng = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        for lo in range(0, n, block_items):
+            block = np.zeros(min(block_items, n - lo), dtype)
+            values = rng.integers(0, 2**63, len(block), dtype=np.uint64)
+            if key is None:
+                block[:] = values.astype(dtype)
+            else:
+                block[key] = values.astype(dtype[key])
+            block.tofile(f)
+
+
+if __name__ == "__main__":
+    record = np.dtype([("key", "<u8"), ("payload", "V24")])
+    workdir = tempfile.mkdtemp()
+    src, dst = os.path.join(workdir, "records.bin"), os.path.join(workdir, "sorted.bin")
+    print("Cores:", os.cpu_count())
+    print(
+        "%10s %6s %10s %10s %8s"
+        % ("size [MB]", "runs", "phase 1 [s]", "merge [s]", "GB/s")
+    )
+    try:
+        for size_mb in (64, 256, 1024):
+            n = size_mb * 2**20 // record.itemsize
+            make_records(src, n, record, key="key")
+            stats = external_sort(src, dst, record, key="key", chunk_bytes=32 * 2**20)
+            assert is_sorted_file(dst, record, key="key")
+            assert os.path.getsize(dst) == os.path.getsize(src)
+            print(
+                "%10d %6d %10.2f %10.2f %8.3f"
+                % (
+                    size_mb,
+                    stats["runs"],
+                    stats["run_seconds"],
+                    stats["merge_seconds"],
+                    stats["GB/s"],
+                )
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
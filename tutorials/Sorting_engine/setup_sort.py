@@ -0,0 +1,22 @@
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+import numpy as np
+
+# MSVC spells it /openmp, clang on macOS needs libomp installed
+openmp = ["-fopenmp"]
+
+setup(
+    ext_modules=cythonize(
+        [
+            Extension(
+                "sort_cy",
+                ["sort_cy.pyx"],
+                include_dirs=[np.get_include()],
+                extra_compile_args=openmp + ["-O3"],
+                extra_link_args=openmp,
+            )
+        ],
+        annotate=True,
+        language_level=3,
+    )
+)
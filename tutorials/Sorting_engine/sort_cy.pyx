@@ -0,0 +1,228 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+What? Cython sorting kernels, same algorithms as sort_numba.py
+
+Fused types give one compiled specialisation per dtype. merge_sort sorts its
+chunks in a prange loop (OpenMP, see setup_sort.py); at every merge level the
+pairs of runs are merged in parallel, but unlike the numba version a single
+merge is not split between threads.
+"""
+
+import numpy as np
+from cython.parallel cimport prange
+from libc.math cimport log2
+cimport openmp
+
+ctypedef fused number:
+    signed char
+    short
+    int
+    long long
+    unsigned char
+    unsigned short
+    unsigned int
+    unsigned long long
+    float
+    double
+
+ctypedef fused ukey:
+    unsigned char
+    unsigned short
+    unsigned int
+    unsigned long long
+
+cdef enum:
+    INSERTION_THRESHOLD = 16
+
+
+cdef inline void _swap(number[:] a, Py_ssize_t i, Py_ssize_t j) noexcept nogil:
+    cdef number t = a[i]
+    a[i] = a[j]
+    a[j] = t
+
+
+cdef void _insertion_sort(number[:] a, Py_ssize_t lo, Py_ssize_t hi) noexcept nogil:
+    cdef Py_ssize_t i, j
+    cdef number x
+    for i in range(lo + 1, hi):
+        x = a[i]
+        j = i - 1
+        while j >= lo and a[j] > x:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+cdef void _sift_down(number[:] a, Py_ssize_t lo, Py_ssize_t root, Py_ssize_t n) noexcept nogil:
+    cdef Py_ssize_t child
+    while True:
+        child = 2 * root + 1
+        if child >= n:
+            return
+        if child + 1 < n and a[lo + child] < a[lo + child + 1]:
+            child += 1
+        if a[lo + root] >= a[lo + child]:
+            return
+        _swap(a, lo + root, lo + child)
+        root = child
+
+
+cdef void _heapsort(number[:] a, Py_ssize_t lo, Py_ssize_t hi) noexcept nogil:
+    cdef Py_ssize_t n = hi - lo, root, end
+    for root in range(n // 2 - 1, -1, -1):
+        _sift_down(a, lo, root, n)
+    for end in range(n - 1, 0, -1):
+        _swap(a, lo, lo + end)
+        _sift_down(a, lo, 0, end)
+
+
+cdef void _introsort(number[:] a, Py_ssize_t lo, Py_ssize_t hi, int depth) noexcept nogil:
+    cdef Py_ssize_t l = lo, h = hi, m, i, j
+    cdef number pivot
+    while h - l > INSERTION_THRESHOLD:
+        if depth == 0:
+            _heapsort(a, l, h)
+            return
+        depth -= 1
+        m = l + (h - l) // 2
+        if a[m] < a[l]:
+            _swap(a, m, l)
+        if a[h - 1] < a[l]:
+            _swap(a, h - 1, l)
+        if a[h - 1] < a[m]:
+            _swap(a, h - 1, m)
+        _swap(a, l, m)
+        pivot = a[l]
+        i = l
+        j = h - 1
+        while True:
+            i += 1
+            while a[i] < pivot:
+                i += 1
+            while pivot < a[j]:
+                j -= 1
+            if i >= j:
+                break
+            _swap(a, i, j)
+        _swap(a, l, j)
+        # recurse on the smaller side, loop on the larger one
+        if j - l < h - j - 1:
+            _introsort(a, l, j, depth)
+            l = j + 1
+        else:
+            _introsort(a, j + 1, h, depth)
+            h = j
+    _insertion_sort(a, l, h)
+
+
+cdef inline int _max_depth(Py_ssize_t n) noexcept nogil:
+    return 2 * <int>log2(n) if n > 1 else 0
+
+
+def introsort(number[:] a):
+    with nogil:
+        _introsort(a, 0, a.shape[0], _max_depth(a.shape[0]))
+    return a.base
+
+
+def radix_sort(ukey[:] keys):
+    """LSD radix sort of unsigned integer keys, 8 bits per pass."""
+    cdef Py_ssize_t n = keys.shape[0], i, total, c
+    cdef Py_ssize_t counts[256]
+    cdef int p, shift, d, skip
+    buf = np.empty_like(keys.base)
+    cdef ukey[:] src = keys, dst = buf, tmp
+    cdef bint swapped = False
+    with nogil:
+        for p in range(<int>sizeof(ukey)):
+            shift = 8 * p
+            for d in range(256):
+                counts[d] = 0
+            for i in range(n):
+                counts[(src[i] >> shift) & 0xFF] += 1
+            skip = 0
+            for d in range(256):
+                if counts[d] == n:
+                    skip = 1
+            if skip:
+                continue
+            total = 0
+            for d in range(256):
+                c = counts[d]
+                counts[d] = total
+                total += c
+            for i in range(n):
+                d = (src[i] >> shift) & 0xFF
+                dst[counts[d]] = src[i]
+                counts[d] += 1
+            tmp = src
+            src = dst
+            dst = tmp
+            swapped = not swapped
+        if swapped:
+            keys[:] = src
+    return keys.base
+
+
+cdef void _merge(number[:] src, number[:] dst, Py_ssize_t lo, Py_ssize_t mid,
+                 Py_ssize_t hi) noexcept nogil:
+    cdef Py_ssize_t i = lo, j = mid, out = lo
+    while i < mid and j < hi:
+        if src[j] < src[i]:
+            dst[out] = src[j]
+            j += 1
+        else:
+            dst[out] = src[i]
+            i += 1
+        out += 1
+    while i < mid:
+        dst[out] = src[i]
+        i += 1
+        out += 1
+    while j < hi:
+        dst[out] = src[j]
+        j += 1
+        out += 1
+
+
+def merge_sort(number[:] a, int n_threads=0):
+    """Parallel chunk introsort, then one merge per pair of runs per thread."""
+    cdef Py_ssize_t n = a.shape[0], width, c, n_chunks, lo
+    if n_threads <= 0:
+        n_threads = openmp.omp_get_max_threads()
+    width = max(INSERTION_THRESHOLD, (n + n_threads - 1) // n_threads)
+    n_chunks = (n + width - 1) // width
+    buf = np.empty_like(a.base)
+    cdef number[:] src = a, dst = buf, tmp
+    cdef bint swapped = False
+    for c in prange(n_chunks, nogil=True, num_threads=n_threads):
+        _introsort(a, c * width, min((c + 1) * width, n), _max_depth(width))
+    with nogil:
+        while width < n:
+            for c in prange((n + 2 * width - 1) // (2 * width), num_threads=n_threads):
+                lo = c * 2 * width
+                _merge(src, dst, lo, min(lo + width, n), min(lo + 2 * width, n))
+            tmp = src
+            src = dst
+            dst = tmp
+            swapped = not swapped
+            width *= 2
+        if swapped:
+            a[:] = src
+    return a.base
+
+
+def cython_bubblesort(number[:] np_ary):
+    """The tutorial baseline, in Python 3."""
+    cdef Py_ssize_t length = np_ary.shape[0], i, ele
+    cdef bint swapped = 1
+    with nogil:
+        for i in range(length):
+            if not swapped:
+                break
+            swapped = 0
+            for ele in range(length - i - 1):
+                if np_ary[ele] > np_ary[ele + 1]:
+                    _swap(np_ary, ele, ele + 1)
+                    swapped = 1
+    return np_ary.base
@@ -0,0 +1,255 @@
+"""
+What? Numba sorting kernels: LSD radix sort, introsort and parallel merge sort
+
+All the kernels sort in place and are compiled lazily for every dtype they
+are called with.
+
+    - radix_sort:      on unsigned integer keys (see sorting.py for how
+                       signed ints and floats are mapped to them), 8 bits
+                       per pass, passes where every key falls in the same
+                       bucket are skipped
+    - introsort:       median-of-three quicksort, insertion sort below 16
+                       items, heapsort once the depth exceeds 2 log2(n)
+    - merge_sort:      one introsort per thread on its own chunk, then
+                       pairwise merges; each merge is split between threads
+                       with the merge-path (co-rank) partition, so the last
+                       levels are parallel too
+
+Reference: https://en.wikipedia.org/wiki/Introsort
+           https://en.wikipedia.org/wiki/Merge_path
+"""
+
+# Import modules
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+INSERTION_THRESHOLD = 16
+
+
+@njit(cache=True)
+def _insertion_sort(a, lo, hi):
+    for i in range(lo + 1, hi):
+        x = a[i]
+        j = i - 1
+        while j >= lo and a[j] > x:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+@njit(cache=True)
+def _sift_down(a, lo, root, n):
+    while True:
+        child = 2 * root + 1
+        if child >= n:
+            return
+        if child + 1 < n and a[lo + child] < a[lo + child + 1]:
+            child += 1
+        if a[lo + root] >= a[lo + child]:
+            return
+        a[lo + root], a[lo + child] = a[lo + child], a[lo + root]
+        root = child
+
+
+@njit(cache=True)
+def _heapsort(a, lo, hi):
+    n = hi - lo
+    for root in range(n // 2 - 1, -1, -1):
+        _sift_down(a, lo, root, n)
+    for end in range(n - 1, 0, -1):
+        a[lo], a[lo + end] = a[lo + end], a[lo]
+        _sift_down(a, lo, 0, end)
+
+
+@njit(cache=True)
+def _introsort(a, lo, hi):
+    """Sort a[lo:hi] in place, with an explicit stack instead of recursion."""
+    if hi - lo < 2:
+        return
+    max_depth = 2 * int(np.log2(hi - lo))
+    stack = np.empty((2 * max_depth + 64, 3), dtype=np.int64)
+    stack[0, 0], stack[0, 1], stack[0, 2] = lo, hi, max_depth
+    top = 1
+    while top > 0:
+        top -= 1
+        l, h, depth = stack[top, 0], stack[top, 1], stack[top, 2]
+        while h - l > INSERTION_THRESHOLD:
+            if depth == 0:
+                _heapsort(a, l, h)
+                l = h
+                break
+            depth -= 1
+            # median of three moved to a[l]
+            m = l + (h - l) // 2
+            if a[m] < a[l]:
+                a[m], a[l] = a[l], a[m]
+            if a[h - 1] < a[l]:
+                a[h - 1], a[l] = a[l], a[h - 1]
+            if a[h - 1] < a[m]:
+                a[h - 1], a[m] = a[m], a[h - 1]
+            a[l], a[m] = a[m], a[l]
+            pivot = a[l]
+            # Hoare partition
+            i, j = l, h - 1
+            while True:
+                i += 1
+                while a[i] < pivot:
+                    i += 1
+                while pivot < a[j]:
+                    j -= 1
+                if i >= j:
+                    break
+                a[i], a[j] = a[j], a[i]
+            a[l], a[j] = a[j], a[l]
+            # push the larger side, loop on the smaller one: stack is O(log n)
+            if j - l > h - j - 1:
+                stack[top, 0], stack[top, 1], stack[top, 2] = l, j, depth
+                l = j + 1
+            else:
+                stack[top, 0], stack[top, 1], stack[top, 2] = j + 1, h, depth
+                h = j
+            top += 1
+        _insertion_sort(a, l, h)
+
+
+@njit(cache=True)
+def introsort(a):
+    _introsort(a, 0, a.shape[0])
+    return a
+
+
+@njit(cache=True)
+def radix_sort(keys):
+    """LSD radix sort of an unsigned integer array, 8 bits per pass."""
+    n = keys.shape[0]
+    buf = np.empty_like(keys)
+    src, dst = keys, buf
+    n_passes = keys.itemsize
+    counts = np.zeros(256, dtype=np.int64)
+    for p in range(n_passes):
+        shift = 8 * p
+        counts[:] = 0
+        for i in range(n):
+            counts[(src[i] >> shift) & 0xFF] += 1
+        if counts.max() == n:
+            continue  # this byte is the same for every key
+        total = 0
+        for d in range(256):
+            c = counts[d]
+            counts[d] = total
+            total += c
+        for i in range(n):
+            d = (src[i] >> shift) & 0xFF
+            dst[counts[d]] = src[i]
+            counts[d] += 1
+        src, dst = dst, src
+    if src is not keys:
+        keys[:] = src
+    return keys
+
+
+@njit(cache=True)
+def _corank(k, a, a_lo, a_hi, b_lo, b_hi):
+    """
+    Number i of items taken from a[a_lo:a_hi] among the first k outputs of
+    the stable merge of a[a_lo:a_hi] and a[b_lo:b_hi].
+    """
+    lo = max(0, k - (b_hi - b_lo))
+    hi = min(k, a_hi - a_lo)
+    while lo < hi:
+        i = (lo + hi) // 2
+        j = k - i
+        # too few items from the first run: its next item is not after the
+        # last item taken from the second run
+        if j > 0 and i < a_hi - a_lo and not (a[b_lo + j - 1] < a[a_lo + i]):
+            lo = i + 1
+        else:
+            hi = i
+    return lo
+
+
+@njit(cache=True)
+def _merge(src, dst, a_lo, a_hi, b_lo, b_hi, out):
+    i, j = a_lo, b_lo
+    while i < a_hi and j < b_hi:
+        if src[j] < src[i]:
+            dst[out] = src[j]
+            j += 1
+        else:
+            dst[out] = src[i]
+            i += 1
+        out += 1
+    while i < a_hi:
+        dst[out] = src[i]
+        i += 1
+        out += 1
+    while j < b_hi:
+        dst[out] = src[j]
+        j += 1
+        out += 1
+
+
+@njit(parallel=True, cache=True)
+def _merge_level(src, dst, width, n_threads):
+    n = src.shape[0]
+    n_pairs = (n + 2 * width - 1) // (2 * width)
+    parts = max(1, n_threads // n_pairs)
+    for t in prange(n_pairs * parts):
+        pair, part = t // parts, t % parts
+        a_lo = pair * 2 * width
+        a_hi = min(a_lo + width, n)
+        b_hi = min(a_hi + width, n)
+        size = b_hi - a_lo
+        k_lo = size * part // parts
+        k_hi = size * (part + 1) // parts
+        i_lo = _corank(k_lo, src, a_lo, a_hi, a_hi, b_hi)
+        i_hi = _corank(k_hi, src, a_lo, a_hi, a_hi, b_hi)
+        _merge(
+            src,
+            dst,
+            a_lo + i_lo,
+            a_lo + i_hi,
+            a_hi + k_lo - i_lo,
+            a_hi + k_hi - i_hi,
+            a_lo + k_lo,
+        )
+
+
+@njit(parallel=True, cache=True)
+def _sort_chunks(a, width):
+    n = a.shape[0]
+    for c in prange((n + width - 1) // width):
+        _introsort(a, c * width, min((c + 1) * width, n))
+
+
+def merge_sort(a, n_threads=None):
+    """Parallel merge sort: sorted chunks, then merge-path balanced merges."""
+    n = a.shape[0]
+    n_threads = n_threads or get_num_threads()
+    width = max(INSERTION_THRESHOLD, -(-n // n_threads))
+    _sort_chunks(a, width)
+    src, dst = a, np.empty_like(a)
+    while width < n:
+        _merge_level(src, dst, width, n_threads)
+        src, dst = dst, src
+        width *= 2
+    if src is not a:
+        a[:] = src
+    return a
+
+
+@njit(cache=True)
+def numba_bubblesort(np_ary):
+    """The tutorial baseline, in Python 3."""
+    length = np_ary.shape[0]
+    swapped = 1
+    for i in range(0, length):
+        if swapped:
+            swapped = 0
+            for ele in range(0, length - i - 1):
+                if np_ary[ele] > np_ary[ele + 1]:
+                    temp = np_ary[ele + 1]
+                    np_ary[ele + 1] = np_ary[ele]
+                    np_ary[ele] = temp
+                    swapped = 1
+    return np_ary
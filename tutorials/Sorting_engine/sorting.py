@@ -0,0 +1,143 @@
+"""
+What? Pluggable sorting engine for typed NumPy arrays
+
+    sort(a, kind="radix", backend="numba")
+
+kind is one of KINDS ("radix", "merge", "intro") and backend one of
+BACKENDS ("numba", "cython"); both are looked up in the SORTERS registry, so
+another kernel is added with register(). The Cython kernels need
+
+    python setup_sort.py build_ext --inplace
+
+and are skipped by available_sorters() when the extension is not built.
+
+Radix sort works on unsigned integer keys. Signed integers get their sign
+bit flipped; for floats the sign bit is flipped on positive numbers and all
+bits on negative ones, which turns the IEEE 754 ordering into the unsigned
+integer ordering. NaNs are moved to the end, as np.sort does.
+
+Reference: http://stereopsis.com/radix.html
+"""
+
+# Import modules
+import numpy as np
+import sort_numba
+
+try:
+    import sort_cy
+except ImportError:
+    sort_cy = None
+
+KINDS = ("radix", "merge", "intro")
+BACKENDS = ("numba", "cython")
+SORTERS = {}
+
+_UNSIGNED = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+
+def register(kind, backend, func):
+    """func(a) sorts the 1-D array a in place; radix kernels get unsigned keys."""
+    SORTERS[(kind, backend)] = func
+
+
+def available_sorters():
+    return [key for key, func in SORTERS.items() if func is not None]
+
+
+def to_keys(a):
+    """Unsigned integer keys with the same ordering as a (NaN-free)."""
+    udtype = _UNSIGNED[a.dtype.itemsize]
+    bits = a.view(udtype)
+    top = udtype(1) << udtype(8 * a.dtype.itemsize - 1)
+    if a.dtype.kind == "u":
+        return bits.copy()
+    if a.dtype.kind == "i":
+        return bits ^ top
+    # floats: -0.0 and 0.0 get different keys, both stay between - and +
+    mask = np.where(bits & top, ~udtype(0), top)
+    return bits ^ mask
+
+
+def from_keys(keys, dtype):
+    """Inverse of to_keys."""
+    dtype = np.dtype(dtype)
+    udtype = keys.dtype.type
+    top = udtype(1) << udtype(8 * dtype.itemsize - 1)
+    if dtype.kind == "u":
+        return keys.view(dtype)
+    if dtype.kind == "i":
+        return (keys ^ top).view(dtype)
+    mask = np.where(keys & top, top, ~udtype(0))
+    return (keys ^ mask).view(dtype)
+
+
+def _radix(func):
+    def sort_radix(a):
+        a[:] = from_keys(func(to_keys(a)), a.dtype)
+        return a
+
+    return sort_radix
+
+
+def sort(a, kind="radix", backend="numba", copy=True):
+    """
+    Sorted 1-D array a, using the kernel registered for (kind, backend).
+    With copy=False a is sorted in place: a non-contiguous a (a strided
+    view) is sorted in a contiguous copy that is written back into it.
+    """
+    a = np.asarray(a)
+    if a.ndim != 1:
+        raise ValueError("Only 1-D arrays are supported, got %d-D" % a.ndim)
+    if a.dtype.kind not in "uif":
+        raise TypeError("Unsupported dtype %s" % a.dtype)
+    func = SORTERS.get((kind, backend))
+    if func is None:
+        raise ValueError(
+            "No %r sorter for backend %r, available: %s"
+            % (kind, backend, available_sorters())
+        )
+    out = a.copy() if copy or not a.flags.c_contiguous else a
+    _sort_nan_last(func, out)
+    if not copy and out is not a:
+        a[...] = out
+        return a
+    return out
+
+
+def _sort_nan_last(func, out):
+    """Sort contiguous out in place with func, NaNs at the end."""
+    if out.dtype.kind == "f":
+        nan = np.isnan(out)
+        n_nan = int(nan.sum())
+        if n_nan:
+            finite = out[~nan]
+            func(finite)
+            out[: len(finite)] = finite
+            out[len(finite) :] = np.nan
+            return
+    func(out)
+
+
+register("radix", "numba", _radix(sort_numba.radix_sort))
+register("merge", "numba", sort_numba.merge_sort)
+register("intro", "numba", sort_numba.introsort)
+register("radix", "cython", sort_cy and _radix(sort_cy.radix_sort))
+register("merge", "cython", sort_cy and sort_cy.merge_sort)
+register("intro", "cython", sort_cy and sort_cy.introsort)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    arrays = {
+        "int64": rng.integers(-(10**12), 10**12, 10**5),
+        "int32": rng.integers(-1000, 1000, 10**5).astype(np.int32),
+        "uint16": rng.integers(0, 2**16, 10**5).astype(np.uint16),
+        "float64": rng.standard_normal(10**5),
+        "float32 + nan": np.append(rng.standard_normal(10**5), np.nan).astype(
+            np.float32
+        ),
+    }
+    for kind, backend in available_sorters():
+        for name, a in arrays.items():
+            np.testing.assert_array_equal(sort(a, kind, backend), np.sort(a))
+        print("%-6s %-7s agrees with np.sort on %s" % (kind, backend, list(arrays)))
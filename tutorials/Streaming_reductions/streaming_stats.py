@@ -0,0 +1,350 @@
+"""
+What? Streaming reductions with mergeable states: mean, variance, min/max,
+      quantile sketch and histogram, in fixed memory
+
+average_np in "NumPy vs. Numba vs. Cython" allocates np.random.random(n),
+80 MB at n = 10**7, only to take its mean. Here the data is consumed one
+block at a time and every statistic keeps a small state that can be merged:
+
+    - Moments:        count, mean, M2 (Chan et al. update), min and max
+    - Histogram:      counts over fixed bin edges
+    - QuantileSketch: DDSketch, quantiles with a relative error <= alpha,
+                      buckets are log-spaced so merging is exact
+
+Blocks are combined with a binary counter: block states are pushed as level 0
+and two states of the same level are merged into one of the level above. The
+merge tree therefore depends only on the number of blocks, never on how they
+were split between workers, so parallel_reduce() returns bit for bit what the
+serial reduce_stream() returns on the same blocks.
+
+Block i of a random stream is drawn from np.random.default_rng([seed, i]),
+so any worker can generate any block without drawing the ones before it.
+
+Reference: https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+           https://arxiv.org/abs/1908.10693
+"""
+
+# Import modules
+import os
+import math
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+
+
+class Moments:
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def from_block(self, x):
+        if len(x) == 0:
+            return Moments()
+        mean = float(x.mean())
+        m2 = float(np.square(x - mean).sum())
+        return Moments(len(x), mean, m2, float(x.min()), float(x.max()))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return Moments(
+            count,
+            self.mean + delta * other.count / count,
+            self.m2 + other.m2 + delta**2 * self.count * other.count / count,
+            min(self.min, other.min),
+            max(self.max, other.max),
+        )
+
+    def var(self, ddof=0):
+        return self.m2 / (self.count - ddof) if self.count > ddof else math.nan
+
+    def std(self, ddof=0):
+        return math.sqrt(self.var(ddof))
+
+
+class Histogram:
+    __slots__ = ("edges", "counts")
+
+    def __init__(self, edges, counts=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = (
+            np.zeros(len(self.edges) - 1, np.int64) if counts is None else counts
+        )
+
+    def from_block(self, x):
+        return Histogram(self.edges, np.histogram(x, self.edges)[0].astype(np.int64))
+
+    def merge(self, other):
+        return Histogram(self.edges, self.counts + other.counts)
+
+
+class QuantileSketch:
+    """
+    DDSketch: x > 0 goes to bucket ceil(log_gamma(x)), gamma = (1 + a)/(1 - a),
+    and is estimated by 2 gamma^k / (gamma + 1), within a relative error a.
+    Negative values use a mirrored set of buckets, |x| < min_value counts as 0.
+    """
+
+    __slots__ = ("alpha", "min_value", "positive", "negative", "zeros")
+
+    def __init__(self, alpha=0.01, min_value=1e-12):
+        self.alpha = alpha
+        self.min_value = min_value
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zeros = 0
+
+    @property
+    def gamma(self):
+        return (1 + self.alpha) / (1 - self.alpha)
+
+    @property
+    def count(self):
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zeros
+
+    def _buckets(self, x):
+        keys = np.ceil(np.log(x) / math.log(self.gamma)).astype(np.int64)
+        return Counter(
+            dict(zip(*(a.tolist() for a in np.unique(keys, return_counts=True))))
+        )
+
+    def from_block(self, x):
+        out = QuantileSketch(self.alpha, self.min_value)
+        big = np.abs(x) >= self.min_value
+        out.positive = self._buckets(x[big & (x > 0)])
+        out.negative = self._buckets(-x[big & (x < 0)])
+        out.zeros = int(len(x) - big.sum())
+        return out
+
+    def merge(self, other):
+        out = QuantileSketch(self.alpha, self.min_value)
+        out.positive = self.positive + other.positive
+        out.negative = self.negative + other.negative
+        out.zeros = self.zeros + other.zeros
+        return out
+
+    def quantile(self, q):
+        """Estimate of the q-quantile (lower rank, like method='lower')."""
+        count = self.count
+        if count == 0:
+            return math.nan
+        rank = q * (count - 1)
+        estimate = lambda k: 2 * self.gamma**k / (self.gamma + 1)
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -estimate(k)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return estimate(k)
+        return estimate(max(self.positive))
+
+
+class StreamStats:
+    """All the statistics above, reduced together in one pass."""
+
+    __slots__ = ("moments", "histogram", "sketch")
+
+    def __init__(self, edges=None, alpha=0.01):
+        self.moments = Moments()
+        self.histogram = None if edges is None else Histogram(edges)
+        self.sketch = None if alpha is None else QuantileSketch(alpha)
+
+    def from_block(self, x):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        out = StreamStats.__new__(StreamStats)
+        out.moments = self.moments.from_block(x)
+        out.histogram = self.histogram and self.histogram.from_block(x)
+        out.sketch = self.sketch and self.sketch.from_block(x)
+        return out
+
+    def merge(self, other):
+        out = StreamStats.__new__(StreamStats)
+        out.moments = self.moments.merge(other.moments)
+        out.histogram = self.histogram and self.histogram.merge(other.histogram)
+        out.sketch = self.sketch and self.sketch.merge(other.sketch)
+        return out
+
+    def summary(self, quantiles=(0.01, 0.5, 0.99)):
+        m = self.moments
+        out = {
+            "count": m.count,
+            "mean": m.mean,
+            "var": m.var(),
+            "min": m.min,
+            "max": m.max,
+        }
+        if self.sketch is not None:
+            out.update({"q%g" % q: self.sketch.quantile(q) for q in quantiles})
+        return out
+
+
+class TreeReducer:
+    """Binary counter over block states, see the module docstring."""
+
+    def __init__(self, template):
+        self.template = template
+        self.stack = []  # (level, state), levels strictly decreasing
+
+    def push(self, state, level=0):
+        while self.stack and self.stack[-1][0] == level:
+            _, left = self.stack.pop()
+            state = left.merge(state)
+            level += 1
+        self.stack.append((level, state))
+
+    def push_block(self, block):
+        self.push(self.template.from_block(block))
+
+    def result(self):
+        if not self.stack:
+            return self.template
+        state = self.stack[-1][1]
+        for _, left in reversed(self.stack[:-1]):
+            state = left.merge(state)
+        return state
+
+
+def rng_block(seed, index, size, dist="random"):
+    """Block 'index' of the random stream 'seed'."""
+    return getattr(np.random.default_rng([seed, index]), dist)(size)
+
+
+def rng_blocks(n, block_size=2**16, seed=0, dist="random", start=0, stop=None):
+    """Blocks start..stop-1 of a stream of n random numbers."""
+    n_blocks = -(-n // block_size)
+    for i in range(start, n_blocks if stop is None else min(stop, n_blocks)):
+        yield rng_block(seed, i, min(block_size, n - i * block_size), dist)
+
+
+def reduce_stream(blocks, template=None):
+    """Serial one-pass reduction of any iterable of arrays."""
+    reducer = TreeReducer(template or StreamStats())
+    for block in blocks:
+        reducer.push_block(block)
+    return reducer.result()
+
+
+def _reduce_range(args):
+    n, block_size, seed, dist, start, stop, template = args
+    reducer = TreeReducer(template)
+    for block in rng_blocks(n, block_size, seed, dist, start, stop):
+        reducer.push_block(block)
+    return reducer.stack
+
+
+def parallel_reduce(
+    n,
+    block_size=2**16,
+    seed=0,
+    dist="random",
+    template=None,
+    n_workers=None,
+    executor="process",
+):
+    """
+    Same result as reduce_stream(rng_blocks(n, block_size, seed, dist)),
+    with the blocks spread over n_workers processes or threads. Every worker
+    gets a power-of-2 number of blocks, i.e. whole subtrees of the counter.
+    """
+    template = template or StreamStats()
+    n_workers = n_workers or os.cpu_count()
+    n_blocks = -(-n // block_size)
+    span = 1 << max(0, -(-n_blocks // n_workers) - 1).bit_length()
+    tasks = [
+        (n, block_size, seed, dist, start, start + span, template)
+        for start in range(0, n_blocks, span)
+    ]
+    pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool(n_workers) as ex:
+        stacks = list(ex.map(_reduce_range, tasks))
+    reducer = TreeReducer(template)
+    for stack in stacks:
+        for level, state in stack:
+            reducer.push(state, level)
+    return reducer.result()
+
+
+def average_np(n):
+    """The tutorial version."""
+    s = np.random.random(n)
+    return s.mean()
+
+
+def average_stream(n, block_size=2**16, seed=0, n_workers=1):
+    """average_np in O(block_size) memory."""
+    template = StreamStats(alpha=None)
+    if n_workers == 1:
+        return reduce_stream(rng_blocks(n, block_size, seed), template).moments.mean
+    return parallel_reduce(
+        n, block_size, seed, template=template, n_workers=n_workers
+    ).moments.mean
+
+
+def _peak(func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+if __name__ == "__main__":
+    n = 10**7
+    for name, f in (("average_np", average_np), ("average_stream", average_stream)):
+        mean, t, mib = _peak(f, n)
+        print("%-15s mean %.6f in %.3f s, peak memory %7.2f MiB" % (name, mean, t, mib))
+
+    # serial vs parallel, same blocks: identical states
+    n, edges = 10**6 + 12345, np.linspace(-5, 5, 41)
+    template = StreamStats(edges=edges, alpha=0.01)
+    serial = reduce_stream(rng_blocks(n, 2**14, 1, "standard_normal"), template)
+    for workers in (2, 3, 4):
+        for executor in ("thread", "process"):
+            par = parallel_reduce(
+                n, 2**14, 1, "standard_normal", template, workers, executor
+            )
+            assert par.summary() == serial.summary()
+            assert (par.histogram.counts == serial.histogram.counts).all()
+    print(
+        "\nParallel reductions (2-4 workers, threads and processes) match the serial one"
+    )
+
+    data = np.concatenate(list(rng_blocks(n, 2**14, 1, "standard_normal")))
+    print("\n%-8s %14s %14s" % ("", "streaming", "materialised"))
+    for key, ref in (
+        ("mean", data.mean()),
+        ("var", data.var()),
+        ("min", data.min()),
+        ("max", data.max()),
+    ):
+        print("%-8s %14.8f %14.8f" % (key, serial.summary()[key], ref))
+    for q in (0.01, 0.5, 0.99):
+        print(
+            "%-8s %14.8f %14.8f"
+            % (
+                "q%g" % q,
+                serial.sketch.quantile(q),
+                np.quantile(data, q, method="lower"),
+            )
+        )
+    assert (serial.histogram.counts == np.histogram(data, edges)[0]).all()
+    print("histogram counts are exact")